@@ -0,0 +1,58 @@
+"""Load test: /chat throughput vs. number of concurrent clients with a stubbed LLM.
+
+Compares the old behaviour (sync process_query called from the event loop)
+with aprocess_query. Embeddings and FAISS are the real ones.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_async_load --latency 0.3 --requests 64
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import StubLLM, make_service
+
+
+async def run_clients(handler, queries, clients: int) -> float:
+    """Drive ``handler`` with ``clients`` concurrent workers, return requests/second"""
+    pending = list(queries)
+
+    async def client():
+        while pending:
+            await handler(pending.pop())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.3, help="stub LLM latency in seconds")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 32])
+    args = parser.parse_args()
+
+    service = make_service(StubLLM(latency=args.latency))
+
+    async def blocking(query):
+        return service.process_query(query)
+
+    async def non_blocking(query):
+        return await service.aprocess_query(query)
+
+    async def run_all():
+        print(f"{'clients':>8} {'blocking req/s':>15} {'async req/s':>12}")
+        for clients in args.clients:
+            results = []
+            for handler in (blocking, non_blocking):
+                service.clear_cache()
+                queries = [f"Chính sách hủy lịch đặt dịch vụ số {i} như thế nào?" for i in range(args.requests)]
+                results.append(await run_clients(handler, queries, clients))
+            print(f"{clients:>8} {results[0]:15.1f} {results[1]:12.1f}")
+
+    asyncio.run(run_all())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Batch vs. one-by-one processing of a prefetch-style query list (stubbed LLM).
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_batch --queries 200 --latency 0.05
+"""
+import argparse
+import time
+
+from benchmarks.common import StubLLM, make_service
+
+TEMPLATES = [
+    "Chính sách hủy lịch số {i} như thế nào?",
+    "Làm sao để đăng nhập tài khoản {i}?",
+    "Thanh toán bằng vnpay cho đơn {i} được không?",
+    "Giá dọn nhà {i} m² là bao nhiêu?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    service = make_service(StubLLM(latency=args.latency))
+    # A quarter of the list repeats earlier queries, as in FAQ prefetch
+    queries = [TEMPLATES[i % len(TEMPLATES)].format(i=i) for i in range(args.queries * 3 // 4)]
+    queries += queries[:args.queries - len(queries)]
+
+    service.clear_cache()
+    start = time.perf_counter()
+    sequential = [service.process_query(query).message for query in queries]
+    sequential_time = time.perf_counter() - start
+
+    service.clear_cache()
+    service.llm.calls = 0
+    start = time.perf_counter()
+    batched = service.process_batch(queries)
+    batch_time = time.perf_counter() - start
+
+    print(f"{len(queries)} queries")
+    print(f"one by one : {sequential_time:7.2f} s")
+    print(f"process_batch: {batch_time:7.2f} s ({service.llm.calls} LLM calls)")
+    print(f"same answers: {sum(a == b for a, b in zip(sequential, batched))}/{len(queries)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Micro-benchmark: compiled rule engine vs. the per-pattern re.search loop.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_classification
+"""
+import re
+from types import SimpleNamespace
+from typing import Tuple
+
+from benchmarks.common import time_per_call
+from service.classifications_rule import (
+    normalize_query,
+    rule_based_classification,
+    setup_classification_rules
+)
+
+QUERIES = [
+    "Giá sửa điều hòa split là bao nhiêu nếu công suất 3 HP?",
+    "Tôi muốn dọn dẹp nhà 90 m² và nấu ăn cho 4 người với 3 món trong 2 giờ, tổng chi phí là bao nhiêu?",
+    "Dịch vụ sửa tivi hiện có giá cụ thể chưa?",
+    "Làm sao để hủy lịch đặt dọn nhà vào cuối tuần và chính sách hoàn tiền như thế nào?",
+    "Hôm nay thời tiết ở Hà Nội thế nào, có nên đi du lịch không?",
+    "Tôi quên mật khẩu tài khoản, làm cách nào để đăng nhập lại ứng dụng?",
+    "Hello",
+]
+
+
+def legacy_rule_based_classification(rules, query: str) -> Tuple[str, float, list]:
+    """The original implementation, kept here as the baseline"""
+    normalized_query = normalize_query(query)
+    app_related_matches = []
+    general_matches = []
+    for i, pattern in enumerate(rules.app_related_patterns):
+        if re.search(pattern, normalized_query, re.IGNORECASE):
+            app_related_matches.append(f"Pattern_{i}: {pattern}")
+    for i, pattern in enumerate(rules.general_patterns):
+        if re.search(pattern, normalized_query, re.IGNORECASE):
+            general_matches.append(f"General_{i}: {pattern}")
+    app_score = len(app_related_matches)
+    general_score = len(general_matches)
+    if app_score > general_score:
+        confidence = min(app_score / max(len(rules.app_related_patterns) * 0.1, 1), 1.0)
+        return 'app_related', confidence, app_related_matches
+    elif general_score > app_score:
+        confidence = min(general_score / max(len(rules.general_patterns) * 0.1, 1), 1.0)
+        return 'general', confidence, general_matches
+    return 'app_related', 0.6, ['Default: Home service app']
+
+
+def long_inputs(repeat: int):
+    """Concatenate the sample queries into long, rambling Vietnamese messages"""
+    return [" ".join(QUERIES[i:] + QUERIES[:i]) * repeat for i in range(len(QUERIES))]
+
+
+def main():
+    rules = SimpleNamespace()
+    setup_classification_rules(rules)
+
+    for query in QUERIES + long_inputs(3):
+        assert rule_based_classification(rules, query) == legacy_rule_based_classification(rules, query), query
+
+    print(f"{'input':>16} {'legacy (us)':>12} {'compiled (us)':>14} {'speedup':>8}")
+    for label, inputs in [('short', QUERIES), ('long x1', long_inputs(1)),
+                          ('long x5', long_inputs(5)), ('long x20', long_inputs(20))]:
+        legacy = time_per_call(lambda q: legacy_rule_based_classification(rules, q), inputs)
+        compiled = time_per_call(lambda q: rule_based_classification(rules, q), inputs)
+        print(f"{label:>16} {legacy * 1e6:12.1f} {compiled * 1e6:14.1f} {legacy / compiled:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
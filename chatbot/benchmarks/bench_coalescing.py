@@ -0,0 +1,54 @@
+"""Single-flight check: N identical concurrent queries cause one LLM call.
+
+Sends the same RAG and general queries N times at once through the sync
+path (threads) and the async path (gather), with empty caches and a stub
+LLM, and fails if the LLM was called more than once per query.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_coalescing [N]
+"""
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import StubLLM, make_service
+
+QUERIES = ["Chính sách hủy đơn như thế nào?", "Thời tiết Hà Nội hôm nay thế nào?"]
+
+
+def run_sync(service, query: str, n: int):
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        return list(pool.map(lambda _: service.process_query(query), range(n)))
+
+
+def run_async(service, query: str, n: int):
+    async def burst():
+        return await asyncio.gather(*[service.aprocess_query(query) for _ in range(n)])
+    return asyncio.run(burst())
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    llm = StubLLM(latency=0.5)
+    service = make_service(llm)
+    service.load()
+    failures = 0
+    print(f"{'path':>6} {'query':<36} {'requests':>8} {'LLM calls':>9} {'answers':>7} {'wall (s)':>8}")
+    for name, run in (("sync", run_sync), ("async", run_async)):
+        for query in QUERIES:
+            service.clear_cache()
+            llm.calls = 0
+            start = time.perf_counter()
+            responses = run(service, query, n)
+            elapsed = time.perf_counter() - start
+            distinct = len({response.message for response in responses})
+            print(f"{name:>6} {query:<36} {n:>8} {llm.calls:>9} {distinct:>7} {elapsed:8.2f}")
+            failures += llm.calls != 1 or distinct != 1
+    print(service.in_flight.get_stats())
+    if failures:
+        sys.exit(f"{failures} bursts were not coalesced into a single LLM call")
+
+
+if __name__ == "__main__":
+    main()
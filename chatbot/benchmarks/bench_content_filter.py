@@ -0,0 +1,100 @@
+"""Micro-benchmark: token-trie ContentFilter vs. the substring scan, as the word list grows.
+
+Also prints the benign queries the substring scan flags ("ngay" contains
+"gay", "theo" contains "heo", "nguồn" contains "ngu") next to the
+boundary-aware result, and checks that masked spellings and email
+addresses are flagged exactly when the original regexes flagged them.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_content_filter
+"""
+import random
+import re
+from typing import List, Tuple
+
+from benchmarks.bench_classification import QUERIES
+from benchmarks.common import time_per_call
+from service.content_filter import DEFAULT_WORDS, ContentFilter
+
+LEGACY_PATTERNS = {
+    r'd[*@#$%^&!]+m': 'đm',
+    r'v[*@#$%^&!]+l': 'vcl',
+    r'c[*@#$%^&!]+c': 'cc',
+    r'f[*@#$%^&!]+k': 'fuck',
+    r's[*@#$%^&!]+t': 'shit'
+}
+BENIGN = [
+    "Tôi cần thợ sửa điện đến ngay",
+    "Làm sao để theo dõi đơn hàng?",
+    "Nguồn điện trong nhà bị hỏng",
+    "Có video hướng dẫn đặt lịch không?",
+    "Tài khoản admin bị khóa",
+    "Tôi buồn ngủ, đặt lịch dọn nhà giúp tôi",
+    "email của tôi là dung@yahoo.com",
+    "Gửi hóa đơn về hung@yahoo.com giúp tôi",
+    "chi@yahoo.com không nhận được mã xác nhận",
+]
+# Masked spellings and text with mask characters that is not masking anything
+MASKED = [
+    "d*m", "đồ v@l", "c**c", "f**k", "f***k you", "s#!t", "d*mn",
+    "dung@yahoo.com", "hung@yahoo.com", "chi@yahoo.com",
+    "giá 100$ thôi", "50% phí", "a&b",
+]
+SYLLABLES = ["ba", "ngo", "thu", "lam", "xe", "quy", "tran", "khe", "vo", "minh", "dao", "phu"]
+
+
+def legacy_is_inappropriate(words: List[str], text: str) -> Tuple[bool, List[str]]:
+    """The original implementation, kept here as the baseline"""
+    text_lower = text.lower()
+    detected_words = []
+    for word in words:
+        if word in text_lower:
+            detected_words.append(word)
+    for pattern, replacement in LEGACY_PATTERNS.items():
+        if re.search(pattern, text_lower):
+            detected_words.append(replacement)
+    return len(detected_words) > 0, detected_words
+
+
+def masked_mismatches(content_filter: ContentFilter) -> List[str]:
+    """MASKED and BENIGN queries the filter and the original regexes disagree on (flagged or not)"""
+    mismatches = []
+    for query in MASKED + BENIGN:
+        expected = any(re.search(pattern, query.lower()) for pattern in LEGACY_PATTERNS)
+        if content_filter.is_inappropriate(query)[0] != expected:
+            mismatches.append(query)
+    return mismatches
+
+
+def synthetic_words(count: int) -> List[str]:
+    """Made-up entries that do not occur in the queries, so every scan is a full miss"""
+    rng = random.Random(count)
+    words = list(DEFAULT_WORDS)
+    while len(words) < count:
+        size = rng.choice([1, 1, 2, 3])
+        words.append(" ".join("".join(rng.choices(SYLLABLES, k=3)) for _ in range(size)))
+    return words
+
+
+def main():
+    queries = QUERIES + BENIGN
+
+    print("Benign queries flagged by the substring scan:")
+    content_filter = ContentFilter(words_path=None)
+    for query in BENIGN:
+        legacy = legacy_is_inappropriate(DEFAULT_WORDS, query)[1]
+        current = content_filter.is_inappropriate(query)[1]
+        print(f"  {query!r}\n    substring: {legacy}  trie: {current}")
+    print(f"Masked spellings flagged differently from the original regexes: {masked_mismatches(content_filter)}")
+
+    print(f"\n{'words':>7} {'substring (us)':>15} {'trie (us)':>10} {'speedup':>8}")
+    for count in (len(DEFAULT_WORDS), 500, 2000, 5000, 20000):
+        words = synthetic_words(count)
+        content_filter.reload(words)
+        legacy = time_per_call(lambda q: legacy_is_inappropriate(words, q), queries)
+        trie = time_per_call(content_filter.is_inappropriate, queries)
+        print(f"{count:>7} {legacy * 1e6:15.1f} {trie * 1e6:10.1f} {legacy / trie:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Prompt size and end-to-end RAG latency with and without context budgeting.
+
+Runs the retrieval_queries.jsonl corpus through retrieval, prompt building
+and a stub LLM that charges a fixed latency plus a cost per prompt token.
+"kept" is the share of queries whose relevant text (a marker present in
+the retrieved chunks) is still in the prompt after budgeting. Also times
+building the prompt with a per-call ChatPromptTemplate.from_template (the
+old code) against the compiled template.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_context
+"""
+import re
+import time
+
+from benchmarks.bench_retrieval import load_corpus
+from benchmarks.common import StubLLM, make_service, time_per_call
+from service.context_budget import CONTEXT_TOKEN_BUDGET, budget_context, estimate_tokens
+from service.prompts import RAG_PROMPT, prompt_template
+
+BASE_LATENCY = 0.05
+# 0.2 ms per prompt token, i.e. 1000 tokens cost 200 ms
+PER_TOKEN_LATENCY = 0.0002
+VARIANTS = [("verbatim", 0, 3), ("verbatim", 0, 2), ("budgeted", CONTEXT_TOKEN_BUDGET, 2), ("budgeted", CONTEXT_TOKEN_BUDGET, 3)]
+
+
+def contains_marker(text: str, markers) -> bool:
+    text = re.sub(r"\s+", " ", text)
+    return any(marker in text for marker in markers)
+
+
+def legacy_rag_prompt(context: str, query: str) -> str:
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_template(RAG_PROMPT).format(context=context, query=query)
+
+
+def main():
+    corpus = load_corpus()
+    llm = StubLLM(latency=BASE_LATENCY, per_token=PER_TOKEN_LATENCY)
+    service = make_service(llm)
+    service.load()
+    embeddings = service.embeddings.embed_documents([item["query"] for item in corpus])
+
+    print(f"{len(corpus)} queries, stub LLM {BASE_LATENCY * 1e3:.0f} ms + {PER_TOKEN_LATENCY * 1e3:.1f} ms/token")
+    print(f"{'context':>10} {'k':>2} {'prompt tok':>11} {'ctx tok':>8} {'saved':>7} {'kept':>6} {'e2e (ms)':>9}")
+    baseline = None
+    for name, budget, k in VARIANTS:
+        prompt_tokens, context_tokens, saved, kept, relevant, elapsed = 0, 0, 0, 0, 0, 0.0
+        for item, embedding in zip(corpus, embeddings):
+            docs = service.retriever.search(item["query"], embedding, k)
+            texts = [doc.page_content for doc in docs]
+            start = time.perf_counter()
+            context = budget_context(texts, item["query"], budget)
+            prompt = prompt_template("rag").format(context=context.text, query=item["query"])
+            llm.invoke(prompt)
+            elapsed += time.perf_counter() - start
+            prompt_tokens += estimate_tokens(prompt)
+            context_tokens += context.sent_tokens
+            saved += context.saved_tokens
+            if contains_marker(" ".join(texts), item["relevant"]):
+                relevant += 1
+                kept += contains_marker(context.text, item["relevant"])
+        n = len(corpus)
+        e2e = elapsed / n
+        baseline = baseline or e2e
+        print(f"{name:>10} {k:>2} {prompt_tokens / n:11.0f} {context_tokens / n:8.0f} {saved / n:7.0f} "
+              f"{kept / max(relevant, 1):6.1%} {e2e * 1e3:9.1f}  ({(e2e - baseline) / baseline:+.1%} vs first row)")
+
+    query, context = corpus[0]["query"], "\n".join(doc.page_content for doc in service.retriever.search(corpus[0]["query"], embeddings[0], 2))
+    rebuilt = time_per_call(lambda _: legacy_rag_prompt(context, query), range(200))
+    compiled = time_per_call(lambda _: prompt_template("rag").format(context=context, query=query), range(200))
+    print(f"RAG prompt build: from_template per call {rebuilt * 1e6:.1f} us, compiled {compiled * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Query encoder backends compared: load time, RSS and embed_query latency.
+
+Each backend runs in its own subprocess so the RSS numbers do not mix
+models. Queries are the ones in chatbot.log (falling back to the
+retrieval corpus). Backends whose ONNX export is missing are skipped; see
+``python -m service.embeddings export``. Parity with the index is checked
+separately by ``python -m service.embeddings parity``.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_embeddings [--threads N]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from benchmarks.common import load_logged_queries, memory_usage, percentiles
+from service.embeddings import BACKENDS, EMBEDDING_THREADS
+
+CHILD_FLAG = "--child"
+
+
+def queries():
+    logged = list(dict.fromkeys(load_logged_queries()))
+    if logged:
+        return logged
+    from benchmarks.bench_retrieval import load_corpus
+    return [item["query"] for item in load_corpus()]
+
+
+def measure(backend: str, threads: int) -> dict:
+    """Runs in the child process"""
+    from service.embeddings import build_embeddings
+
+    baseline = memory_usage()['rss']
+    start = time.perf_counter()
+    embeddings = build_embeddings(backend, threads)
+    load_seconds = time.perf_counter() - start
+    texts = queries()
+    embeddings.embed_query(texts[0])
+    latencies = []
+    for _ in range(3):
+        for text in texts:
+            start = time.perf_counter()
+            embeddings.embed_query(text)
+            latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    embeddings.embed_documents(texts)
+    batch_seconds = time.perf_counter() - start
+    stats = percentiles(latencies)
+    return {
+        'load_s': load_seconds,
+        'rss_mb': (memory_usage()['rss'] - baseline) / 2 ** 20,
+        'p50_ms': stats['p50'] * 1e3,
+        'p99_ms': stats['p99'] * 1e3,
+        'batch_qps': len(texts) / batch_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=EMBEDDING_THREADS)
+    parser.add_argument(CHILD_FLAG, dest="child")
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(measure(args.child, args.threads)))
+        return
+
+    print(f"{len(queries())} queries, {args.threads} threads")
+    print(f"{'backend':>10} {'load (s)':>9} {'RSS (MB)':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'batch q/s':>10}")
+    for backend in BACKENDS:
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_embeddings", CHILD_FLAG, backend,
+                              "--threads", str(args.threads)], capture_output=True, text=True)
+        if out.returncode != 0:
+            reason = (out.stderr.strip().splitlines() or ["failed"])[-1]
+            print(f"{backend:>10} skipped: {reason}")
+            continue
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{backend:>10} {result['load_s']:9.2f} {result['rss_mb']:9.0f} {result['p50_ms']:9.2f} "
+              f"{result['p99_ms']:9.2f} {result['batch_qps']:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
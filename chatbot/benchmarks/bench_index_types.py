@@ -0,0 +1,110 @@
+"""FAISS index types compared: recall@k against the flat index, latency and size.
+
+The FAQ store has only a handful of chunks, so by default the corpus is
+synthetic: normalized 768-d vectors around random cluster centres, shaped
+like sentence embeddings. ``--vectorstore`` uses the vectors of a built
+db_faiss instead (IVF types need at least nlist * 39 of them). Queries are
+corpus vectors with added noise; ground truth is the exact flat search.
+
+Each IVF row is one nprobe setting, each HNSW row one efSearch setting, so
+the table shows the recall/latency trade-off the search parameters buy.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_index_types [--n 20000] [--k 2] [--vectorstore PATH]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+from benchmarks.common import percentiles
+from service.faiss_index import DEFAULT_INDEX_OPTIONS, INDEX_NAME, apply_search_params, build_index, read_index_mmap
+
+SWEEPS = {
+    "flat": [{}],
+    "ivf-flat": [{"nprobe": nprobe} for nprobe in (1, 4, 8, 16, 32)],
+    "ivf-pq": [{"nprobe": nprobe} for nprobe in (1, 4, 8, 16, 32)],
+    "hnsw": [{"ef_search": ef} for ef in (16, 32, 64, 128)],
+}
+
+
+def synthetic_corpus(n: int, d: int = 768, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, d)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, d)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def make_queries(corpus: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    queries = corpus[rng.integers(0, len(corpus), count)] + 0.05 * rng.standard_normal((count, corpus.shape[1])).astype(np.float32)
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def recall_at_k(found: np.ndarray, expected: np.ndarray) -> float:
+    k = expected.shape[1]
+    return float(np.mean([len(set(f) & set(e)) / k for f, e in zip(found, expected)]))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=20000, help="synthetic corpus size")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--vectorstore", help="use the vectors of a built store instead")
+    parser.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    if args.vectorstore:
+        flat = read_index_mmap(os.path.join(args.vectorstore, INDEX_NAME))
+        corpus = flat.reconstruct_n(0, flat.ntotal)
+    else:
+        corpus = synthetic_corpus(args.n)
+    queries = make_queries(corpus, args.queries)
+    k = min(args.k, len(corpus))
+
+    print(f"{len(corpus)} vectors x {corpus.shape[1]}, {len(queries)} queries, k={k}, {args.threads} thread(s)")
+    print(f"{'type':>8} {'search':>12} {'build (s)':>9} {'size (MB)':>9} {f'recall@{k}':>9} "
+          f"{'p50 (ms)':>9} {'p99 (ms)':>9} {'batch q/s':>10}")
+    expected = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for index_type, sweep in SWEEPS.items():
+            start = time.perf_counter()
+            try:
+                index, params = build_index(corpus, index_type, DEFAULT_INDEX_OPTIONS)
+            except ValueError as e:
+                print(f"{index_type:>8} skipped: {e}")
+                continue
+            build_seconds = time.perf_counter() - start
+            path = os.path.join(tmp, f"{index_type}.faiss")
+            faiss.write_index(index, path)
+            size_mb = os.path.getsize(path) / 2 ** 20
+            if expected is None:
+                _, expected = index.search(queries, k)
+
+            for search in sweep:
+                apply_search_params(index, search)
+                latencies = []
+                for query in queries:
+                    started = time.perf_counter()
+                    index.search(query[None, :], k)
+                    latencies.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                _, found = index.search(queries, k)
+                batch_qps = len(queries) / (time.perf_counter() - started)
+                stats = percentiles(latencies)
+                label = " ".join(f"{name}={value}" for name, value in search.items()) or "exact"
+                print(f"{index_type:>8} {label:>12} {build_seconds:9.2f} {size_mb:9.1f} {recall_at_k(found, expected):9.3f} "
+                      f"{stats['p50'] * 1e3:9.3f} {stats['p99'] * 1e3:9.3f} {batch_qps:10.0f}")
+            if params:
+                print(f"{'':>8} {params}")
+
+
+if __name__ == "__main__":
+    main()
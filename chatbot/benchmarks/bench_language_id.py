@@ -0,0 +1,96 @@
+"""Accuracy and latency of LanguageIdentifier (vs. langdetect when it is installed).
+
+Labelled inputs: the queries in chatbot.log (Vietnamese, plus the English
+"How to cook pho?"), the English titles and bodies of requests.jsonl, and a
+few unaccented Vietnamese and unsupported-language queries.
+
+"accept ok" is what the service acts on: vi/en are answered, other rejected.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_language_id
+"""
+import time
+from typing import Callable, List, Tuple
+
+from benchmarks.common import load_logged_queries, load_request_texts, percentiles
+from service.language_id import LanguageIdentifier
+
+ENGLISH_LOGGED = {"How to cook pho?"}
+EXTRA = [
+    ("gia don dep nha 50m2 bao nhieu", "vi"),
+    ("toi muon huy lich dat dich vu", "vi"),
+    ("cho minh hoi gia sua dieu hoa", "vi"),
+    ("How much does a house cleaning cost?", "en"),
+    ("Can I cancel my booking for free?", "en"),
+    ("Combien coûte le ménage d'un appartement?", "other"),
+    ("¿Cuánto cuesta la limpieza de la casa?", "other"),
+    ("Wie viel kostet die Reinigung?", "other"),
+    ("Quanto costa il servizio di pulizia?", "other"),
+    ("Berapa harga layanan kebersihan ini?", "other"),
+    ("清洁服务多少钱?", "other"),
+    ("家事代行の料金はいくらですか", "other"),
+    ("청소 서비스 가격이 얼마예요?", "other"),
+    ("Сколько стоит уборка квартиры?", "other"),
+    ("ราคาบริการทำความสะอาดเท่าไหร่", "other"),
+]
+
+
+def labelled_inputs() -> List[Tuple[str, str]]:
+    logged = [(query, "en" if query in ENGLISH_LOGGED else "vi") for query in load_logged_queries()]
+    backlog = [(text, "en") for text in load_request_texts()]
+    return logged + backlog + EXTRA
+
+
+def langdetect_baseline() -> Callable[[str], str]:
+    try:
+        from langdetect import DetectorFactory, detect
+    except ImportError:
+        return None
+    DetectorFactory.seed = 0
+
+    def detect_language(text: str) -> str:
+        try:
+            lang = detect(text)
+        except Exception:
+            return 'vi'
+        return lang if lang in ('vi', 'en') else 'other'
+
+    return detect_language
+
+
+def evaluate(name: str, detect: Callable[[str], str], inputs: List[Tuple[str, str]]):
+    latencies, exact, accept, errors = [], 0, 0, []
+    for text, label in inputs:
+        start = time.perf_counter()
+        lang = detect(text)
+        latencies.append(time.perf_counter() - start)
+        exact += lang == label
+        accept += (lang == 'other') == (label == 'other')
+        if (lang == 'other') != (label == 'other'):
+            errors.append((text, label, lang))
+    stats = percentiles(latencies)
+    print(f"{name:>22} {exact / len(inputs):8.1%} {accept / len(inputs):10.1%} "
+          f"{stats['p50'] * 1e6:9.1f} {stats['p99'] * 1e6:9.1f}")
+    for text, label, lang in errors:
+        print(f"{'':>22} wrong: {text[:60]!r} expected {label}, got {lang}")
+
+
+def main():
+    inputs = labelled_inputs()
+    print(f"{len(inputs)} labelled inputs")
+    print(f"{'detector':>22} {'exact':>8} {'accept ok':>10} {'p50 (us)':>9} {'p99 (us)':>9}")
+    baseline = langdetect_baseline()
+    if baseline is not None:
+        evaluate("langdetect", baseline, inputs)
+    else:
+        print(f"{'langdetect':>22} not installed")
+    identifier = LanguageIdentifier(cache_size=0)
+    evaluate("LanguageIdentifier", identifier.detect, inputs)
+    cached = LanguageIdentifier()
+    for text, _ in inputs:
+        cached.detect(text)
+    evaluate("LanguageIdentifier hit", cached.detect, inputs)
+
+
+if __name__ == "__main__":
+    main()
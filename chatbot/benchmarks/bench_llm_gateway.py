@@ -0,0 +1,88 @@
+"""LLM gateway vs. a bare ChatGroq against the fake Groq server.
+
+Scenarios (see benchmarks/fake_groq.py):
+    healthy   fixed latency, no faults
+    flaky     10% 503s, 5% rate limits, 5% of requests 10x slower
+    outage    every request fails
+
+Clients:
+    bare      ChatGroq with SDK defaults (its own 2 retries, no deadline)
+    gateway   pooled client, deadline, jittered retries, circuit breaker
+    hedged    gateway + hedging after the p90 latency
+
+Reports success rate, latency percentiles and the requests the server saw.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_llm_gateway
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import percentiles
+from benchmarks.fake_groq import FakeGroqServer
+from service.llm_gateway import CircuitBreaker, LLMGateway, build_groq_client
+
+REQUESTS = 200
+CONCURRENCY = 16
+LATENCY = 0.2
+SCENARIOS = {
+    "healthy": dict(error_rate=0.0, rate_limit_rate=0.0, slow_rate=0.0),
+    "flaky": dict(error_rate=0.10, rate_limit_rate=0.05, slow_rate=0.05),
+    "outage": dict(error_rate=1.0, rate_limit_rate=0.0, slow_rate=0.0),
+}
+PROMPT = "Giá dịch vụ dọn dẹp nhà là bao nhiêu?"
+
+
+def make_clients(url: str):
+    from langchain_groq import ChatGroq
+
+    bare = ChatGroq(api_key=os.environ["GROQ_API_KEY"], model_name="llama3-8b-8192", base_url=url)
+    gateway = LLMGateway(build_groq_client(base_url=url, timeout=5), deadline=5, hedge_percentile=0,
+                         breaker=CircuitBreaker(5, 1))
+    hedged = LLMGateway(build_groq_client(base_url=url, timeout=5), deadline=5, hedge_percentile=0.9,
+                        breaker=CircuitBreaker(5, 1))
+    return {"bare": bare, "gateway": gateway, "hedged": hedged}
+
+
+def run(client, requests: int = REQUESTS):
+    latencies, ok = [], 0
+
+    def call(_):
+        start = time.perf_counter()
+        try:
+            client.invoke(PROMPT)
+            return True, time.perf_counter() - start
+        except Exception:
+            return False, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        for success, seconds in pool.map(call, range(requests)):
+            ok += success
+            latencies.append(seconds)
+    return ok / requests, percentiles(latencies)
+
+
+def main():
+    os.environ.setdefault("GROQ_API_KEY", "benchmark-placeholder")
+    with FakeGroqServer(latency=LATENCY, slow_latency=LATENCY * 10) as server:
+        clients = make_clients(server.url)
+        print(f"{REQUESTS} requests, concurrency {CONCURRENCY}, base latency {LATENCY * 1e3:.0f} ms")
+        print(f"{'scenario':>9} {'client':>8} {'success':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'server reqs':>12}")
+        for scenario, settings in SCENARIOS.items():
+            server.configure(**settings)
+            for name, client in clients.items():
+                if isinstance(client, LLMGateway):
+                    # Warm the latency window so hedging is active from the first measured request
+                    server.configure(error_rate=0.0, rate_limit_rate=0.0, slow_rate=0.0)
+                    run(client, 30)
+                    client.breaker.record_success()
+                    server.configure(**settings)
+                before = server.requests
+                success, stats = run(client)
+                print(f"{scenario:>9} {name:>8} {success:8.1%} {stats['p50'] * 1e3:9.0f} {stats['p95'] * 1e3:9.0f} "
+                      f"{stats['p99'] * 1e3:9.0f} {server.requests - before:12d}")
+
+
+if __name__ == "__main__":
+    main()
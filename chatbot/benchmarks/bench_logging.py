@@ -0,0 +1,104 @@
+"""Request-path cost of logging one RAG request, before and after the background logger.
+
+A RAG request logs its classification and its answer. Before, both went
+through a synchronous FileHandler as text, the answer with the full LLM
+response and retrieved context. After, the records go on a queue, the
+JSON formatting and file write happen on the listener thread, and the
+payload is attached to a sample of the answers.
+
+Payload sizes come from the RAG entries of chatbot.log.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_logging [--requests 20000]
+"""
+import argparse
+import logging
+import os
+import re
+import tempfile
+import time
+
+from benchmarks.common import CHATBOT_LOG, load_logged_queries, percentiles
+from service.log_config import JsonFormatter, background_handler, log_event, log_payload
+
+OLD_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+_RAG_ENTRY_RE = re.compile(r"RAG Response: (.*?)\nContext: (.*?)(?=\n\d{4}-\d\d-\d\d |\Z)", re.DOTALL)
+
+
+def logged_payloads():
+    """(response, context) pairs from the RAG entries of chatbot.log"""
+    if not os.path.exists(CHATBOT_LOG):
+        return []
+    with open(CHATBOT_LOG, encoding="cp1252", errors="replace") as f:
+        return _RAG_ENTRY_RE.findall(f.read())
+
+
+def isolated_logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(f"bench_logging.{name}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    return logger
+
+
+def log_before(logger, query, response, context):
+    logger.info(f"Classified intent for query '{query}': app_related (confidence: 0.9)")
+    logger.info(f"Query: {query}\nRAG Response: {response}\nContext: {context}")
+
+
+def log_after(logger, query, response, context, sample_rate):
+    log_event(logger, logging.INFO, "classified intent", query=query, intent="app_related", confidence=0.9)
+    log_payload(logger, logging.INFO, "rag answer",
+                {"query": query, "response_chars": len(response), "context_chars": len(context)},
+                lambda: {"response": response, "context": context}, sample_rate)
+
+
+def measure(log, requests):
+    latencies = []
+    for request in requests:
+        start = time.perf_counter()
+        log(*request)
+        latencies.append(time.perf_counter() - start)
+    return percentiles(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--sample-rates", type=float, nargs="+", default=[1.0, 0.05])
+    args = parser.parse_args()
+
+    queries = load_logged_queries() or ["Chính sách hủy đơn như thế nào?"]
+    payloads = logged_payloads() or [("Bạn có thể hủy đơn trước 2 giờ. " * 20, "Chính sách hủy đơn: ... " * 100)]
+    requests = [(queries[i % len(queries)],) + payloads[i % len(payloads)] for i in range(args.requests)]
+    mean_payload = sum(len(r) + len(c) for r, c in payloads) / len(payloads)
+    print(f"{args.requests} requests, {len(payloads)} logged payloads of {mean_payload / 1024:.1f} KB on average")
+    print(f"{'setup':>32} {'mean us':>8} {'p50 us':>8} {'p99 us':>8} {'log bytes/req':>13}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def report(label, stats, path):
+            size = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp) if name.startswith(path))
+            print(f"{label:>32} {stats['mean'] * 1e6:8.1f} {stats['p50'] * 1e6:8.1f} {stats['p99'] * 1e6:8.1f} "
+                  f"{size / args.requests:13.0f}")
+
+        handler = logging.FileHandler(os.path.join(tmp, "before.log"), encoding="utf-8")
+        handler.setFormatter(logging.Formatter(OLD_FORMAT))
+        logger = isolated_logger("before", handler)
+        stats = measure(lambda *request: log_before(logger, *request), requests)
+        handler.close()
+        report("before: sync text, full", stats, "before.log")
+
+        for rate in args.sample_rates:
+            name = f"after-{rate}"
+            target = logging.FileHandler(os.path.join(tmp, f"{name}.log"), encoding="utf-8")
+            target.setFormatter(JsonFormatter())
+            handler, listener = background_handler(target, queue_size=args.requests * 2)
+            logger = isolated_logger(name, handler)
+            stats = measure(lambda *request: log_after(logger, *request, rate), requests)
+            listener.stop()
+            target.close()
+            report(f"after: queue JSON, {rate:.0%} payload", stats, f"{name}.log")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Cost of the pre-answer checks per stage order, on a mix with many rejections.
+
+No model is loaded: only the length, content, language and classification
+stages run.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_pipeline
+"""
+import os
+
+from benchmarks.bench_classification import QUERIES
+from benchmarks.common import time_per_call
+from service.pipeline import Pipeline, QueryContext
+
+REJECTED = [
+    "Đồ ngu, trả lời nhanh lên",
+    "Сколько стоит уборка квартиры?",
+    "清洁服务多少钱?",
+    "",
+    "Dọn nhà " * 400,
+]
+ORDERS = {
+    "classify first (old)": ["classify", "content_filter", "language"],
+    "by cost (default)": None,
+}
+
+
+def main():
+    os.environ.setdefault("GROQ_API_KEY", "benchmark-placeholder")
+    from service.chat_service import ChatService
+
+    service = ChatService()
+    # Distinct queries so the intent cache does not hide the classification cost
+    inputs = [f"{query} {i}" if query else query for i in range(50) for query in QUERIES + REJECTED]
+
+    print(f"{len(inputs)} queries, {len(REJECTED) / (len(QUERIES) + len(REJECTED)):.0%} rejected")
+    for label, order in ORDERS.items():
+        pipeline = Pipeline(service.pipeline.stages, order)
+        service.intent_cache.clear()
+        per_query = time_per_call(lambda query: pipeline.run(QueryContext(query)), inputs, repeat=1)
+        print(f"{label:>22}: {per_query * 1e6:8.1f} us/query  ({pipeline.describe()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Pre-fork server: throughput against worker count, and memory per worker.
+
+Starts ``server.py`` with 1, 2, 4, ... workers (up to the CPUs available)
+against the fake Groq server with a short LLM latency, so the embedding
+and FAISS work dominates. Distinct queries keep the response cache out of
+the way. After each load run it reads /proc for the master and workers:
+USS is what a worker holds privately (its copy-on-write overhead), PSS
+sums to the real total, against N times a single process's RSS without
+sharing.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_prefork [--workers 1 2 4] [--seconds 20] [--clients 32]
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.common import load_logged_queries, memory_usage
+from benchmarks.fake_groq import FakeGroqServer
+from service.embeddings import container_cpus
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url: str, timeout: float = 300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/ready", timeout=2) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s")
+
+
+def post_chat(url: str, query: str):
+    request = urllib.request.Request(f"{url}/chat", data=json.dumps({"query": query}).encode(),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=60) as response:
+        response.read()
+
+
+def drive(url: str, queries, clients: int, seconds: float) -> float:
+    """Requests per second from ``clients`` threads posting distinct queries for ``seconds``"""
+    counter = iter(range(10 ** 9))
+    done = []
+    deadline = time.monotonic() + seconds
+
+    def client():
+        count = 0
+        while time.monotonic() < deadline:
+            i = next(counter)
+            post_chat(url, f"{queries[i % len(queries)]} ({i})")
+            count += 1
+        done.append(count)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(done) / (time.monotonic() - start)
+
+
+def children(pid: int):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+def main():
+    cpus = container_cpus()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=[n for n in (1, 2, 4, 8, 16) if n <= cpus] or [1])
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--llm-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    queries = load_logged_queries() or ["Giá dịch vụ dọn dẹp nhà là bao nhiêu?"]
+    print(f"{cpus} CPUs, {args.clients} clients, {args.seconds:.0f}s per run, fake LLM {args.llm_latency * 1e3:.0f} ms")
+    print(f"{'workers':>7} {'req/s':>8} {'speedup':>7} {'master RSS':>10} {'worker USS':>10} "
+          f"{'total PSS':>9} {'N x RSS':>8}  (MB)")
+    baseline = None
+    with FakeGroqServer(latency=args.llm_latency) as llm, tempfile.TemporaryDirectory() as tmp:
+        for workers in args.workers:
+            port = free_port()
+            url = f"http://127.0.0.1:{port}"
+            env = {
+                **os.environ,
+                "PORT": str(port),
+                "HOST": "127.0.0.1",
+                "CHAT_WORKERS": str(workers),
+                "GROQ_BASE_URL": llm.url,
+                "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "benchmark-placeholder"),
+                "LOG_FILE": os.path.join(tmp, f"server-{workers}.log"),
+            }
+            server = subprocess.Popen([sys.executable, "server.py"], env=env)
+            try:
+                wait_ready(url)
+                # Every worker warms up on its own; give the rest time to finish
+                time.sleep(2 + workers)
+                drive(url, queries, args.clients, min(5.0, args.seconds))
+                throughput = drive(url, queries, args.clients, args.seconds)
+                master = memory_usage(str(server.pid))
+                usages = [memory_usage(str(pid)) for pid in children(server.pid)]
+            finally:
+                server.terminate()
+                server.wait(60)
+            baseline = baseline or throughput
+            mb = 2 ** 20
+            worker_uss = sum(u["uss"] for u in usages) / max(1, len(usages)) / mb
+            total_pss = (master["pss"] + sum(u["pss"] for u in usages)) / mb
+            unshared = len(usages) * max((u["rss"] for u in usages), default=0) / mb
+            print(f"{workers:>7} {throughput:8.1f} {throughput / baseline:7.2f} {master['rss'] / mb:10.0f} "
+                  f"{worker_uss:10.0f} {total_pss:9.0f} {unshared:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""LLM-bypass rate of the local price quotes on a labelled query corpus.
+
+A query "bypasses" when it is answered from the price table without RAG or
+the LLM. Priced queries should bypass, the others (cancellation fees,
+payment, recipes, ...) must not. The old regex quoting is kept here as the
+baseline.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_pricing
+"""
+import json
+import os
+import re
+from types import SimpleNamespace
+from typing import List
+
+from benchmarks.common import time_per_call
+from service.classifications_rule import (
+    normalize_query,
+    refine_intent,
+    rule_based_classification,
+    setup_classification_rules
+)
+from service.pricing import PricingEngine
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pricing_queries.jsonl")
+SERVICE_INTENTS = ('cleaning_service', 'cooking_service', 'repair_service')
+PRICED_INTENTS = SERVICE_INTENTS + ('app_related', 'general')
+
+
+def legacy_quote(query: str) -> List[str]:
+    """Which services the original quote_prices regexes priced"""
+    parts = []
+    normalized_query = normalize_query(query)
+    area_match = re.search(r'(\d+)\s*m²', normalized_query)
+    if area_match and re.search(r'\b(clean|cleaning|dọn dẹp|dọn nhà|vệ sinh)\b', normalized_query, re.IGNORECASE):
+        parts.append("cleaning")
+    if (re.search(r'(\d+)\s*(người|people)', normalized_query) and re.search(r'(\d+)\s*(món|dishes)', normalized_query)
+            and re.search(r'(\d+\.?\d*)\s*(giờ|hour)', normalized_query)):
+        parts.append("cooking")
+    if (re.search(r'\b(split|portable|ceiling-mounted)\b', normalized_query, re.IGNORECASE)
+            and re.search(r'(\d+\.?\d*)\s*(hp|công suất)', normalized_query)):
+        parts.append("ac_repair")
+    return parts
+
+
+def classify(rules, query: str) -> str:
+    intent = rule_based_classification(rules, query)[0]
+    if intent == 'app_related':
+        intent = refine_intent(rules, normalize_query(query)) or intent
+    return intent
+
+
+def main():
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+    rules = SimpleNamespace()
+    setup_classification_rules(rules)
+    engine = PricingEngine.from_file()
+
+    def legacy_bypass(query):
+        return classify(rules, query) in SERVICE_INTENTS and bool(legacy_quote(query))
+
+    def engine_bypass(query):
+        return classify(rules, query) in PRICED_INTENTS and bool(engine.quote(query))
+
+    priced = [item["query"] for item in corpus if item["priced"]]
+    other = [item["query"] for item in corpus if not item["priced"]]
+    print(f"{len(priced)} pricing queries, {len(other)} other queries")
+    print(f"{'':>14} {'bypass rate':>12} {'false bypass':>13} {'quote (us)':>11}")
+    for label, bypass, quote in (("legacy regex", legacy_bypass, legacy_quote), ("price engine", engine_bypass, engine.quote)):
+        hits = sum(map(bypass, priced))
+        false_hits = [query for query in other if bypass(query)]
+        cost = time_per_call(quote, priced + other)
+        print(f"{label:>14} {hits / len(priced):12.0%} {len(false_hits) / len(other):13.0%} {cost * 1e6:11.1f}")
+        for query in false_hits:
+            print(f"{'':>14} false bypass: {query!r}")
+
+    missed = [query for query in priced if not engine_bypass(query)]
+    for query in missed:
+        print(f"price engine missed: {query!r} (intent {classify(rules, query)})")
+
+
+if __name__ == "__main__":
+    main()
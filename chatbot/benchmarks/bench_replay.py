@@ -0,0 +1,242 @@
+"""End-to-end replay of logged production queries with a stub LLM.
+
+The corpus comes from chatbot.log (or a JSONL / text file, see
+``load_query_corpus``) and is replayed in logged order, with repeats,
+against one or more targets at each concurrency level:
+
+    service  ChatService.process_query from a thread pool
+    async    ChatService.aprocess_query from concurrent tasks
+    app      POST /chat on the FastAPI app, in-process over ASGI
+
+Embeddings, FAISS and caches are the real ones; Groq is replaced by
+StubLLM with a fixed latency (plus an optional per-prompt-token cost).
+Caches are cleared before every run unless --warm is given.
+
+Each run reports client-side p50/p95/p99 latency and throughput, the mean
+time per stage and cache hit rates (from the metrics registry, so the app
+target is measured the same way), LLM calls and RSS. --json writes the
+results with the commit they were measured on; --baseline compares with
+such a file and prints the relative change.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_replay [--corpus chatbot.log] [--targets service async app]
+        [--concurrency 1 8 32] [--latency 0.3] [--json out.json] [--baseline old.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from benchmarks.common import CHATBOT_LOG, StubLLM, load_query_corpus, make_service, memory_usage, percentiles
+from service.metrics import REGISTRY
+
+TARGETS = ("service", "async", "app")
+_SAMPLE_RE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+_LABEL_RE = re.compile(r'(\w+)="([^"]*)"')
+
+
+def metrics_snapshot() -> Dict[tuple, float]:
+    """Current value of every sample in the registry, keyed by (name, labels)"""
+    samples = {}
+    for line in REGISTRY.render().splitlines():
+        match = _SAMPLE_RE.match(line)
+        if match:
+            name, labels, value = match.groups()
+            samples[(name, tuple(_LABEL_RE.findall(labels or "")))] = float(value)
+    return samples
+
+
+def summarize_metrics(before: Dict[tuple, float], after: Dict[tuple, float]) -> Dict:
+    """Per-stage mean milliseconds and per-cache hit rate between two snapshots"""
+    delta = {key: value - before.get(key, 0.0) for key, value in after.items()}
+    stages, caches = {}, {}
+    for (name, labels), value in delta.items():
+        labels = dict(labels)
+        if name == "chatbot_stage_seconds_count" and value:
+            stage = labels["stage"]
+            stages[stage] = {
+                "count": int(value),
+                "mean_ms": delta[("chatbot_stage_seconds_sum", (("stage", stage),))] / value * 1e3,
+            }
+        elif name == "chatbot_cache_lookups_total" and value:
+            counts = caches.setdefault(labels["cache"], {"hit": 0, "miss": 0})
+            counts[labels["result"]] += int(value)
+    hit_rates = {cache: counts["hit"] / (counts["hit"] + counts["miss"]) for cache, counts in caches.items()}
+    return {"stages": stages, "cache_hit_rate": hit_rates}
+
+
+def replay_service(service, queries: List[str], concurrency: int) -> List[float]:
+    def timed(query):
+        start = time.perf_counter()
+        service.process_query(query)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(timed, queries))
+
+
+async def replay_async(send, queries: List[str], concurrency: int) -> List[float]:
+    """``concurrency`` workers each send the next query as soon as their previous one is answered"""
+    pending = iter(queries)
+    latencies = []
+
+    async def worker():
+        for query in pending:
+            start = time.perf_counter()
+            await send(query)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def build_target(name: str, service, loop: asyncio.AbstractEventLoop):
+    """A callable replaying a query list at a given concurrency and returning per-request latencies
+
+    Async targets share one event loop: the service's semaphore binds to the
+    first loop that waits on it.
+    """
+    if name == "service":
+        return lambda queries, concurrency: replay_service(service, queries, concurrency)
+    if name == "async":
+        return lambda queries, concurrency: loop.run_until_complete(replay_async(service.aprocess_query, queries, concurrency))
+
+    import httpx
+    import main
+
+    main.chat_service = service
+
+    async def run(queries, concurrency):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+            async def send(query):
+                response = await client.post("/chat", json={"query": query})
+                response.raise_for_status()
+            return await replay_async(send, queries, concurrency)
+
+    return lambda queries, concurrency: loop.run_until_complete(run(queries, concurrency))
+
+
+def commit_id() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _change(new: float, before: float) -> str:
+    return f"{(new - before) / before:+.1%}" if before else "n/a"
+
+
+def compare(results: List[Dict], baseline_path: str):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {(run["target"], run["concurrency"]): run for run in baseline["runs"]}
+    print(f"\nvs {baseline_path} (commit {baseline.get('commit', '?')}), relative change:", file=sys.stderr)
+    print(f"{'target':>8} {'conc':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8}", file=sys.stderr)
+    for run in results:
+        old = previous.get((run["target"], run["concurrency"]))
+        if old is None:
+            continue
+        print(f"{run['target']:>8} {run['concurrency']:>5} "
+              + " ".join(f"{_change(run['latency_ms'][p], old['latency_ms'][p]):>8}" for p in ("p50", "p95", "p99"))
+              + f" {_change(run['throughput_rps'], old['throughput_rps']):>8}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=CHATBOT_LOG, help="chatbot.log, or a JSONL/text file of queries")
+    parser.add_argument("--limit", type=int, default=0, help="replay only the first N queries")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the corpus this many times per run")
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--latency", type=float, default=0.3, help="stub LLM latency in seconds")
+    parser.add_argument("--per-token", type=float, default=0.0, help="extra stub latency per prompt token")
+    parser.add_argument("--warm", action="store_true", help="keep the caches between runs")
+    parser.add_argument("--json", help="write the results to this file ('-' for stdout)")
+    parser.add_argument("--baseline", help="results of an earlier --json run to compare with")
+    args = parser.parse_args()
+
+    # The app module configures logging to chatbot.log on import; keep replayed traffic out of it
+    logging.getLogger().addHandler(logging.NullHandler())
+
+    queries = load_query_corpus(args.corpus)
+    if args.limit:
+        queries = queries[:args.limit]
+    if not queries:
+        sys.exit(f"No queries found in {args.corpus}")
+    queries = queries * args.repeat
+
+    llm = StubLLM(latency=args.latency, per_token=args.per_token)
+    service = make_service(llm)
+    with contextlib.redirect_stdout(sys.stderr):
+        service.warm_up()
+    print(f"{len(queries)} queries ({len(set(queries))} distinct) from {args.corpus}, "
+          f"stub LLM {args.latency * 1e3:.0f} ms", file=sys.stderr)
+
+    runs = []
+    print(f"{'target':>8} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'LLM calls':>9} {'RSS MB':>7}  cache hit rate", file=sys.stderr)
+    loop = asyncio.new_event_loop()
+    for target in args.targets:
+        replay = build_target(target, service, loop)
+        for concurrency in args.concurrency:
+            if not args.warm:
+                service.clear_cache()
+            llm.calls = 0
+            before = metrics_snapshot()
+            start = time.perf_counter()
+            latencies = replay(queries, concurrency)
+            elapsed = time.perf_counter() - start
+            stats = percentiles(latencies)
+            run = {
+                "target": target,
+                "concurrency": concurrency,
+                "requests": len(latencies),
+                "throughput_rps": len(latencies) / elapsed,
+                "latency_ms": {name: value * 1e3 for name, value in stats.items()},
+                "llm_calls": llm.calls,
+                "rss_mb": memory_usage()["rss"] / 2 ** 20,
+                **summarize_metrics(before, metrics_snapshot()),
+            }
+            runs.append(run)
+            hit_rates = " ".join(f"{cache}={rate:.0%}" for cache, rate in sorted(run["cache_hit_rate"].items()))
+            print(f"{target:>8} {concurrency:>5} {run['throughput_rps']:8.1f} {run['latency_ms']['p50']:8.1f} "
+                  f"{run['latency_ms']['p95']:8.1f} {run['latency_ms']['p99']:8.1f} {llm.calls:>9} "
+                  f"{run['rss_mb']:7.0f}  {hit_rates}", file=sys.stderr)
+            stages = ", ".join(f"{stage} {info['mean_ms']:.1f}" for stage, info in
+                               sorted(run["stages"].items(), key=lambda item: -item[1]["mean_ms"]))
+            print(f"{'':>14} stages (mean ms): {stages}", file=sys.stderr)
+    loop.close()
+
+    report = {
+        "commit": commit_id(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "corpus": os.path.abspath(args.corpus),
+        "queries": len(queries),
+        "distinct_queries": len(set(queries)),
+        "stub_latency_s": args.latency,
+        "stub_per_token_s": args.per_token,
+        "warm": args.warm,
+        "runs": runs,
+    }
+    if args.json == "-":
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    elif args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        compare(runs, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
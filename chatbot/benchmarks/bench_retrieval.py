@@ -0,0 +1,74 @@
+"""Retrieval quality and latency: dense FAISS vs. BM25 vs. hybrid.
+
+Each query in retrieval_queries.jsonl lists text markers; a retrieved chunk
+is relevant when it contains one of them. Reports hit rate (any relevant
+chunk in the top k), precision@k, MRR, context characters sent to the LLM
+and search latency with the retrieval cache cold and warm.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_retrieval
+"""
+import json
+import os
+import re
+import time
+from typing import Dict, List
+
+from benchmarks.common import make_service, percentiles
+from service.cache import InMemoryCache
+from service.chat_service import VECTORSTORE_PATH
+from service.retrieval import HYBRID_ALPHA, HybridRetriever, load_lexical_index
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "retrieval_queries.jsonl")
+CONFIGS = [("dense", 1.0, 3), ("dense", 1.0, 2), ("bm25", 0.0, 2), ("hybrid", HYBRID_ALPHA, 2), ("hybrid", HYBRID_ALPHA, 3)]
+
+
+def load_corpus(path: str = CORPUS_PATH) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def is_relevant(doc, markers: List[str]) -> bool:
+    text = re.sub(r"\s+", " ", doc.page_content)
+    return any(marker in text for marker in markers)
+
+
+def evaluate(retriever: HybridRetriever, corpus: List[Dict], embeddings: List[List[float]], k: int) -> Dict:
+    hits, precision, reciprocal_rank, context_chars, latencies = 0, 0.0, 0.0, 0, []
+    for item, embedding in zip(corpus, embeddings):
+        start = time.perf_counter()
+        docs = retriever.search(item["query"], embedding, k)
+        latencies.append(time.perf_counter() - start)
+        relevant = [is_relevant(doc, item["relevant"]) for doc in docs]
+        hits += any(relevant)
+        precision += sum(relevant) / k
+        reciprocal_rank += next((1 / (rank + 1) for rank, ok in enumerate(relevant) if ok), 0.0)
+        context_chars += sum(len(doc.page_content) for doc in docs)
+    n = len(corpus)
+    return {
+        'hit': hits / n,
+        'precision': precision / n,
+        'mrr': reciprocal_rank / n,
+        'context_chars': context_chars / n,
+        'p50': percentiles(latencies)['p50'],
+    }
+
+
+def main():
+    corpus = load_corpus()
+    service = make_service()
+    service.load()
+    embeddings = service.embeddings.embed_documents([item["query"] for item in corpus])
+    lexical_index = load_lexical_index(service.vector_store, VECTORSTORE_PATH)
+    print(f"{len(corpus)} queries over {len(lexical_index)} chunks")
+    print(f"{'retriever':>10} {'k':>2} {'hit':>6} {'P@k':>6} {'MRR':>6} {'ctx chars':>10} {'cold (us)':>10} {'cached (us)':>12}")
+    for name, alpha, k in CONFIGS:
+        retriever = HybridRetriever(service.vector_store, lexical_index, alpha=alpha, cache=InMemoryCache("retrieval"))
+        cold = evaluate(retriever, corpus, embeddings, k)
+        warm = evaluate(retriever, corpus, embeddings, k)
+        print(f"{name:>10} {k:>2} {cold['hit']:6.1%} {cold['precision']:6.2f} {cold['mrr']:6.2f} "
+              f"{cold['context_chars']:10.0f} {cold['p50'] * 1e6:10.1f} {warm['p50'] * 1e6:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
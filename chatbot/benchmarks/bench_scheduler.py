@@ -0,0 +1,196 @@
+"""LLM scheduler under synthetic overload, against a plain FIFO concurrency limit.
+
+Requests arrive open-loop at --overload times what the stub LLM can serve
+(--concurrency calls of --latency seconds each), a --rag-share of them
+FAQ answers and the rest general small talk. Each request does what the
+ChatService call sites do: take a slot, call the LLM, answer; a shed or
+timed-out request answers with its fallback at once.
+
+    fifo       a semaphore of the same size and the same token bucket, one
+               queue, nothing shed
+    scheduler  LLMScheduler: rag ahead of general, general shed when deep
+
+Reports, per class, the requests answered by the LLM, the ones that got
+the fallback and their latency percentiles, plus the scheduler's queue
+stats. Exits non-zero if the scheduler sheds or times out a rag request
+or serves rag no faster than the FIFO limit.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_scheduler [--seconds 5] [--overload 2] [--mode async threads] [--rpm 0]
+"""
+import argparse
+import asyncio
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+
+from benchmarks.common import StubLLM, percentiles
+from service.llm_scheduler import PRIORITIES, LLMOverloaded, LLMScheduler, TokenBucket
+
+PROMPT = "Giá dịch vụ dọn dẹp nhà là bao nhiêu?"
+
+
+class FifoLimit:
+    """One bounded pool, first come first served, optionally rate limited"""
+
+    def __init__(self, concurrency: int, rpm: float = 0):
+        self.semaphore = threading.Semaphore(concurrency)
+        self.async_semaphore = None
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rpm, concurrency) if rpm else None
+        self.bucket_lock = threading.Lock()
+
+    def _token_delay(self) -> float:
+        if self.bucket is None:
+            return 0.0
+        with self.bucket_lock:
+            return self.bucket.take()
+
+    @contextmanager
+    def slot(self, priority: str):
+        with self.semaphore:
+            while True:
+                delay = self._token_delay()
+                if not delay:
+                    break
+                time.sleep(delay)
+            yield
+
+    @asynccontextmanager
+    async def aslot(self, priority: str):
+        if self.async_semaphore is None:
+            self.async_semaphore = asyncio.Semaphore(self.concurrency)
+        async with self.async_semaphore:
+            while True:
+                delay = self._token_delay()
+                if not delay:
+                    break
+                await asyncio.sleep(delay)
+            yield
+
+    def stats(self):
+        return {}
+
+
+def arrivals(seconds: float, rate: float, rag_share: float, seed: int = 0):
+    """(offset, priority) of Poisson arrivals over ``seconds``"""
+    rng = random.Random(seed)
+    offset, schedule = 0.0, []
+    while True:
+        offset += rng.expovariate(rate)
+        if offset >= seconds:
+            return schedule
+        schedule.append((offset, 'rag' if rng.random() < rag_share else 'general'))
+
+
+def record(results, priority, start, answered):
+    results.append((priority, answered, time.perf_counter() - start))
+
+
+async def run_async(limiter, llm, schedule):
+    results = []
+
+    async def request(priority):
+        start = time.perf_counter()
+        try:
+            async with limiter.aslot(priority):
+                await llm.ainvoke(PROMPT)
+            record(results, priority, start, True)
+        except LLMOverloaded:
+            record(results, priority, start, False)
+
+    tasks = []
+    begin = time.perf_counter()
+    for offset, priority in schedule:
+        await asyncio.sleep(max(0.0, begin + offset - time.perf_counter()))
+        tasks.append(asyncio.ensure_future(request(priority)))
+    await asyncio.gather(*tasks)
+    return results
+
+
+def run_threads(limiter, llm, schedule):
+    results = []
+
+    def request(priority, start):
+        try:
+            with limiter.slot(priority):
+                llm.invoke(PROMPT)
+            record(results, priority, start, True)
+        except LLMOverloaded:
+            record(results, priority, start, False)
+
+    with ThreadPoolExecutor(max_workers=len(schedule) or 1) as pool:
+        begin = time.perf_counter()
+        for offset, priority in schedule:
+            time.sleep(max(0.0, begin + offset - time.perf_counter()))
+            pool.submit(request, priority, time.perf_counter())
+    return results
+
+
+def report(mode, name, results, stats):
+    by_class = {}
+    for priority in PRIORITIES:
+        answered = [seconds for p, ok, seconds in results if p == priority and ok]
+        fallback = [seconds for p, ok, seconds in results if p == priority and not ok]
+        by_class[priority] = (answered, fallback)
+        llm = percentiles(answered) if answered else {'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+        fast = percentiles(fallback)['p50'] if fallback else 0.0
+        print(f"{mode:>7} {name:>9} {priority:>7} {len(answered):8d} {len(fallback):8d} {llm['p50'] * 1e3:8.0f} "
+              f"{llm['p95'] * 1e3:8.0f} {llm['p99'] * 1e3:8.0f} {fast * 1e3:12.1f}")
+    if stats:
+        print(f"{'':>17} queue stats: {stats}")
+    return by_class
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--overload", type=float, default=2.0, help="offered load / LLM capacity")
+    parser.add_argument("--rag-share", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--rpm", type=float, default=0, help="token bucket rate, 0 for none")
+    parser.add_argument("--mode", nargs="+", default=["async", "threads"], choices=["async", "threads"])
+    args = parser.parse_args()
+
+    capacity = args.concurrency / args.latency
+    if args.rpm:
+        capacity = min(capacity, args.rpm / 60)
+    schedule = arrivals(args.seconds, capacity * args.overload, args.rag_share)
+    print(f"{len(schedule)} requests over {args.seconds:.0f}s at {args.overload:.1f}x the LLM capacity "
+          f"({capacity:.0f} req/s), {args.rag_share:.0%} rag, stub latency {args.latency * 1e3:.0f} ms")
+    print(f"{'mode':>7} {'limiter':>9} {'class':>7} {'answered':>8} {'fallback':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'fallback p50':>12}")
+
+    failures = []
+    for mode in args.mode:
+        rag_p95 = {}
+        for name in ("fifo", "scheduler"):
+            if name == "fifo":
+                limiter = FifoLimit(args.concurrency, args.rpm)
+            else:
+                limiter = LLMScheduler(max_concurrency=args.concurrency, requests_per_minute=args.rpm,
+                                       burst=args.concurrency)
+            llm = StubLLM(latency=args.latency)
+            if mode == "async":
+                results = asyncio.run(run_async(limiter, llm, schedule))
+            else:
+                results = run_threads(limiter, llm, schedule)
+            by_class = report(mode, name, results, limiter.stats())
+            rag, rag_fallback = by_class['rag']
+            rag_p95[name] = percentiles(rag)['p95'] if rag else float('inf')
+            if name == "scheduler" and rag_fallback:
+                failures.append(f"{mode}: {len(rag_fallback)} rag requests shed or timed out")
+        if rag_p95["scheduler"] >= rag_p95["fifo"]:
+            failures.append(f"{mode}: rag p95 {rag_p95['scheduler'] * 1e3:.0f} ms, FIFO {rag_p95['fifo'] * 1e3:.0f} ms")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
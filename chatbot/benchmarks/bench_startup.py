@@ -0,0 +1,71 @@
+"""Startup benchmark: import time of main, time to bind, to /ready and to the first answer.
+
+Starts uvicorn in a subprocess and polls it. The first query is a price
+quote, answered locally, so no Groq call is made.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_startup --port 8765
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+CHATBOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_QUERY = "Giá dọn dẹp nhà 50 m² là bao nhiêu?"
+
+
+def import_time() -> float:
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    env = {**os.environ, "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "benchmark-placeholder")}
+    out = subprocess.run([sys.executable, "-c", code], cwd=CHATBOT_DIR, env=env,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def wait_for(url: str, deadline: float, data: bytes = None) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(request, timeout=60) as response:
+                if response.status == 200:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(url)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    print(f"import main: {import_time() * 1000:.0f} ms")
+
+    base = f"http://127.0.0.1:{args.port}"
+    env = {**os.environ, "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "benchmark-placeholder")}
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port)],
+                              cwd=CHATBOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + args.timeout
+        healthy = wait_for(f"{base}/health", deadline)
+        ready = wait_for(f"{base}/ready", deadline)
+        body = json.dumps({"query": FIRST_QUERY}).encode()
+        answered = wait_for(f"{base}/chat", deadline, data=body)
+        print(f"/health (bound): {(healthy - start) * 1000:.0f} ms")
+        print(f"/ready (warm):   {(ready - start) * 1000:.0f} ms")
+        print(f"first answer:    {(answered - start) * 1000:.0f} ms")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Time to first chunk vs. full answer for /chat/stream with a fake streaming LLM.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_streaming --latency 2.0
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import StubLLM, make_service
+
+REPLY = ("Here is the answer: Trả lời: Dịch vụ dọn dẹp nhà có giá 140.000 VNĐ cho gói 2 giờ "
+         "với diện tích dưới 55 m². Với diện tích lớn hơn, giá được tính theo từng mét vuông.")
+
+
+async def measure(service, query: str):
+    start = time.perf_counter()
+    first = None
+    chunks = []
+    async for chunk in service.astream_query(query):
+        if first is None:
+            first = time.perf_counter() - start
+        chunks.append(chunk)
+    return first, time.perf_counter() - start, "".join(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=2.0, help="fake LLM generation time in seconds")
+    args = parser.parse_args()
+
+    service = make_service(StubLLM(latency=args.latency, reply=REPLY))
+
+    async def run():
+        start = time.perf_counter()
+        blocking_answer = (await service.aprocess_query("Chính sách hủy lịch như thế nào?")).message
+        blocking = time.perf_counter() - start
+        first, total, streamed_answer = await measure(service, "Chính sách hoàn tiền như thế nào?")
+        print(f"/chat        first byte after {blocking * 1000:7.1f} ms")
+        print(f"/chat/stream first chunk after {first * 1000:7.1f} ms, complete after {total * 1000:7.1f} ms")
+        print(f"same cleaned answer: {blocking_answer == streamed_answer}")
+        start = time.perf_counter()
+        cached = [chunk async for chunk in service.astream_query("Chính sách hoàn tiền như thế nào?")]
+        print(f"cached answer: {len(cached)} event in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Overhead of the per-request tracing (request_trace + stage timers).
+
+Usage (from the chatbot directory):
+    python -m benchmarks.bench_tracing
+"""
+from benchmarks.common import time_per_call
+from service.metrics import REGISTRY, request_trace, stage
+
+STAGES = ["response_cache", "classify", "content_filter", "language",
+          "embedding", "semantic_cache", "retrieval", "llm", "postprocess"]
+
+
+def traced_request(_):
+    with request_trace() as trace:
+        trace.intent = "app_related"
+        trace.record_cache("response", False)
+        for name in STAGES:
+            with stage(name):
+                pass
+
+
+def untraced_request(_):
+    for name in STAGES:
+        with stage(name):
+            pass
+
+
+def main():
+    inputs = list(range(20000))
+    traced = time_per_call(traced_request, inputs)
+    untraced = time_per_call(untraced_request, inputs)
+    print(f"traced request ({len(STAGES)} stages): {traced * 1e6:.1f} us")
+    print(f"stage timers without an active trace: {untraced * 1e6:.1f} us")
+    print(f"/metrics payload: {len(REGISTRY.render())} bytes")
+
+
+if __name__ == "__main__":
+    main()
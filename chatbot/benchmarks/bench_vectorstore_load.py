@@ -0,0 +1,66 @@
+"""Cold-start time and per-worker memory: pickled docstore vs. mmap serving format.
+
+Starts N fresh worker processes per format; each loads the store and reports
+its load time, RSS and PSS (PSS splits shared pages between processes, so
+it shows what page-cache sharing saves).
+
+Usage (from the chatbot directory, after `python -m service.mmap_store`):
+    python -m benchmarks.bench_vectorstore_load --workers 4
+"""
+import argparse
+import multiprocessing as mp
+import os
+import time
+
+from benchmarks.common import memory_usage
+
+VECTORSTORE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "vectorstores", "db_faiss")
+
+
+def load_worker(fmt: str, ready, release, results):
+    start = time.perf_counter()
+    if fmt == "pickle":
+        from langchain_community.vectorstores import FAISS
+        store = FAISS.load_local(VECTORSTORE_PATH, None, allow_dangerous_deserialization=True)
+    else:
+        from service.mmap_store import MmapVectorStore
+        store = MmapVectorStore(VECTORSTORE_PATH, None)
+    # One search so the index pages are actually read
+    store.index.search(store.index.reconstruct_n(0, min(store.index.ntotal, 1)), 1)
+    load_time = time.perf_counter() - start
+    ready.wait()
+    results.put((load_time, memory_usage()))
+    release.wait()
+
+
+def run(fmt: str, workers: int):
+    ctx = mp.get_context("spawn")
+    ready, release, results = ctx.Barrier(workers + 1), ctx.Barrier(workers + 1), ctx.Queue()
+    procs = [ctx.Process(target=load_worker, args=(fmt, ready, release, results)) for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    ready.wait()
+    # All workers are alive here, so PSS reflects the sharing between them
+    samples = [results.get() for _ in procs]
+    release.wait()
+    for proc in procs:
+        proc.join()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'format':>8} {'load (ms)':>10} {'RSS (MB)':>9} {'PSS (MB)':>9}")
+    for fmt in ("pickle", "mmap"):
+        samples = run(fmt, args.workers)
+        load = sum(s[0] for s in samples) / len(samples)
+        rss = sum(s[1]["rss"] for s in samples) / len(samples)
+        pss = sum(s[1]["pss"] for s in samples) / len(samples)
+        print(f"{fmt:>8} {load * 1000:10.1f} {rss / 2**20:9.1f} {pss / 2**20:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
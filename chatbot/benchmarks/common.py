@@ -0,0 +1,176 @@
+"""Shared helpers for the benchmark scripts.
+
+Run the benchmarks from the ``chatbot`` directory, e.g.
+``python -m benchmarks.bench_classification``.
+"""
+import asyncio
+import json
+import os
+import re
+import statistics
+import time
+from typing import Callable, Dict, List
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CHATBOT_LOG = os.path.join(REPO_DIR, "chatbot.log")
+REQUESTS_JSONL = os.path.join(REPO_DIR, "requests.jsonl")
+
+_LOGGED_QUERY_RE = re.compile(r"Classified intent for query '(.*)': \w+ \(confidence")
+_RAG_QUERY_RE = re.compile(r"^\S+ \S+ - INFO - Query: (.*)$")
+_ESCAPE_RE = re.compile(r"\\u([0-9a-fA-F]{4})")
+
+
+def _unescape(text: str) -> str:
+    return _ESCAPE_RE.sub(lambda m: chr(int(m.group(1), 16)), text)
+
+
+def load_logged_queries(path: str = CHATBOT_LOG) -> List[str]:
+    """Queries from a chatbot.log, in order (with repeats).
+
+    Reads both the JSON lines written by service.log_config and the older
+    text format. Every query has a "classified intent" record; logs without
+    them fall back to the RAG answer records ("Query: ..." lines). The old
+    Windows log is cp1252 text in which characters outside cp1252 were
+    written as \\uXXXX escapes.
+    """
+    if not os.path.exists(path):
+        return []
+    classified, answered = [], []
+    with open(path, "rb") as f:
+        for raw in f:
+            if raw.startswith(b"{"):
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    continue
+                if "query" in record:
+                    if record.get("msg") == "classified intent":
+                        classified.append(record["query"])
+                    elif record.get("msg") == "rag answer":
+                        answered.append(record["query"])
+                continue
+            line = raw.decode("cp1252", errors="replace").rstrip("\r\n")
+            match = _LOGGED_QUERY_RE.search(line)
+            if match:
+                classified.append(_unescape(match.group(1)))
+                continue
+            match = _RAG_QUERY_RE.match(line)
+            if match:
+                answered.append(_unescape(match.group(1)))
+    return classified or answered
+
+
+def load_query_corpus(path: str = CHATBOT_LOG) -> List[str]:
+    """Queries from a chatbot.log, or from a file with one JSON object (with a "query" field) or text per line"""
+    if path.endswith(".log"):
+        return load_logged_queries(path)
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                queries.append(json.loads(line)["query"] if line.startswith("{") else line)
+    return queries
+
+
+def load_request_texts(path: str = REQUESTS_JSONL) -> List[str]:
+    """Titles and bodies of the backlog requests (English prose)"""
+    if not os.path.exists(path):
+        return []
+    texts = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                request = json.loads(line)
+                texts.extend([request["title"], request["body"]])
+    return texts
+
+
+def time_per_call(fn: Callable, inputs: List, repeat: int = 5) -> float:
+    """Best-of-``repeat`` average seconds per call of ``fn`` over ``inputs``"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in inputs:
+            fn(item)
+        best = min(best, (time.perf_counter() - start) / len(inputs))
+    return best
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 of a list of latencies (seconds)"""
+    if not samples:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99), 'mean': statistics.fmean(ordered)}
+
+
+class StubMessage:
+    """Minimal stand-in for a LangChain AIMessage"""
+
+    def __init__(self, content: str):
+        self.content = content
+
+
+class StubLLM:
+    """Deterministic LLM replacement with a fixed per-call latency, plus an optional cost per prompt token"""
+
+    def __init__(self, latency: float = 0.2, reply: str = "Vui lòng liên hệ hotline 0347596789 để được hỗ trợ.",
+                 per_token: float = 0.0):
+        self.latency = latency
+        self.reply = reply
+        self.per_token = per_token
+        self.calls = 0
+        self.prompt_tokens = 0
+
+    def _latency(self, prompt) -> float:
+        from service.context_budget import estimate_tokens
+
+        tokens = estimate_tokens(str(prompt))
+        self.prompt_tokens += tokens
+        return self.latency + self.per_token * tokens
+
+    def invoke(self, prompt, **kwargs) -> StubMessage:
+        self.calls += 1
+        time.sleep(self._latency(prompt))
+        return StubMessage(self.reply)
+
+    async def ainvoke(self, prompt, **kwargs) -> StubMessage:
+        self.calls += 1
+        await asyncio.sleep(self._latency(prompt))
+        return StubMessage(self.reply)
+
+    async def astream(self, prompt, **kwargs):
+        """Yield the reply word by word, spreading the latency over the tokens"""
+        self.calls += 1
+        latency = self._latency(prompt)
+        tokens = self.reply.split(" ")
+        for i, token in enumerate(tokens):
+            await asyncio.sleep(latency / len(tokens))
+            yield StubMessage(token if i == 0 else " " + token)
+
+
+def make_service(llm=None):
+    """Build a real ChatService (embeddings + FAISS) with the LLM swapped for a stub"""
+    os.environ.setdefault("GROQ_API_KEY", "benchmark-placeholder")
+    from service.chat_service import ChatService
+
+    service = ChatService()
+    service.llm = llm or StubLLM()
+    return service
+
+
+def memory_usage(pid: str = "self") -> Dict[str, int]:
+    """RSS, PSS and USS in bytes from /proc (Linux)"""
+    usage = {'rss': 0, 'pss': 0, 'uss': 0}
+    fields = {'Rss:': 'rss', 'Pss:': 'pss', 'Private_Clean:': 'uss', 'Private_Dirty:': 'uss'}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in fields:
+                usage[fields[parts[0]]] += int(parts[1]) * 1024
+    return usage
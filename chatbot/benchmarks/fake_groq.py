@@ -0,0 +1,166 @@
+"""Local OpenAI/Groq-compatible chat completions server with injected faults.
+
+Serves ``POST .../chat/completions`` (plain and ``stream: true``) with a
+fixed reply. Each request first sleeps ``latency`` seconds, or
+``slow_latency`` with probability ``slow_rate``, then fails with a 503
+(``error_rate``) or 429 (``rate_limit_rate``) or answers. The settings can
+be changed while it runs, e.g. to simulate an outage.
+
+Usage (from the chatbot directory):
+    python -m benchmarks.fake_groq --port 8900 --latency 0.3 --error-rate 0.1
+    GROQ_BASE_URL=http://127.0.0.1:8900 uvicorn main:app
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = "Vui lòng liên hệ hotline 0347596789 để được hỗ trợ."
+
+
+class FakeGroqServer:
+    def __init__(self, port: int = 0, latency: float = 0.2, slow_latency: float = 3.0, slow_rate: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, reply: str = REPLY):
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self.slow_rate = slow_rate
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.reply = reply
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def configure(self, **settings):
+        for name, value in settings.items():
+            if not hasattr(self, name):
+                raise AttributeError(name)
+            setattr(self, name, value)
+
+    def start(self) -> "FakeGroqServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-groq", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, so pooled clients reuse connections
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    self._json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                with fake._lock:
+                    fake.requests += 1
+                time.sleep(fake.slow_latency if random.random() < fake.slow_rate else fake.latency)
+                roll = random.random()
+                if roll < fake.error_rate:
+                    self._json(503, {"error": {"message": "Service unavailable (injected)", "type": "internal_server_error"}})
+                elif roll < fake.error_rate + fake.rate_limit_rate:
+                    self._json(429, {"error": {"message": "Rate limited (injected)", "type": "rate_limit_exceeded"}},
+                               {"Retry-After": "0"})
+                elif body.get("stream"):
+                    self._stream(body)
+                else:
+                    self._json(200, self._completion(body))
+
+            def _json(self, status: int, payload, headers=None):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _usage(self, body):
+                prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+                completion_tokens = len(fake.reply.split())
+                return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens}
+
+            def _completion(self, body):
+                return {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": fake.reply},
+                                 "logprobs": None, "finish_reason": "stop"}],
+                    "usage": self._usage(body),
+                }
+
+            def _stream(self, body):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                words = fake.reply.split(" ")
+                for i, word in enumerate(words):
+                    chunk = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "fake"),
+                        "choices": [{"index": 0, "delta": {"role": "assistant", "content": word if i == 0 else " " + word},
+                                     "logprobs": None, "finish_reason": None}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                final = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": body.get("model", "fake"),
+                         "choices": [{"index": 0, "delta": {}, "logprobs": None, "finish_reason": "stop"}],
+                         "x_groq": {"usage": self._usage(body)}}
+                self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                self.close_connection = True
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Groq chat completions server with injected latency and errors")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--slow-latency", type=float, default=3.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = FakeGroqServer(args.port, args.latency, args.slow_latency, args.slow_rate, args.error_rate, args.rate_limit_rate)
+    print(f"Fake Groq listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from typing import Optional
-from chatbot.intent_type import IntentType
+from intent_type import IntentType
 
 @dataclass
 class ChatResponse:
@@ -8,4 +8,6 @@ class ChatResponse:
     intent: IntentType
     action_taken: bool = False
     order_id: Optional[str] = None
-    error: Optional[str] = None
\ No newline at end of file
+    error: Optional[str] = None
+    # Name of the pipeline stage that rejected the query, if any
+    rejected_by: Optional[str] = None
@@ -1,8 +1,25 @@
 from enum import Enum
+from typing import Optional
 
 
 class IntentType(Enum):
     CANCEL_ORDER = "cancel_order"
     GENERAL_INQUIRY = "general_inquiry"
     INAPPROPRIATE_CONTENT = "inappropriate_content"
-    APP_RELATED = "app_related"
\ No newline at end of file
+    APP_RELATED = "app_related"
+    GENERAL = "general"
+    CLEANING_SERVICE = "cleaning_service"
+    COOKING_SERVICE = "cooking_service"
+    REPAIR_SERVICE = "repair_service"
+    POLICY = "policy"
+    ACCOUNT = "account"
+    UNSUPPORTED_LANGUAGE = "unsupported_language"
+    INVALID_QUERY = "invalid_query"
+
+    @classmethod
+    def from_label(cls, label: Optional[str]) -> "IntentType":
+        """Map a classifier label onto the enum, unknown labels are general inquiries"""
+        try:
+            return cls(label)
+        except ValueError:
+            return cls.GENERAL_INQUIRY
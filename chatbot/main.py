@@ -1,11 +1,56 @@
+import asyncio
+import json
+import logging
 import os
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import List
+from dotenv import load_dotenv
+
+# Environment must be loaded before the service modules read their settings
+load_dotenv()
+
+from service.log_config import get_logger, log_event, setup_logging, stop_logging
+
+# JSON lines to chatbot.log, written by a background thread (see service/log_config.py)
+setup_logging()
+startup_logger = get_logger("startup")
+
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
 from service.chat_service import ChatService
+from service.metrics import REGISTRY, request_trace, stats_collector
+
+# Set CHAT_TIMING_HEADER=1 to return per-stage timings in an X-Timing header
+TIMING_HEADER = os.getenv("CHAT_TIMING_HEADER", "0") == "1"
+
+chat_service = ChatService()
+REGISTRY.add_collector(stats_collector("chatbot_cache", "Cache counters and sizes", chat_service.cache_stats))
+REGISTRY.add_collector(stats_collector("chatbot_llm_gateway", "LLM circuit breaker and latency window", chat_service.llm_stats))
+REGISTRY.add_collector(stats_collector("chatbot_llm_scheduler", "LLM scheduler queue depths, admissions and slots", chat_service.llm_scheduler_stats))
+REGISTRY.add_collector(stats_collector("chatbot_pipeline", "Pre-answer pipeline stage order, cost and outcomes", chat_service.pipeline_stats))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so uvicorn binds immediately; /ready reports when done
+    async def warm_up():
+        try:
+            await asyncio.get_running_loop().run_in_executor(chat_service.blocking_pool, chat_service.warm_up)
+            log_event(startup_logger, logging.INFO, "chat service warmed up")
+        except Exception as e:
+            log_event(startup_logger, logging.ERROR, "warm-up failed", error=repr(e))
 
-app = FastAPI(title="Chatbot API")
+    warm_up_task = asyncio.create_task(warm_up())
+    yield
+    warm_up_task.cancel()
+    stop_logging()
+
+
+app = FastAPI(title="Chatbot API", lifespan=lifespan)
 
 #Add CORS middleware for production
 app.add_middleware(
@@ -16,23 +61,61 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-chat_service = ChatService()
 class ChatRequest(BaseModel):
     query: str
 
+class ChatBatchRequest(BaseModel):
+    queries: List[str]
+
 @app.post("/chat")
-async def chat(request: ChatRequest):
-    response = chat_service.process_query(request.query)
-    return {"response": response}
+async def chat(request: ChatRequest, http_response: Response):
+    with request_trace() as trace:
+        response = await chat_service.aprocess_query(request.query)
+    if TIMING_HEADER:
+        http_response.headers["X-Timing"] = trace.timing_header()
+    return {"response": response.message}
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Server-Sent Events: one `data` event per text chunk, then a `done` event"""
+    async def events():
+        async for chunk in chat_service.astream_query(request.query):
+            yield f"data: {json.dumps({'delta': chunk}, ensure_ascii=False)}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/chat/batch")
+async def chat_batch(request: ChatBatchRequest):
+    try:
+        responses = await run_in_threadpool(chat_service.process_batch, request.queries)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return {"responses": responses}
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    if not chat_service.ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready"}
+
 if __name__ == "__main__":
+    # Development server; production runs server.py (pre-forked workers)
     import uvicorn
     port = int(os.getenv("PORT", 8000))  
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
+    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=os.getenv("CHAT_RELOAD", "1") == "1")
 
 
 
@@ -0,0 +1,225 @@
+"""Pre-fork production server for the chatbot API.
+
+The master binds the listening socket, loads the embedding model, the
+vectorstore with its BM25 index, the classification rules and the prompt
+templates once, then forks CHAT_WORKERS uvicorn workers that accept on the
+shared socket. The loaded memory is shared copy-on-write; gc.freeze()
+keeps the collector from writing to (and so copying) the pre-fork objects.
+Nothing runs inference before the fork, so the torch and OpenMP thread
+pools are only started in the workers, CHAT_WORKER_THREADS each. The
+Groq rate limit (LLM_REQUESTS_PER_MINUTE) is split evenly between them.
+
+With the ONNX backends each worker loads its own encoder: ONNX Runtime
+sessions do not survive a fork. The FAISS index and doc files are
+memory-mapped and shared through the page cache either way.
+
+Workers are recycled gracefully: after CHAT_WORKER_MAX_REQUESTS requests
+(plus up to CHAT_WORKER_MAX_REQUESTS_JITTER) a worker stops accepting,
+finishes its requests and exits, and the master forks a replacement.
+SIGHUP replaces all workers one by one; SIGTERM/SIGINT stop them, waiting
+up to CHAT_GRACEFUL_TIMEOUT seconds for in-flight requests.
+
+Usage (from the chatbot directory):
+    CHAT_WORKERS=4 python server.py
+"""
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Set
+
+from dotenv import load_dotenv
+
+# Environment must be loaded before the service modules read their settings
+load_dotenv()
+
+from service.log_config import get_logger, log_event, reset_after_fork, setup_logging, stop_logging
+
+# The master and every worker append to one file; only worker 0 rotates it
+setup_logging(rotate=False)
+
+from service.embeddings import EMBEDDING_BACKEND, build_embeddings, container_cpus
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 8000))
+WORKERS = int(os.getenv("CHAT_WORKERS", 0)) or container_cpus()
+WORKER_THREADS = int(os.getenv("CHAT_WORKER_THREADS", 0)) or max(1, container_cpus() // WORKERS)
+MAX_REQUESTS = int(os.getenv("CHAT_WORKER_MAX_REQUESTS", 0))
+MAX_REQUESTS_JITTER = int(os.getenv("CHAT_WORKER_MAX_REQUESTS_JITTER", MAX_REQUESTS // 10))
+GRACEFUL_TIMEOUT = float(os.getenv("CHAT_GRACEFUL_TIMEOUT", 30))
+# A worker exiting with an error sooner than this after its start delays the respawn
+MIN_WORKER_UPTIME = 5.0
+
+# OpenMP (FAISS, torch) reads this when it initializes, in the workers
+os.environ.setdefault("OMP_NUM_THREADS", str(WORKER_THREADS))
+
+logger = get_logger("server")
+
+
+def set_thread_counts(threads: int):
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+    if "faiss" in sys.modules:
+        sys.modules["faiss"].omp_set_num_threads(threads)
+
+
+class Master:
+    def __init__(self, workers: int = WORKERS, threads: int = WORKER_THREADS, host: str = HOST, port: int = PORT):
+        self.worker_count = workers
+        self.threads = threads
+        self.host = host
+        self.port = port
+        self.sock = None
+        # pid -> slot; slot 0 rotates the log file
+        self.workers: Dict[int, int] = {}
+        self.started_at: Dict[int, float] = {}
+        # Workers being replaced, not respawned when they exit
+        self.retiring: Set[int] = set()
+        self.stopping = False
+        self.restart_requested = False
+
+    def bind(self):
+        # "::" listens on IPv6 and, dual-stack, on IPv4 too
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(2048)
+        self.sock.set_inheritable(True)
+
+    def preload(self):
+        """Load everything the workers share, without running inference"""
+        import main
+        from service.prompts import TEMPLATES, prompt_template
+
+        chat_service = main.chat_service
+        if EMBEDDING_BACKEND == "hf":
+            chat_service.embeddings = build_embeddings(threads=self.threads)
+            chat_service.load()
+        else:
+            log_event(logger, logging.INFO, "ONNX encoder is loaded in each worker", backend=EMBEDDING_BACKEND)
+        for name in TEMPLATES:
+            prompt_template(name)
+        gc.collect()
+        gc.freeze()
+        log_event(logger, logging.INFO, "preloaded", backend=EMBEDDING_BACKEND, loaded=chat_service.loaded)
+
+    def spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self.run_worker(slot)
+            except BaseException as e:
+                log_event(logger, logging.ERROR, "worker failed", slot=slot, error=repr(e))
+                code = 1
+            finally:
+                stop_logging()
+                # Skip the master's atexit handlers
+                os._exit(code)
+        self.workers[pid] = slot
+        self.started_at[pid] = time.monotonic()
+        log_event(logger, logging.INFO, "worker started", pid=pid, slot=slot)
+
+    def run_worker(self, slot: int):
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, signal.SIG_DFL)
+        reset_after_fork()
+        setup_logging(rotate=slot == 0)
+        random.seed()
+        set_thread_counts(self.threads)
+
+        import uvicorn
+        import main
+
+        main.chat_service.after_fork(workers=self.worker_count)
+        if main.chat_service.embeddings is None:
+            main.chat_service.embeddings = build_embeddings(threads=self.threads)
+        limit = MAX_REQUESTS + random.randint(0, MAX_REQUESTS_JITTER) if MAX_REQUESTS else None
+        config = uvicorn.Config(
+            main.app,
+            lifespan="on",
+            limit_max_requests=limit,
+            timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+            log_config=None,
+            access_log=False,
+        )
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def reap(self):
+        """Collect exited workers and respawn them unless stopping or retiring"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = self.workers.pop(pid, None)
+            uptime = time.monotonic() - self.started_at.pop(pid, time.monotonic())
+            code = os.waitstatus_to_exitcode(status)
+            log_event(logger, logging.INFO, "worker exited", pid=pid, slot=slot, code=code, uptime=round(uptime, 1))
+            if pid in self.retiring:
+                self.retiring.discard(pid)
+            elif slot is not None and not self.stopping:
+                if code != 0 and uptime < MIN_WORKER_UPTIME:
+                    time.sleep(1)
+                self.spawn(slot)
+
+    def rolling_restart(self):
+        """Replace the workers one at a time; each old one finishes its requests first"""
+        self.restart_requested = False
+        for pid, slot in list(self.workers.items()):
+            if self.stopping:
+                return
+            self.retiring.add(pid)
+            os.kill(pid, signal.SIGTERM)
+            self.spawn(slot)
+            deadline = time.monotonic() + GRACEFUL_TIMEOUT
+            while pid in self.retiring and time.monotonic() < deadline:
+                self.reap()
+                time.sleep(0.1)
+
+    def shutdown(self):
+        for pid in self.workers:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in self.workers:
+            log_event(logger, logging.WARNING, "killing worker after the graceful timeout", pid=pid)
+            os.kill(pid, signal.SIGKILL)
+        self.sock.close()
+
+    def _on_stop(self, signum, frame):
+        self.stopping = True
+
+    def _on_hup(self, signum, frame):
+        self.restart_requested = True
+
+    def run(self):
+        self.bind()
+        self.preload()
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_hup)
+        for slot in range(self.worker_count):
+            self.spawn(slot)
+        log_event(logger, logging.INFO, "serving", host=self.host, port=self.port,
+                  workers=self.worker_count, threads=self.threads, max_requests=MAX_REQUESTS)
+        while not self.stopping:
+            self.reap()
+            if self.restart_requested:
+                self.rolling_restart()
+            time.sleep(0.5)
+        self.shutdown()
+        stop_logging()
+
+
+if __name__ == "__main__":
+    Master().run()
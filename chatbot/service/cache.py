@@ -0,0 +1,231 @@
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, Tuple
+
+from service.log_config import get_logger, log_event
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+INTENT_CACHE_TTL = float(os.getenv("INTENT_CACHE_TTL", 24 * 3600))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 3600))
+
+logger = get_logger("cache")
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    # Backend failures answered as a miss or ignored
+    errors: int = 0
+
+
+class CacheBackend(ABC):
+    """Interface shared by the cache backends (values are strings)"""
+
+    def __init__(self, name: str, ttl: Optional[float]):
+        self.name = name
+        self.ttl = ttl
+        self.stats = CacheStats()
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def peek(self, key: str) -> Optional[str]:
+        """get() without counting a hit or miss"""
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    @abstractmethod
+    def __contains__(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def size(self) -> Optional[int]:
+        """Number of entries, or None when it cannot be counted cheaply"""
+
+    def get_stats(self) -> Dict:
+        """Counters plus the current size, when known"""
+        size = self.size()
+        return {'name': self.name, **({'size': size} if size is not None else {}), **asdict(self.stats)}
+
+
+class InMemoryCache(CacheBackend):
+    """Thread-safe LRU cache with per-entry expiry, local to the process"""
+
+    def __init__(self, name: str, ttl: Optional[float] = None, max_entries: int = CACHE_MAX_ENTRIES):
+        super().__init__(name, ttl)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _live_entry(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            self.stats.expirations += 1
+            return None
+        return value
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._live_entry(key)
+            if value is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def peek(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._live_entry(key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._live_entry(key) is not None
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCache(CacheBackend):
+    """Cache stored in Redis so several workers share entries.
+
+    Size is bounded by the server's maxmemory policy (e.g. allkeys-lru), and
+    expiry is delegated to Redis TTLs. The size is not reported: counting
+    the keys would scan the keyspace on every metrics scrape. Any client exposing the redis-py API
+    (including fakeredis) can be passed in.
+
+    A Redis error never reaches the caller: it is logged and counted, reads
+    answer as a miss and writes are dropped, so an outage only costs the
+    cache hits.
+    """
+
+    def __init__(self, name: str, ttl: Optional[float] = None, client=None, url: str = REDIS_URL):
+        super().__init__(name, ttl)
+        try:
+            import redis
+        except ImportError as e:
+            if client is None:
+                raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from e
+            redis = None
+        if client is None:
+            client = redis.Redis.from_url(url)
+        self.client = client
+        # Without redis-py, an injected client can only fail with socket errors
+        self.errors = (redis.RedisError, OSError) if redis is not None else (OSError,)
+        self.prefix = f"chatbot:{name}:"
+
+    def _failed(self, operation: str, key: str, error: Exception):
+        self.stats.errors += 1
+        log_event(logger, logging.WARNING, "redis cache unavailable", cache=self.name, operation=operation,
+                  key=key, error=repr(error))
+
+    def _read(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            value = self._read(key)
+        except self.errors as e:
+            self._failed("get", key, e)
+            value = None
+        if value is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return value
+
+    def peek(self, key: str) -> Optional[str]:
+        try:
+            return self._read(key)
+        except self.errors as e:
+            self._failed("get", key, e)
+            return None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            # Millisecond expiry: ex= would round TTLs under 1s down to 0, which Redis rejects
+            self.client.set(self.prefix + key, value, px=max(1, int(ttl * 1000)) if ttl else None)
+        except self.errors as e:
+            self._failed("set", key, e)
+
+    def delete(self, key: str):
+        try:
+            self.client.delete(self.prefix + key)
+        except self.errors as e:
+            self._failed("delete", key, e)
+
+    def clear(self):
+        try:
+            keys = list(self.client.scan_iter(match=self.prefix + "*"))
+            if keys:
+                self.client.delete(*keys)
+        except self.errors as e:
+            self._failed("clear", "*", e)
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            return bool(self.client.exists(self.prefix + key))
+        except self.errors as e:
+            self._failed("exists", key, e)
+            return False
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+def create_cache(name: str, ttl: Optional[float], backend: str = CACHE_BACKEND, **kwargs) -> CacheBackend:
+    """Build the cache backend selected by CACHE_BACKEND"""
+    if backend == "memory":
+        return InMemoryCache(name, ttl, **kwargs)
+    if backend == "redis":
+        return RedisCache(name, ttl, **kwargs)
+    raise ValueError(f"Unknown cache backend: {backend}")
@@ -1,99 +1,204 @@
+import asyncio
+import contextvars
 import json
 import logging
-import re
-from typing import Dict
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_core.prompts import ChatPromptTemplate
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import os
 
+from chat_response import ChatResponse
+from intent_type import IntentType
+from service.cache import INTENT_CACHE_TTL, RESPONSE_CACHE_TTL, InMemoryCache, create_cache
 from service.content_filter import ContentFilter
+from service.context_budget import budget_context
+from service.language_id import LanguageIdentifier
+from service.llm_gateway import LLMGateway, LLMUnavailable, build_groq_client
+from service.llm_scheduler import LLM_REQUESTS_PER_MINUTE, LLMOverloaded, LLMScheduler
+from service.log_config import get_logger, log_event, log_payload
+from service.metrics import current_trace, job_trace, request_trace, stage
+from service.pipeline import PIPELINE_ORDER, Pipeline, QueryContext, Stage
+from service.pricing import PricingEngine
+from service.retrieval import RETRIEVAL_CACHE_TTL, RETRIEVAL_K, HybridRetriever
+from service.postprocess import StreamingAnswerCleaner, clean_answer
+from service.prompts import TEMPLATES, prompt_template
+from service.semantic_cache import SemanticCache
+from service.single_flight import SingleFlight
 from service.classifications_rule import (
     get_query_hash,
     normalize_query,
+    refine_intent,
     rule_based_classification,
     setup_classification_rules
 )
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  
 VECTORSTORE_PATH = os.path.join(BASE_DIR, "vectorstores", "db_faiss")
-print(f"Loading vectorstore from: {VECTORSTORE_PATH}")
-logging.basicConfig(filename='chatbot.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-load_dotenv()
+WARMUP_QUERY = "Giá dịch vụ dọn dẹp nhà là bao nhiêu?"
+# Intents assigned by refine_intent, i.e. only after a keyword match
+KEYWORD_INTENTS = ('cleaning_service', 'cooking_service', 'repair_service', 'policy', 'account')
+# Intents answered from the FAQ vectorstore
+RAG_INTENTS = ('cleaning_service', 'cooking_service', 'repair_service', 'app_related', 'policy', 'account')
+# Intents tried against the local price table first ("nấu ăn cho 4 người..." can classify as general)
+PRICED_INTENTS = ('cleaning_service', 'cooking_service', 'repair_service', 'app_related', 'general')
+MAX_QUERY_CHARS = int(os.getenv("CHAT_MAX_QUERY_CHARS", 2000))
+
+EMPTY_QUERY_MESSAGE = "Vui lòng nhập câu hỏi để tôi có thể hỗ trợ bạn."
+QUERY_TOO_LONG_MESSAGE = f"Câu hỏi quá dài. Vui lòng rút gọn câu hỏi (tối đa {MAX_QUERY_CHARS} ký tự)."
+UNSUPPORTED_LANGUAGE_MESSAGE = "Xin lỗi, tôi không hỗ trợ ngôn ngữ này. Vui lòng sử dụng tiếng Việt hoặc tiếng Anh."
+INAPPROPRIATE_MESSAGE = "Xin lỗi, tôi không thể xử lý tin nhắn chứa ngôn từ không phù hợp. Vui lòng sử dụng ngôn từ lịch sự để tôi có thể hỗ trợ bạn tốt hơn."
+ERROR_MESSAGE = "Xin lỗi, có lỗi xảy ra. Vui lòng thử lại."
+LLM_UNAVAILABLE_MESSAGE = "Hệ thống đang quá tải, tôi chưa thể trả lời câu hỏi này. Vui lòng thử lại sau hoặc liên hệ hotline 0347596789 để được hỗ trợ."
+GENERAL_SHED_MESSAGE = "Hiện tại tôi đang ưu tiên các câu hỏi về dịch vụ và tài khoản. Vui lòng thử lại sau ít phút hoặc hỏi tôi về dịch vụ, giá cả, chính sách của ứng dụng."
+FAQ_ONLY_PREFIX = "Thông tin liên quan trong tài liệu hỗ trợ:"
+FAQ_ONLY_SUFFIX = "Vui lòng liên hệ hotline 0347596789 nếu bạn cần hỗ trợ thêm."
+# Context kept for the FAQ-only answer given while the LLM is unavailable
+FAQ_ONLY_TOKEN_BUDGET = int(os.getenv("FAQ_ONLY_TOKEN_BUDGET", 120))
+
+service_logger = get_logger("service")
+classify_logger = get_logger("classify")
+rag_logger = get_logger("rag")
+llm_logger = get_logger("llm")
+
+# Async serving limits
+MAX_CONCURRENT_QUERIES = int(os.getenv("CHAT_MAX_CONCURRENCY", 32))
+BLOCKING_POOL_SIZE = int(os.getenv("CHAT_BLOCKING_THREADS", 4))
+EMBEDDING_TIMEOUT = float(os.getenv("CHAT_EMBEDDING_TIMEOUT", 5))
+SEARCH_TIMEOUT = float(os.getenv("CHAT_SEARCH_TIMEOUT", 2))
+LLM_TIMEOUT = float(os.getenv("CHAT_LLM_TIMEOUT", 30))
+
+# Batch API limits
+BATCH_MAX_QUERIES = int(os.getenv("CHAT_BATCH_MAX_QUERIES", 500))
+BATCH_LLM_CONCURRENCY = int(os.getenv("CHAT_BATCH_LLM_CONCURRENCY", 8))
+
 class ChatService:
     def __init__(self):
-        self.llm = ChatGroq(
-            api_key=os.getenv("GROQ_API_KEY"),
-            model_name="llama3-8b-8192"
-        )
-        self.embeddings = HuggingFaceEmbeddings(
-        model_name="keepitreal/vietnamese-sbert",
-        model_kwargs={"device": "cpu"},  
-        encode_kwargs={"normalize_embeddings": True} 
-    )
-        self.vector_store = FAISS.load_local(VECTORSTORE_PATH, self.embeddings, allow_dangerous_deserialization=True)
+        # Models are loaded by load()/warm_up(), not at construction
+        self.llm = None
+        # Priority queues and the Groq rate limit in front of every LLM call
+        self.llm_scheduler = LLMScheduler()
+        self.embeddings = None
+        self.vector_store = None
+        self.retriever = None
+        self.loaded = False
+        self.ready = False
+        self._load_lock = threading.Lock()
         self.content_filter = ContentFilter()
+        self.language_identifier = LanguageIdentifier()
+        self.pricing = PricingEngine.from_file()
 
         #cache intent - responses
-        self.intent_cache: Dict[str, str] = {}
-        self.response_cache: Dict[str, str] = {}
+        self.intent_cache = create_cache("intent", INTENT_CACHE_TTL)
+        self.response_cache = create_cache("response", RESPONSE_CACHE_TTL)
+        self.semantic_cache = SemanticCache(source_path=VECTORSTORE_PATH)
+        # Rows of the loaded index, so never shared between workers
+        self.retrieval_cache = InMemoryCache("retrieval", RETRIEVAL_CACHE_TTL)
+        # Identical queries arriving while one is being answered wait for that answer
+        self.in_flight = SingleFlight("query")
+
+        # Embedding and FAISS search are CPU-bound, keep them off the event loop
+        self.blocking_pool = ThreadPoolExecutor(max_workers=BLOCKING_POOL_SIZE, thread_name_prefix="chat-blocking")
+        self.query_semaphore = asyncio.Semaphore(MAX_CONCURRENT_QUERIES)
 
         # Define deterministic rules
         setup_classification_rules(self)
-    def llm_classification_with_constraints(self, query: str) -> str:
-        """LLM classification with strict constraints"""
-        intent_prompt = ChatPromptTemplate.from_template(
-            """You are a STRICT intent classifier for a house cleaning service app.
 
-        CLASSIFICATION RULES:
-        1. If query mentions: price, cost, fee, charge, rate + cleaning/house/service → ALWAYS "app_related"
-        2. If query mentions: booking, schedule, appointment + cleaning/house/service → ALWAYS "app_related"  
-        3. If query mentions: cancel, policy, refund + cleaning/house/service → ALWAYS "app_related"
-        4. If query mentions: app, login, account, weekend service → ALWAYS "app_related"
-        5. If query about: cooking, recipes, weather, news, travel → ALWAYS "general"
+        # Cheap rejections run before classification unless CHAT_PIPELINE_ORDER says otherwise;
+        # language ID runs after it, only for queries no Vietnamese keyword matched
+        self.pipeline = Pipeline([
+            Stage("length", 1, self.check_length),
+            Stage("content_filter", 15, self.check_content),
+            Stage("language", 30, self.check_language, skip=lambda context: context.intent in KEYWORD_INTENTS,
+                  after=("classify",)),
+            Stage("classify", 60, self.check_intent),
+        ], PIPELINE_ORDER)
+        log_event(service_logger, logging.INFO, "query pipeline", stages=self.pipeline.describe())
+
+    def load(self):
+        """Import and load the LLM client, embedding model and vectorstore (idempotent)"""
+        if self.loaded:
+            return
+        with self._load_lock:
+            if self.loaded:
+                return
+            if self.llm is None:
+                self.llm = LLMGateway(build_groq_client())
+            if self.embeddings is None:
+                from service.embeddings import build_embeddings
+                self.embeddings = build_embeddings()
+            if self.vector_store is None:
+                from service.mmap_store import load_vectorstore
+                log_event(service_logger, logging.INFO, "loading vectorstore", path=VECTORSTORE_PATH)
+                self.vector_store = load_vectorstore(VECTORSTORE_PATH, self.embeddings)
+            if self.retriever is None:
+                self.retriever = HybridRetriever.load(self.vector_store, VECTORSTORE_PATH, cache=self.retrieval_cache)
+            self.loaded = True
+
+    def after_fork(self, workers: int = 1):
+        """In a pre-forked worker: new thread pool, locks and LLM connections instead of the master's.
+
+        The Groq quota is per API key, so each of ``workers`` gets its share.
+        """
+        self._load_lock = threading.Lock()
+        self.llm_scheduler = LLMScheduler(requests_per_minute=LLM_REQUESTS_PER_MINUTE / workers)
+        self.blocking_pool = ThreadPoolExecutor(max_workers=BLOCKING_POOL_SIZE, thread_name_prefix="chat-blocking")
+        self.query_semaphore = asyncio.Semaphore(MAX_CONCURRENT_QUERIES)
+        self.in_flight = SingleFlight("query")
+        if isinstance(self.llm, LLMGateway):
+            self.llm = LLMGateway(build_groq_client())
 
-        EXAMPLES:
-        - "How much does clean house service cost?" → app_related
-        - "What's the price of cleaning service?" → app_related
-        - "How to cook pho?" → general
-        - "Weather today?" → general
+    def warm_up(self):
+        """Load everything and run one embedding + search so the first request is not cold"""
+        self.load()
+        embedding = self.embeddings.embed_query(WARMUP_QUERY)
+        self.retriever.search(WARMUP_QUERY, embedding, RETRIEVAL_K)
+        self.detect_language(WARMUP_QUERY)
+        for name in TEMPLATES:
+            prompt_template(name)
+        self.ready = True
 
-        Query: {query}
+    async def aload(self):
+        """load() without blocking the event loop"""
+        if not self.loaded:
+            await asyncio.get_running_loop().run_in_executor(self.blocking_pool, self.load)
 
-        RESPOND WITH ONLY: {{"intent": "app_related"}} OR {{"intent": "general"}} OR {{"intent": "inappropriate_content"}} NO OTHER TEXT.""")
+    async def run_blocking(self, timeout: float, fn, *args):
+        """Run a blocking call on the bounded thread pool with a timeout"""
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(loop.run_in_executor(self.blocking_pool, fn, *args), timeout)
+
+    def llm_classification_with_constraints(self, query: str) -> str:
+        """LLM classification with strict constraints"""
         
         try:
-            response = self.llm.invoke(intent_prompt.format(query=query))
+            # Every query may need it, so it queues with the FAQ answers
+            with self.llm_scheduler.slot('rag'):
+                response = self.llm.invoke(prompt_template("intent").format(query=query))
+        except LLMUnavailable as e:
+            log_event(classify_logger, logging.WARNING, "LLM classification unavailable, using keywords", error=str(e))
+            return self.keyword_based_classification(query)
+        try:
             intent_data = json.loads(response.content.strip())
             return intent_data.get('intent', 'app_related')
-        except:
+        except (ValueError, AttributeError):
+            log_event(classify_logger, logging.WARNING, "unparseable LLM classification", content=response.content)
             return 'app_related'  # Default to app_related for service app
 
     def classify_intent(self, query: str) -> str:
         """Classify with caching"""
         query_hash = get_query_hash(self, query)
         
-        if query_hash in self.intent_cache:
-            return self.intent_cache[query_hash]
+        cached_intent = self.intent_cache.get(query_hash)
+        current_trace().record_cache("intent", cached_intent is not None)
+        if cached_intent is not None:
+            return cached_intent
         
         intent, confidence, matches = rule_based_classification(self, query)
         # Refine intent for specific categories
         if intent == 'app_related':
-            normalized_query = normalize_query(query)
-            if re.search(r'\b(clean|cleaning|dọn dẹp|dọn nhà|vệ sinh)\b', normalized_query, re.IGNORECASE):
-                intent = 'cleaning_service'
-            elif re.search(r'\b(cook|cooking|nấu ăn|đầu bếp)\b', normalized_query, re.IGNORECASE):
-                intent = 'cooking_service'
-            elif re.search(r'\b(ac|air conditioner|điều hòa|máy lạnh|tivi|ô tô|thợ điện|thợ ống nước|vận chuyển)\b', normalized_query, re.IGNORECASE):
-                intent = 'repair_service'
-            elif re.search(r'\b(cancel|hủy|refund|hoàn tiền|payment|thanh toán)\b', normalized_query, re.IGNORECASE):
-                intent = 'policy'
-            elif re.search(r'\b(account|login|register|đăng nhập|đăng ký|password|mật khẩu|delete account|xóa tài khoản|hủy lịch|cancel job|refund|hoàn tiền)\b', normalized_query, re.IGNORECASE):
-                intent = 'account'
+            intent = refine_intent(self, normalize_query(query)) or intent
         # Cache result
-        self.intent_cache[query_hash] = intent
-        logging.info(f"Classified intent for query '{query}': {intent} (confidence: {confidence})")
+        self.intent_cache.set(query_hash, intent)
+        log_event(classify_logger, logging.INFO, "classified intent", query=query, intent=intent, confidence=confidence)
         return intent
     
     def keyword_based_classification(self, query: str) -> str:
@@ -114,190 +219,504 @@ class ChatService:
 
     def detect_language(self, query: str) -> str:
         """Detect language of the query"""
-        common_english_words = ['hello', 'hi', 'ok', 'thanks', 'sorry']
-        normalized_query = normalize_query(query)
-        if len(normalized_query.split()) <= 2 and any(word in normalized_query for word in common_english_words):
-            return 'vi'
-        try:
-            from langdetect import detect
-            lang = detect(query)
-            if lang == 'vi' or lang == 'en':
-                return lang
-            return 'other'
-        except Exception as e:
-            logging.error(f"Language detection error: {e}")
-            return 'vi'
-    
-    def calculate_ac_repair_cost(self, ac_type: str, hp: float) -> str:
-        """Calculate AC repair cost based on type and horsepower"""
-        prices = {
-            'portable': 140000,
-            'split': 250000,
-            'ceiling-mounted': 280000
-        }
-        base_price = prices.get(ac_type.lower(), 250000) 
-        additional = 20000 if hp > 2 else 0
-        total = base_price + additional
-        return f"{base_price:,} VNĐ (sửa điều hòa {ac_type}) + {additional:,} VNĐ phụ thu (> 2 HP) = {total:,} VNĐ"
+        return self.language_identifier.detect(query)
+
+    # Pipeline stages: return a ChatResponse to reject the query, None to continue
+    def check_length(self, context: QueryContext) -> Optional[ChatResponse]:
+        if not context.query.strip():
+            return ChatResponse(message=EMPTY_QUERY_MESSAGE, intent=IntentType.INVALID_QUERY)
+        if len(context.query) > MAX_QUERY_CHARS:
+            return ChatResponse(message=QUERY_TOO_LONG_MESSAGE, intent=IntentType.INVALID_QUERY)
+        return None
+
+    def check_content(self, context: QueryContext) -> Optional[ChatResponse]:
+        is_inappropriate, context.detected_words = self.content_filter.is_inappropriate(context.query)
+        if is_inappropriate:
+            return ChatResponse(message=INAPPROPRIATE_MESSAGE, intent=IntentType.INAPPROPRIATE_CONTENT)
+        return None
+
+    def check_language(self, context: QueryContext) -> Optional[ChatResponse]:
+        context.lang = self.detect_language(context.query)
+        if context.lang == 'other':
+            return ChatResponse(message=UNSUPPORTED_LANGUAGE_MESSAGE, intent=IntentType.UNSUPPORTED_LANGUAGE)
+        return None
+
+    def check_intent(self, context: QueryContext) -> Optional[ChatResponse]:
+        context.intent = self.classify_intent(context.query)
+        log_event(classify_logger, logging.DEBUG, "query intent", query=context.query, intent=context.intent)
+        if context.intent == 'inappropriate_content':
+            return ChatResponse(message=INAPPROPRIATE_MESSAGE, intent=IntentType.INAPPROPRIATE_CONTENT)
+        return None
     
-    # Calculate costs for specific services
-    def calculate_cleaning_cost(self, area: float) -> str:
-        """Calculate cleaning cost based on area"""
-        if area <= 55:
-            return f"140.000 VNĐ (gói 2 giờ cho ≤ 55 m²)"
-        elif area <= 85:
-            price = area * 2000
-            return f"Diện tích dưới ≤ 85 m² được tính với giá {price} VNĐ"
-        elif area <= 105:
-            price = area * 2500
-            return f"Diện tích dưới ≤ 105 m² được tính với giá {price} VNĐ"
-        else:
-            price = area * 2000
-            return f"Diện tích dưới ≥ 105 m² được tính với giá {price} VNĐ"
-
-    def calculate_cooking_cost(self, people: int, dishes: int, hours: float) -> str:
-        """Calculate cooking cost based on people, dishes, and hours"""
-        if people <= 4:
-            if hours <= 2:
-                base_price = 145000
-            else:
-                base_price = 220000
-            additional = 20000 if dishes <= 3 else 35000
-        else:
-            if hours <= 2.5:
-                base_price = 180000
-            else:
-                base_price = 250000
-            additional = 30000 if dishes <= 3 else 45000
-        total = base_price + additional
-        return f"{base_price:,} VNĐ (gói {hours} giờ cho {people} người) + {additional:,} VNĐ phụ thu ({dishes} món) = {total:,} VNĐ"
+    def quote_prices(self, query: str) -> List[str]:
+        """Compute prices locally for the services mentioned in the query"""
+        return self.pricing.quote(query)
 
-    def handle_combined_query(self, query: str) -> str:
+    def handle_combined_query(self, query: str, intent: str = 'app_related') -> str:
         """Handle complex queries involving multiple services"""
-        parts = []
-        normalized_query = normalize_query(query)
+        with stage("price_quote"):
+            parts = self.quote_prices(query)
+        if parts:
+            return "\n".join(parts)
+        if intent in RAG_INTENTS:
+            return self.handle_app_related_query(query, intent)
+        return self.handle_general_query(query)
 
-        # Check for cleaning service
-        area_match = re.search(r'(\d+)\s*m²', normalized_query)
-        if area_match and re.search(r'\b(clean|cleaning|dọn dẹp|dọn nhà|vệ sinh)\b', normalized_query, re.IGNORECASE):
-            area = float(area_match.group(1))
-            parts.append(f"Dọn dẹp nhà: {self.calculate_cleaning_cost(area)}")
-
-        # Check for cooking service
-        people_match = re.search(r'(\d+)\s*(người|people)', normalized_query)
-        dishes_match = re.search(r'(\d+)\s*(món|dishes)', normalized_query)
-        hours_match = re.search(r'(\d+\.?\d*)\s*(giờ|hour)', normalized_query)
-        if people_match and dishes_match and hours_match:
-            people = int(people_match.group(1))
-            dishes = int(dishes_match.group(1))
-            hours = float(hours_match.group(1))
-            if people <= 8:  # Max 8 people per document
-                parts.append(f"Nấu ăn: {self.calculate_cooking_cost(people, dishes, hours)}")
-            else:
-                parts.append("Dịch vụ nấu ăn chỉ hỗ trợ tối đa 8 người. Vui lòng liên hệ hotline 0347596789 để được tư vấn.")
-
-        # Check for AC repair
-        ac_match = re.search(r'\b(split|portable|ceiling-mounted)\b', normalized_query, re.IGNORECASE)
-        hp_match = re.search(r'(\d+\.?\d*)\s*(hp|công suất)', normalized_query)
-        if ac_match and hp_match:
-            ac_type = ac_match.group(1)
-            hp = float(hp_match.group(1))
-            parts.append(f"Sửa điều hòa: {self.calculate_ac_repair_cost(ac_type, hp)}")
-            
+    async def ahandle_combined_query(self, query: str, intent: str = 'app_related') -> str:
+        """Async variant of handle_combined_query"""
+        with stage("price_quote"):
+            parts = self.quote_prices(query)
         if parts:
             return "\n".join(parts)
-        return self.handle_app_related_query(query)
+        if intent in RAG_INTENTS:
+            return await self.ahandle_app_related_query(query, intent)
+        return await self.ahandle_general_query(query)
     
-    def process_query(self, query: str) -> str:
+    def process_query(self, query: str) -> ChatResponse:
 
-        query_hash = get_query_hash(self, query)
-        if query_hash in self.response_cache:
-            return self.response_cache[query_hash]
-        
+        with request_trace() as trace:
+            query_hash = get_query_hash(self, query)
+            with stage("response_cache"):
+                cached_response = self.response_cache.get(query_hash)
+            trace.record_cache("response", cached_response is not None)
+            if cached_response is not None:
+                return self.cached_chat_response(query_hash, cached_response)
+            
+            return self.in_flight.do(query_hash, self._answer_query, query, query_hash)
+
+    def _answer_query(self, query: str, query_hash: str) -> ChatResponse:
+        """Answer a query missing from the response cache (one run per set of concurrent identical queries)"""
+        trace = current_trace()
+        intent = None
         try:
-            intent = self.classify_intent(query)
-            print(f"Query: '{query}' → Intent: {intent}")
-            is_inappropriate, detected_words = self.content_filter.is_inappropriate(query)
-            lang = self.detect_language(query)
-            if lang == 'other':
-                return "Xin lỗi, tôi không hỗ trợ ngôn ngữ này. Vui lòng sử dụng tiếng Việt hoặc tiếng Anh."
-            elif is_inappropriate or intent == 'inappropriate_content':
-                    return "Xin lỗi, tôi không thể xử lý tin nhắn chứa ngôn từ không phù hợp. Vui lòng sử dụng ngôn từ lịch sự để tôi có thể hỗ trợ bạn tốt hơn.",
-            elif intent in ['cleaning_service', 'cooking_service', 'repair_service']:
-                response = self.handle_combined_query(query)
+            self.load()
+            intent, rejection = self.precheck(query)
+            if rejection is not None:
+                return rejection
+            elif intent in PRICED_INTENTS:
+                response = self.handle_combined_query(query, intent)
             else:
-                response = self.handle_app_related_query(query) if intent in ['app_related', 'policy', 'account'] else self.handle_general_query(query)
-            # Cache the response
-            self.response_cache[query_hash] = response
-            return response
+                response = self.handle_app_related_query(query, intent) if intent in ['app_related', 'policy', 'account'] else self.handle_general_query(query)
+            # Cache the response (not the stand-in answers given while the LLM is down)
+            if not trace.degraded:
+                self.response_cache.set(query_hash, response)
+            return ChatResponse(message=response, intent=IntentType.from_label(intent))
                 
         except Exception as e:
-            print(f"Error processing query: {e}")
-            error_response = "Xin lỗi, có lỗi xảy ra. Vui lòng thử lại."
-            self.response_cache[query_hash] = error_response
-            return error_response
+            # Failures are never cached so the next attempt retries
+            log_event(service_logger, logging.ERROR, "query failed", query=query, error=repr(e))
+            return ChatResponse(message=ERROR_MESSAGE, intent=IntentType.from_label(intent), error=repr(e))
 
+    async def aprocess_query(self, query: str) -> ChatResponse:
+        """Non-blocking variant of process_query for the async endpoints"""
+        with request_trace() as trace:
+            query_hash = get_query_hash(self, query)
+            with stage("response_cache"):
+                cached_response = self.response_cache.get(query_hash)
+            trace.record_cache("response", cached_response is not None)
+            if cached_response is not None:
+                return self.cached_chat_response(query_hash, cached_response)
 
-    def handle_app_related_query(self, query: str) -> str:
-        """Handle app-related queries with RAG"""
-        # Check for upgrading services
+            return await self.in_flight.ado(query_hash, self._aanswer_query, query, query_hash)
+
+    async def _aanswer_query(self, query: str, query_hash: str) -> ChatResponse:
+        """Async variant of _answer_query"""
+        trace = current_trace()
+        async with self.query_semaphore:
+            intent = None
+            try:
+                await self.aload()
+                intent, rejection = self.precheck(query)
+                if rejection is not None:
+                    return rejection
+                elif intent in PRICED_INTENTS:
+                    response = await self.ahandle_combined_query(query, intent)
+                elif intent in ['app_related', 'policy', 'account']:
+                    response = await self.ahandle_app_related_query(query, intent)
+                else:
+                    response = await self.ahandle_general_query(query)
+                if not trace.degraded:
+                    self.response_cache.set(query_hash, response)
+                return ChatResponse(message=response, intent=IntentType.from_label(intent))
+
+            except Exception as e:
+                log_event(service_logger, logging.ERROR, "query failed", query=query, error=repr(e))
+                return ChatResponse(message=ERROR_MESSAGE, intent=IntentType.from_label(intent), error=repr(e))
+
+    def cached_chat_response(self, query_hash: str, message: str) -> ChatResponse:
+        """Only answers are cached; the intent comes from the intent cache (not counted as a lookup)"""
+        return ChatResponse(message=message, intent=IntentType.from_label(self.intent_cache.peek(query_hash)))
+
+    def precheck(self, query: str) -> Tuple[str, Optional[ChatResponse]]:
+        """Run the query pipeline and return (intent, rejection or None)"""
+        trace = current_trace()
+        context = QueryContext(query)
+        rejection = self.pipeline.run(context)
+        if rejection is not None:
+            trace.intent = rejection.intent.value
+            return context.intent or rejection.intent.value, rejection
+        if context.intent is None:
+            # The classify stage was left out of CHAT_PIPELINE_ORDER
+            with stage("classify"):
+                context.intent = self.classify_intent(query)
+        trace.intent = context.intent
+        return context.intent, None
+
+    async def astream_query(self, query: str) -> AsyncIterator[str]:
+        """Stream the answer as text chunks.
+
+        Cached, rejected and locally computed answers come as a single chunk;
+        LLM answers are streamed token by token with the prefix cleanup
+        applied incrementally.
+        """
+        with request_trace() as trace:
+            query_hash = get_query_hash(self, query)
+            with stage("response_cache"):
+                cached_response = self.response_cache.get(query_hash)
+            trace.record_cache("response", cached_response is not None)
+            if cached_response is not None:
+                yield cached_response
+                return
+
+            async with self.query_semaphore:
+                try:
+                    await self.aload()
+                    intent, rejection = self.precheck(query)
+                    if rejection is not None:
+                        yield rejection.message
+                        return
+                    chunks = []
+                    async for chunk in self.astream_answer(query, intent):
+                        chunks.append(chunk)
+                        yield chunk
+                    if not trace.degraded:
+                        self.response_cache.set(query_hash, "".join(chunks))
+                except Exception as e:
+                    log_event(service_logger, logging.ERROR, "query failed", query=query, error=repr(e))
+                    yield ERROR_MESSAGE
+
+    async def astream_answer(self, query: str, intent: str) -> AsyncIterator[str]:
+        """Dispatch a checked query to the streaming handlers"""
+        if intent in PRICED_INTENTS:
+            with stage("price_quote"):
+                parts = self.quote_prices(query)
+            if parts:
+                yield "\n".join(parts)
+                return
+        if intent not in RAG_INTENTS:
+            streamed = False
+            try:
+                async for chunk in self.astream_llm(self.build_general_prompt(query), 'general'):
+                    streamed = True
+                    yield chunk
+            except LLMUnavailable as e:
+                if streamed:
+                    raise
+                yield self.llm_unavailable_answer(e)
+            return
+
+        reply = self.upgrading_service_reply(query)
+        if reply:
+            yield reply
+            return
+
+        trace = current_trace()
+        with stage("embedding"):
+            embedding = await self.run_blocking(EMBEDDING_TIMEOUT, self.embeddings.embed_query, query)
+        with stage("semantic_cache"):
+            cached_answer = self.semantic_cache.lookup(embedding, intent)
+        trace.record_cache("semantic", cached_answer is not None)
+        if cached_answer is not None:
+            yield cached_answer
+            return
+
+        with stage("retrieval"):
+            docs = await self.run_blocking(SEARCH_TIMEOUT, self.retriever.search, query, embedding, RETRIEVAL_K)
+        if not docs:
+            yield "Xin lỗi, tôi không tìm thấy thông tin cụ thể. Vui lòng liên hệ hotline 0347596789 để được hỗ trợ."
+            return
+
+        cleaner = StreamingAnswerCleaner()
+        raw_chunks, answer_chunks = [], []
+        try:
+            async for token in self.astream_llm(self.build_rag_prompt(docs, query), 'rag'):
+                raw_chunks.append(token)
+                text = cleaner.feed(token)
+                if text:
+                    answer_chunks.append(text)
+                    yield text
+        except LLMUnavailable as e:
+            if raw_chunks:
+                raise
+            yield self.faq_only_answer(query, docs, e)
+            return
+        tail = cleaner.flush()
+        if tail:
+            answer_chunks.append(tail)
+            yield tail
+        # Logs the raw response like the non-streaming path
+        self.clean_rag_answer(query, docs, "".join(raw_chunks))
+        self.semantic_cache.add(embedding, intent, "".join(answer_chunks))
+
+    async def astream_llm(self, prompt: str, priority: str) -> AsyncIterator[str]:
+        """Stream LLM tokens, with LLM_TIMEOUT applied to the whole generation.
+
+        The scheduler slot is held until the stream ends.
+        """
+        trace = current_trace()
+        async with self.llm_scheduler.aslot(priority):
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + LLM_TIMEOUT
+            with stage("llm"):
+                stream = self.llm.astream(prompt).__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), max(deadline - loop.time(), 0))
+                    except StopAsyncIteration:
+                        break
+                    trace.record_llm_usage(chunk)
+                    if chunk.content:
+                        yield chunk.content
+
+    def upgrading_service_reply(self, query: str):
+        """Fixed reply for services that are still being upgraded, else None"""
         upgrading_services = ['sửa tivi', 'sửa ô tô', 'thợ điện', 'thợ ống nước', 'vận chuyển', 'thợ may', 'làm đẹp', 'chăm sóc', 'làm vườn']
         normalized_query = normalize_query(query)
         if any(s in normalized_query for s in upgrading_services):
             return "Dịch vụ này hiện đang được nâng cấp và chưa có giá cụ thể. Vui lòng liên hệ hotline 0347596789 để được tư vấn."
+        return None
+
+    def build_rag_prompt(self, docs, query: str) -> str:
+        """Format the RAG prompt from the retrieved documents"""
+        with stage("context_budget"):
+            context = budget_context([doc.page_content for doc in docs], query)
+        return prompt_template("rag").format(context=context.text, query=query)
+
+    def clean_rag_answer(self, query: str, docs, raw_content: str) -> str:
+        """Strip introductory phrases the LLM adds despite the instructions"""
+        log_payload(
+            rag_logger, logging.INFO, "rag answer",
+            {"query": query, "response_chars": len(raw_content), "context_chars": sum(len(doc.page_content) for doc in docs)},
+            lambda: {"response": raw_content, "context": "\n".join(doc.page_content for doc in docs)},
+        )
+
+        return clean_answer(raw_content)
+
+    def faq_only_answer(self, query: str, docs, error: Exception) -> str:
+        """The FAQ sentences most relevant to the query, for when the LLM is unavailable"""
+        log_event(llm_logger, logging.WARNING, "LLM unavailable, answering from the FAQ only", error=str(error))
+        current_trace().record_degraded()
+        context = budget_context([doc.page_content for doc in docs], query, FAQ_ONLY_TOKEN_BUDGET)
+        return f"{FAQ_ONLY_PREFIX}\n{context.text}\n\n{FAQ_ONLY_SUFFIX}"
+
+    def llm_unavailable_answer(self, error: Exception) -> str:
+        log_event(llm_logger, logging.WARNING, "LLM unavailable", error=str(error))
+        current_trace().record_degraded()
+        # Shed general queries point the user to what is still being answered
+        return GENERAL_SHED_MESSAGE if isinstance(error, LLMOverloaded) else LLM_UNAVAILABLE_MESSAGE
+
+    def handle_app_related_query(self, query: str, intent: str = 'app_related') -> str:
+        """Handle app-related queries with RAG"""
+        # Check for upgrading services
+        reply = self.upgrading_service_reply(query)
+        if reply:
+            return reply
+
+        trace = current_trace()
+        # The query embedding serves both the semantic cache and the dense search
+        with stage("embedding"):
+            embedding = self.embeddings.embed_query(query)
+        with stage("semantic_cache"):
+            cached_answer = self.semantic_cache.lookup(embedding, intent)
+        trace.record_cache("semantic", cached_answer is not None)
+        if cached_answer is not None:
+            return cached_answer
 
         # Retrieve relevant documents
-        docs = self.vector_store.similarity_search(query, k=3)
+        with stage("retrieval"):
+            docs = self.retriever.search(query, embedding, RETRIEVAL_K)
         if not docs:
             return "Xin lỗi, tôi không tìm thấy thông tin cụ thể. Vui lòng liên hệ hotline 0347596789 để được hỗ trợ."
 
-        context = "\n".join([doc.page_content for doc in docs])
-        rag_prompt = ChatPromptTemplate.from_template(
-            """
-            SUPPORTING DATA:
-            {context}
-
-            USER QUESTION: {query}
-
-            STRICT INSTRUCTIONS:
-            - Answer directly to the content, NEVER start with "Here's the answer" or "Answer:" or any introductory phrase.
-            - DO NOT repeat the question in the answer.
-            - DO NOT include any formatting like "Question:" or "Answer:" in the response.
-            - Rely ONLY on the data in the "SUPPORTING DATA" section above.
-            - Answer accurately, CONCISELY, and CLEARLY.
-            - If pricing calculations are needed, perform the calculations clearly.
-            - If no relevant information is found in the data, answer: "Please contact hotline 0347596789 for support."
-            - If the question is in Vietnamese → answer in Vietnamese. If in English → answer in English.
-            
-            REPLY FORMAT: Just provide the direct answer without any preamble or question repetition.
-            """
-        )
-        response = self.llm.invoke(rag_prompt.format(context=context, query=query))
-        content = response.content
-        content = re.sub(r'^Here is .*?:\s*', '', content, flags=re.IGNORECASE)
-        content = re.sub(r'(Câu hỏi|Question).*?\n', '', content, flags=re.IGNORECASE)
-        content = re.sub(r'^(Trả lời|Answer):\s*', '', content, flags=re.IGNORECASE)
-        logging.info(f"Query: {query}\nRAG Response: {response.content}\nContext: {context}")
+        try:
+            with self.llm_scheduler.slot('rag'), stage("llm"):
+                response = self.llm.invoke(self.build_rag_prompt(docs, query))
+        except LLMUnavailable as e:
+            return self.faq_only_answer(query, docs, e)
+        trace.record_llm_usage(response)
+        with stage("postprocess"):
+            answer = self.clean_rag_answer(query, docs, response.content)
+        self.semantic_cache.add(embedding, intent, answer)
+        return answer
+
+    async def ahandle_app_related_query(self, query: str, intent: str = 'app_related') -> str:
+        """Async RAG: embedding and FAISS search run on the thread pool, the LLM call is awaited"""
+        reply = self.upgrading_service_reply(query)
+        if reply:
+            return reply
+
+        trace = current_trace()
+        with stage("embedding"):
+            embedding = await self.run_blocking(EMBEDDING_TIMEOUT, self.embeddings.embed_query, query)
+        with stage("semantic_cache"):
+            cached_answer = self.semantic_cache.lookup(embedding, intent)
+        trace.record_cache("semantic", cached_answer is not None)
+        if cached_answer is not None:
+            return cached_answer
+
+        with stage("retrieval"):
+            docs = await self.run_blocking(SEARCH_TIMEOUT, self.retriever.search, query, embedding, RETRIEVAL_K)
+        if not docs:
+            return "Xin lỗi, tôi không tìm thấy thông tin cụ thể. Vui lòng liên hệ hotline 0347596789 để được hỗ trợ."
+
+        try:
+            async with self.llm_scheduler.aslot('rag'):
+                with stage("llm"):
+                    response = await self.llm.ainvoke(self.build_rag_prompt(docs, query))
+        except LLMUnavailable as e:
+            return self.faq_only_answer(query, docs, e)
+        trace.record_llm_usage(response)
+        with stage("postprocess"):
+            answer = self.clean_rag_answer(query, docs, response.content)
+        self.semantic_cache.add(embedding, intent, answer)
+        return answer
 
-        return content.strip()
+    def build_general_prompt(self, query: str) -> str:
+        """Format the prompt for general queries"""
+        return prompt_template("general").format(query=query)
 
     def handle_general_query(self, query: str) -> str:
         """Handle general queries"""
-        general_prompt = ChatPromptTemplate.from_template(
-            """Answer the following question helpfully: {query}
-        STRICT INSTRUCTIONS:
-        1. Answer directly to the content, briefly and clearly.
-        2. If the question is in Vietnamese → answer in Vietnamese. If in English → answer in English.""")
-        
-        response = self.llm.invoke(general_prompt.format(query=query))
+        try:
+            with self.llm_scheduler.slot('general'), stage("llm"):
+                response = self.llm.invoke(self.build_general_prompt(query))
+        except LLMUnavailable as e:
+            return self.llm_unavailable_answer(e)
+        current_trace().record_llm_usage(response)
+        return response.content
+
+    async def ahandle_general_query(self, query: str) -> str:
+        """Async variant of handle_general_query"""
+        try:
+            async with self.llm_scheduler.aslot('general'):
+                with stage("llm"):
+                    response = await self.llm.ainvoke(self.build_general_prompt(query))
+        except LLMUnavailable as e:
+            return self.llm_unavailable_answer(e)
+        current_trace().record_llm_usage(response)
         return response.content
 
+    def process_batch(self, queries: List[str]) -> List[str]:
+        """Answer many queries in one pass, results in the original order.
+
+        Queries are deduplicated by hash, classified together, RAG-bound
+        queries are embedded in one call and retrieved in one FAISS call, and
+        the LLM calls run concurrently (at most BATCH_LLM_CONCURRENCY).
+        """
+        if len(queries) > BATCH_MAX_QUERIES:
+            raise ValueError(f"Batch too large: {len(queries)} queries (max {BATCH_MAX_QUERIES})")
+        self.load()
+
+        with request_trace() as trace:
+            hashes = [get_query_hash(self, query) for query in queries]
+            unique: Dict[str, str] = {}
+            for query_hash, query in zip(hashes, queries):
+                unique.setdefault(query_hash, query)
+
+            answers: Dict[str, str] = {}
+            rag_bound: List[Tuple[str, str, str]] = []
+            general: List[Tuple[str, str]] = []
+            with stage("batch_classify"):
+                for query_hash, query in unique.items():
+                    cached_response = self.response_cache.get(query_hash)
+                    if cached_response is not None:
+                        answers[query_hash] = cached_response
+                        continue
+                    intent, rejection = self.precheck(query)
+                    if rejection is not None:
+                        answers[query_hash] = rejection.message
+                        continue
+                    if intent in PRICED_INTENTS:
+                        parts = self.quote_prices(query)
+                        if parts:
+                            answers[query_hash] = "\n".join(parts)
+                            self.response_cache.set(query_hash, answers[query_hash])
+                            continue
+                    if intent not in RAG_INTENTS:
+                        general.append((query_hash, query))
+                        continue
+                    reply = self.upgrading_service_reply(query)
+                    if reply:
+                        answers[query_hash] = reply
+                        self.response_cache.set(query_hash, reply)
+                        continue
+                    rag_bound.append((query_hash, query, intent))
+            # After the loop: precheck sets each query's intent on the trace
+            trace.intent = 'batch'
+
+            llm_jobs = []
+            if rag_bound:
+                with stage("batch_embedding"):
+                    embeddings = self.embeddings.embed_documents([query for _, query, _ in rag_bound])
+                pending = []
+                for (query_hash, query, intent), embedding in zip(rag_bound, embeddings):
+                    cached_answer = self.semantic_cache.lookup(embedding, intent)
+                    if cached_answer is not None:
+                        answers[query_hash] = cached_answer
+                        self.response_cache.set(query_hash, cached_answer)
+                    else:
+                        pending.append((query_hash, query, intent, embedding))
+                if pending:
+                    with stage("batch_retrieval"):
+                        all_docs = self.retriever.search_many([query for _, query, *_ in pending],
+                                                              [embedding for *_, embedding in pending], RETRIEVAL_K)
+                    for (query_hash, query, intent, embedding), docs in zip(pending, all_docs):
+                        if not docs:
+                            answers[query_hash] = "Xin lỗi, tôi không tìm thấy thông tin cụ thể. Vui lòng liên hệ hotline 0347596789 để được hỗ trợ."
+                        else:
+                            llm_jobs.append((query_hash, self._answer_from_docs, (query, intent, embedding, docs)))
+            llm_jobs.extend((query_hash, self.handle_general_query, (query,)) for query_hash, query in general)
+
+            with stage("batch_llm"), ThreadPoolExecutor(max_workers=BATCH_LLM_CONCURRENCY) as pool:
+                # Each job runs in a copy of this context so it records into the batch trace
+                futures = {query_hash: pool.submit(contextvars.copy_context().run, self._batch_job, fn, *args)
+                           for query_hash, fn, args in llm_jobs}
+                for query_hash, future in futures.items():
+                    try:
+                        answers[query_hash], degraded = future.result()
+                        # Only this job's stand-in answer is left out of the cache
+                        if not degraded:
+                            self.response_cache.set(query_hash, answers[query_hash])
+                    except Exception as e:
+                        log_event(service_logger, logging.ERROR, "query failed", query_hash=query_hash, error=repr(e))
+                        answers[query_hash] = ERROR_MESSAGE
+
+            return [answers[query_hash] for query_hash in hashes]
+
+    def _batch_job(self, fn, *args) -> Tuple[str, bool]:
+        """Run one batch LLM job; returns its answer and whether it was degraded"""
+        with job_trace() as trace:
+            answer = fn(*args)
+        return answer, trace.degraded
+
+    def _answer_from_docs(self, query: str, intent: str, embedding: List[float], docs) -> str:
+        """LLM answer for already retrieved documents"""
+        try:
+            with self.llm_scheduler.slot('rag'):
+                response = self.llm.invoke(self.build_rag_prompt(docs, query))
+        except LLMUnavailable as e:
+            return self.faq_only_answer(query, docs, e)
+        answer = self.clean_rag_answer(query, docs, response.content)
+        self.semantic_cache.add(embedding, intent, answer)
+        return answer
+
     def debug_classification(self, query: str) -> Dict:
         """Debug method to understand classification process"""
+        self.load()
         normalized = normalize_query(query)
         rule_intent, confidence, matches = rule_based_classification(self, query)
         final_intent = self.classify_intent(query)
-        docs = self.vector_store.similarity_search(query, k=3)
+        docs = self.retriever.search(query, self.embeddings.embed_query(query), RETRIEVAL_K)
         return {
             'original_query': query,
             'normalized_query': normalized,
@@ -305,7 +724,7 @@ class ChatService:
             'rule_confidence': confidence,
             'rule_matches': matches,
             'final_intent': final_intent,
-            'is_cached': get_query_hash(query) in self.intent_cache,
+            'is_cached': get_query_hash(self, query) in self.intent_cache,
             'retrieved_docs': [doc.page_content for doc in docs]
         }
 
@@ -313,6 +732,35 @@ class ChatService:
         """Clear all caches"""
         self.intent_cache.clear()
         self.response_cache.clear()
+        self.retrieval_cache.clear()
+        self.semantic_cache.invalidate()
+
+    def reload_vectorstore(self):
+        """Load a rebuilt FAQ vectorstore and drop answers derived from the old one"""
+        from service.mmap_store import load_vectorstore
+        self.load()
+        self.vector_store = load_vectorstore(VECTORSTORE_PATH, self.embeddings)
+        self.retrieval_cache.clear()
+        self.retriever = HybridRetriever.load(self.vector_store, VECTORSTORE_PATH, cache=self.retrieval_cache)
+        self.response_cache.clear()
+        self.semantic_cache.invalidate()
+
+    def llm_stats(self) -> Dict:
+        """Circuit breaker and latency window of the LLM gateway"""
+        return self.llm.stats() if hasattr(self.llm, 'stats') else {}
+
+    def llm_scheduler_stats(self) -> Dict:
+        """Queue depths, admissions and free slots of the LLM scheduler"""
+        return self.llm_scheduler.stats()
+
+    def pipeline_stats(self) -> Dict:
+        """Order, cost and outcome counts of every pipeline stage"""
+        return self.pipeline.stats()
+
+    def cache_stats(self) -> Dict:
+        """Hit/miss/eviction counters of every cache"""
+        caches = (self.intent_cache, self.response_cache, self.retrieval_cache, self.semantic_cache, self.in_flight)
+        return {stats['name']: stats for stats in (cache.get_stats() for cache in caches)}
     def get_debug_info(self, query: str) -> dict:
         """Method to debug intent classification"""
         intent = self.classify_intent(query)
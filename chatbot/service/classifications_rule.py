@@ -1,7 +1,7 @@
 
 import hashlib
 import re
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
 
 
 def setup_classification_rules(self):
@@ -88,7 +88,119 @@ def setup_classification_rules(self):
             r'\b(finance|tài chính|banking|ngân hàng)\b',
             r'\b(real estate|bất động sản|property|tài sản)\b',
         ]
-    
+
+    # Refinement of app_related intent into service categories (checked in order)
+    self.intent_refinement_patterns = [
+            ('cleaning_service', r'\b(clean|cleaning|dọn dẹp|dọn nhà|vệ sinh)\b'),
+            ('cooking_service', r'\b(cook|cooking|nấu ăn|đầu bếp)\b'),
+            ('repair_service', r'\b(ac|air conditioner|điều hòa|máy lạnh|tivi|ô tô|thợ điện|thợ ống nước|vận chuyển)\b'),
+            ('policy', r'\b(cancel|hủy|refund|hoàn tiền|payment|thanh toán)\b'),
+            ('account', r'\b(account|login|register|đăng nhập|đăng ký|password|mật khẩu|delete account|xóa tài khoản|hủy lịch|cancel job|refund|hoàn tiền)\b'),
+        ]
+
+    # Build the rule set once, every query reuses the compiled engine
+    self.compiled_rules = CompiledRuleSet(self.app_related_patterns, self.general_patterns)
+    self.intent_refinements = [
+        (intent, re.compile(pattern, re.IGNORECASE))
+        for intent, pattern in self.intent_refinement_patterns
+    ]
+
+
+_WORD_RE = re.compile(r'\w+')
+_TERM_RE = re.compile(r'\\b\(?([^().*+?\[\]{}^$\\]*)\)?\\b')
+
+
+class CompiledRuleSet:
+    """Precompiled classification engine for the rule patterns.
+
+    Every rule is split on ``.*`` into its terms, and every term alternative is
+    registered in a keyword index keyed by its first word. A query is scanned
+    once, word by word, to collect the spans of all terms; a rule ``A.*B`` then
+    matches iff the earliest end of an ``A`` match is not after the latest
+    start of a ``B`` match. This gives the same answer as ``re.search`` on the
+    original pattern without scanning dozens of backtracking regexes.
+    """
+
+    def __init__(self, app_related_patterns: List[str], general_patterns: List[str]):
+        self._term_ids: Dict[str, int] = {}
+        self.keyword_index: Dict[str, List[Tuple[str, List[int]]]] = {}
+        # Terms that are not plain keyword alternations are matched by regex
+        self.regex_terms: Dict[int, re.Pattern] = {}
+        self.app_rules = [self._compile_rule(p) for p in app_related_patterns]
+        self.general_rules = [self._compile_rule(p) for p in general_patterns]
+
+    def _compile_rule(self, pattern: str) -> Tuple[str, List[int]]:
+        term_ids = []
+        for segment in pattern.split('.*'):
+            if segment not in self._term_ids:
+                self._term_ids[segment] = len(self._term_ids)
+                self._register_term(segment, self._term_ids[segment])
+            term_ids.append(self._term_ids[segment])
+        return pattern, term_ids
+
+    def _register_term(self, segment: str, term_id: int):
+        term = _TERM_RE.fullmatch(segment)
+        keywords = term.group(1).lower().split('|') if term else []
+        if not keywords or not all(_WORD_RE.match(k) and _WORD_RE.fullmatch(k[-1]) for k in keywords):
+            self.regex_terms[term_id] = re.compile(f'(?=({segment}))', re.IGNORECASE)
+            return
+        for keyword in keywords:
+            entries = self.keyword_index.setdefault(_WORD_RE.match(keyword).group(), [])
+            for known, ids in entries:
+                if known == keyword:
+                    ids.append(term_id)
+                    break
+            else:
+                entries.append((keyword, [term_id]))
+
+    def term_spans(self, normalized_query: str) -> List[List[Tuple[int, int]]]:
+        """Spans of every term in the query, in order of start position"""
+        spans: List[List[Tuple[int, int]]] = [[] for _ in range(len(self._term_ids))]
+        text = normalized_query
+        for word in _WORD_RE.finditer(text):
+            entries = self.keyword_index.get(word.group())
+            if not entries:
+                continue
+            start = word.start()
+            for keyword, term_ids in entries:
+                end = start + len(keyword)
+                if text.startswith(keyword, start) and not _WORD_RE.match(text, end):
+                    for term_id in term_ids:
+                        spans[term_id].append((start, end))
+        for term_id, pattern in self.regex_terms.items():
+            spans[term_id] = [m.span(1) for m in pattern.finditer(text)]
+        return spans
+
+    def match(self, normalized_query: str) -> Tuple[List[str], List[str]]:
+        """Return (app_related_matches, general_matches) for a normalized query"""
+        spans = self.term_spans(normalized_query)
+
+        def rule_matches(term_ids: List[int]) -> bool:
+            end = -1
+            for position, term_id in enumerate(term_ids):
+                found = spans[term_id]
+                if not found:
+                    return False
+                if position == len(term_ids) - 1:
+                    return max(s for s, _ in found) >= end
+                ends = [e for s, e in found if s >= end]
+                if not ends:
+                    return False
+                end = min(ends)
+            return True
+
+        app_related_matches = [
+            f"Pattern_{i}: {pattern}"
+            for i, (pattern, term_ids) in enumerate(self.app_rules)
+            if rule_matches(term_ids)
+        ]
+        general_matches = [
+            f"General_{i}: {pattern}"
+            for i, (pattern, term_ids) in enumerate(self.general_rules)
+            if rule_matches(term_ids)
+        ]
+        return app_related_matches, general_matches
+
 def normalize_query(query: str) -> str:
     normalized = query.lower().strip()
     normalized = re.sub(r'\s+', ' ', normalized)
@@ -107,18 +219,7 @@ def get_query_hash(self, query: str) -> str:
 def rule_based_classification(self, query: str) -> Tuple[str, float, list]:
         normalized_query = normalize_query(query)
         
-        app_related_matches = []
-        general_matches = []
-        
-        # Check app-related patterns
-        for i, pattern in enumerate(self.app_related_patterns):
-            if re.search(pattern, normalized_query, re.IGNORECASE):
-                app_related_matches.append(f"Pattern_{i}: {pattern}")
-        
-        # Check general patterns  
-        for i, pattern in enumerate(self.general_patterns):
-            if re.search(pattern, normalized_query, re.IGNORECASE):
-                general_matches.append(f"General_{i}: {pattern}")
+        app_related_matches, general_matches = self.compiled_rules.match(normalized_query)
         
         app_score = len(app_related_matches)
         general_score = len(general_matches)
@@ -132,3 +233,11 @@ def rule_based_classification(self, query: str) -> Tuple[str, float, list]:
         else:
             # For home service app, default to app_related when unclear
             return 'app_related', 0.6, ['Default: Home service app']
+
+
+def refine_intent(self, normalized_query: str) -> Optional[str]:
+    """Map an app_related query onto its service category, if any"""
+    for intent, pattern in self.intent_refinements:
+        if pattern.search(normalized_query):
+            return intent
+    return None
@@ -1,46 +1,195 @@
+import logging
+import os
 import re
-from typing import List, Tuple
+import threading
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from service.log_config import get_logger, log_event
+
+# Optional file with one word or phrase per line ('#' starts a comment),
+# used instead of the built-in list and reloaded when it changes
+CONTENT_FILTER_WORDS_PATH = os.getenv("CONTENT_FILTER_WORDS_PATH")
+# How often (seconds) to check whether the word list file changed
+WORDS_CHECK_INTERVAL = float(os.getenv("CONTENT_FILTER_CHECK_INTERVAL", 30))
+
+logger = get_logger("content_filter")
+
+DEFAULT_WORDS = [
+    # Từ chửi thề tiếng Việt
+    'đmm', 'dmm', 'đm', 'dm', 'vcl', 'vkl', 'cc', 'clmm', 'clm',
+    'đcm', 'dcm', 'đcmm', 'dcmm', 'mlb', 'đb', 'db', 'cặc', 'lồn',
+    'buồi', 'đéo', 'deo', 'shit', 'fuck', 'damn', 'bitch', 'asshole',
+    'stupid', 'idiot', 'moron', 'retard', 'gay', 'lesbian',
+    # Từ khiếm nhã
+    'ngu', 'đần', 'khùng', 'điên', 'mất dạy', 'vô học', 'thô lỗ',
+    'chó', 'lợn', 'heo', 'súc vật', 'con đĩ', 'đĩ', 'cave', 'gái bán hoa'
+]
+
+# Ký tự dùng để che từ, ví dụ "d*m", "f**k", "v@l"
+MASK_CHARS = "*@#$%^&!"
+# Số viết thay chữ cái, ví dụ "5h1t", "ng0"
+LEET_DIGITS = str.maketrans({"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t"})
+
+_TOKEN_RE = re.compile(r"[\w" + re.escape(MASK_CHARS) + r"]+")
+# Letters, one run of mask characters, letters: "d*m", "f**k"
+_MASKED_RE = re.compile(r"([^\W\d_]+)([" + re.escape(MASK_CHARS) + r"]+)([^\W\d_]+)")
+# "dung@yahoo.com", "https://...", "www...." are not masked words
+_EMAIL_URL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+|(?:https?://|www\.)\S+")
+_REPEAT_RE = re.compile(r"(\w)\1{2,}")
+_END_KEY = ""
+
+
+def strip_diacritics(text: str) -> str:
+    """'đéo' -> 'deo', used to index masked spellings"""
+    decomposed = unicodedata.normalize("NFD", text.replace("đ", "d"))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def normalize_token(token: str) -> str:
+    """Read leetspeak digits inside a word as letters, e.g. "5h1t" -> "shit"""
+    if token.isalpha() or token.isdigit() or not any(ch.isdigit() for ch in token):
+        return token
+    return token.translate(LEET_DIGITS)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased NFC tokens, so matches always fall on Vietnamese word boundaries"""
+    text = _EMAIL_URL_RE.sub(" ", unicodedata.normalize("NFC", text).lower())
+    # "nguuuu" -> "ngu", "đmmmm" -> "đm"; doubled letters ("đmm", "cc") are kept
+    text = _REPEAT_RE.sub(r"\1", text)
+    tokens = []
+    for token in _TOKEN_RE.findall(text):
+        if not token.isalnum():
+            # Punctuation at the edges ("ngu!", "#cc") is not a mask
+            token = token.strip(MASK_CHARS + "_")
+            if not token:
+                continue
+        tokens.append(normalize_token(token))
+    return tokens
+
+
+class WordMatcher:
+    """Single-pass matcher over a fixed word list.
+
+    Entries are split into tokens and stored in a token trie, so a scan walks
+    the query tokens once and its cost does not grow with the list size.
+    Tokens with mask characters between letters ("d*m", "f**k") match the
+    shortest single-word entry that starts and ends with those letters and
+    has room for the masked part: at most one mask more than the hidden
+    letters ("f***k" -> "fuck", "d*m" -> "đm", but not "dung@yahoo").
+    """
+
+    def __init__(self, words: Iterable[str]):
+        self.words: List[str] = []
+        self._trie: Dict = {}
+        # (first letter, last letter) -> single-word entries, shortest first
+        self._masked: Dict[Tuple[str, str], List[str]] = {}
+        for word in words:
+            tokens = tokenize(word)
+            if not tokens:
+                continue
+            node = self._trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            if _END_KEY in node:
+                continue
+            node[_END_KEY] = word
+            self.words.append(word)
+            if len(tokens) == 1 and len(tokens[0]) >= 2:
+                plain = strip_diacritics(tokens[0])
+                self._masked.setdefault((plain[0], plain[-1]), []).append(word)
+        for candidates in self._masked.values():
+            candidates.sort(key=len)
+
+    def _match_masked(self, token: str) -> Optional[str]:
+        match = _MASKED_RE.fullmatch(token)
+        if match is None:
+            return None
+        prefix, masks, suffix = (strip_diacritics(part) for part in match.groups())
+        for word in self._masked.get((prefix[0], suffix[-1]), ()):
+            plain = strip_diacritics(word)
+            hidden = len(plain) - len(prefix) - len(suffix)
+            if hidden >= 0 and plain.startswith(prefix) and plain.endswith(suffix) and len(masks) <= hidden + 1:
+                return word
+        return None
+
+    def find(self, text: str) -> List[str]:
+        """Entries found in the text, in order of first appearance"""
+        tokens = tokenize(text)
+        detected = []
+        for start, token in enumerate(tokens):
+            node = self._trie.get(token)
+            position = start
+            while node is not None:
+                word = node.get(_END_KEY)
+                if word is not None and word not in detected:
+                    detected.append(word)
+                position += 1
+                if position == len(tokens):
+                    break
+                node = node.get(tokens[position])
+            masked = self._match_masked(token) if self._masked else None
+            if masked is not None and masked not in detected:
+                detected.append(masked)
+        return detected
+
+
+def load_words(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        lines = (line.split("#", 1)[0].strip() for line in f)
+        return [line for line in lines if line]
 
 
 class ContentFilter:
-    def __init__(self):
-        # Danh sách từ ngữ nhạy cảm (có thể mở rộng)
-        self.inappropriate_words = [
-            # Từ chửi thề tiếng Việt
-            'đmm', 'dmm', 'đm', 'dm', 'vcl', 'vkl', 'cc', 'clmm', 'clm', 
-            'đcm', 'dcm', 'đcmm', 'dcmm', 'mlb', 'đb', 'db', 'cặc', 'lồn',
-            'buồi', 'đéo', 'deo', 'shit', 'fuck', 'damn', 'bitch', 'asshole',
-            'stupid', 'idiot', 'moron', 'retard', 'gay', 'lesbian',
-            # Từ khiếm nhã
-            'ngu', 'đần', 'khùng', 'điên', 'mất dạy', 'vô học', 'thô lỗ',
-            'chó', 'lợn', 'heo', 'súc vật', 'con đĩ', 'đĩ', 'cave', 'gái bán hoa'
-        ]
-        
-        # Pattern để phát hiện từ ngữ bị che hoặc viết tắt
-        self.pattern_replacements = {
-            r'd[*@#$%^&!]+m': 'đm',
-            r'v[*@#$%^&!]+l': 'vcl',
-            r'c[*@#$%^&!]+c': 'cc',
-            r'f[*@#$%^&!]+k': 'fuck',
-            r's[*@#$%^&!]+t': 'shit'
-        }
+    def __init__(self, words_path: Optional[str] = CONTENT_FILTER_WORDS_PATH):
+        self.words_path = words_path
+        self._lock = threading.Lock()
+        self._words_mtime = None
+        self._checked_at = time.monotonic()
+        self.matcher = WordMatcher(DEFAULT_WORDS)
+        if words_path:
+            self.reload()
+
+    @property
+    def inappropriate_words(self) -> List[str]:
+        return self.matcher.words
+
+    def reload(self, words: Optional[Iterable[str]] = None):
+        """Rebuild the matcher from ``words`` or the word list file.
+
+        The new matcher is built before it replaces the old one, so requests
+        running concurrently keep scanning with a complete list.
+        """
+        with self._lock:
+            if words is None and self.words_path:
+                self._words_mtime = os.stat(self.words_path).st_mtime_ns
+                words = load_words(self.words_path)
+            self.matcher = WordMatcher(DEFAULT_WORDS if words is None else words)
+            log_event(logger, logging.INFO, "content filter loaded", words=len(self.matcher.words))
+
+    def _check_source(self):
+        """Reload when the word list file changed since the last check"""
+        if not self.words_path or time.monotonic() - self._checked_at < WORDS_CHECK_INTERVAL:
+            return
+        self._checked_at = time.monotonic()
+        try:
+            mtime = os.stat(self.words_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._words_mtime:
+            try:
+                self.reload()
+            except (OSError, UnicodeDecodeError) as e:
+                # Keep serving with the previous list
+                log_event(logger, logging.WARNING, "error reloading content filter words", error=str(e))
 
     def is_inappropriate(self, text: str) -> Tuple[bool, List[str]]:
         """
         Kiểm tra nội dung có chứa từ ngữ không phù hợp hay không
         Returns: (is_inappropriate, detected_words)
         """
-        text_lower = text.lower()
-        detected_words = []
-        
-        # Kiểm tra từ ngữ trực tiếp
-        for word in self.inappropriate_words:
-            if word in text_lower:
-                detected_words.append(word)
-        
-        # Kiểm tra pattern che từ
-        for pattern, replacement in self.pattern_replacements.items():
-            if re.search(pattern, text_lower):
-                detected_words.append(replacement)
-        
-        return len(detected_words) > 0, detected_words
\ No newline at end of file
+        self._check_source()
+        detected_words = self.matcher.find(text)
+        return len(detected_words) > 0, detected_words
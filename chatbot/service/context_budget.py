@@ -0,0 +1,138 @@
+"""Trim the retrieved chunks to what the RAG prompt needs.
+
+1. Chunks that overlap (the splitter repeats up to ``chunk_overlap``
+   characters at each boundary) are merged, contained chunks dropped.
+2. The merged text is split into sentences and repeated sentences removed.
+3. Sentences are scored by the query terms they contain, rarer terms
+   counting more, and the best ones are kept until CONTEXT_TOKEN_BUDGET.
+   Kept sentences stay in document order. When no sentence shares a term
+   with the query (e.g. an English question over the Vietnamese FAQ) the
+   leading sentences are kept instead.
+
+Token counts are estimates (words and punctuation marks), not the Groq
+tokenizer. CONTEXT_TOKEN_BUDGET=0 disables the trimming.
+"""
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Sequence
+
+from service.metrics import REGISTRY
+from service.retrieval import tokenize
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 300))
+# Shortest suffix/prefix match treated as splitter overlap
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 200
+
+CONTEXT_TOKENS_TOTAL = REGISTRY.counter("chatbot_context_tokens_total", "Estimated RAG context tokens: retrieved and sent")
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+(?=\S)|\n+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(_PIECE_RE.findall(text))
+
+
+@dataclass
+class BudgetedContext:
+    text: str
+    retrieved_tokens: int
+    sent_tokens: int
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.retrieved_tokens - self.sent_tokens
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of ``left`` that is a prefix of ``right``"""
+    for size in range(min(len(left), len(right), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def merge_overlapping(texts: Sequence[str]) -> List[str]:
+    """Drop duplicated chunks and join the ones that continue each other"""
+    merged: List[str] = []
+    for text in texts:
+        text = text.strip()
+        if not text or any(text in kept for kept in merged):
+            continue
+        merged = [kept for kept in merged if kept not in text]
+        for i, kept in enumerate(merged):
+            size = _overlap(kept, text)
+            if size:
+                merged[i] = kept + text[size:]
+                break
+            size = _overlap(text, kept)
+            if size:
+                merged[i] = text + kept[size:]
+                break
+        else:
+            merged.append(text)
+    return merged
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_END_RE.split(text) if sentence.strip()]
+
+
+def budget_context(texts: Sequence[str], query: str, budget: int = CONTEXT_TOKEN_BUDGET) -> BudgetedContext:
+    """Context for the RAG prompt from the retrieved chunk texts, in retrieval order"""
+    retrieved_tokens = sum(estimate_tokens(text) for text in texts)
+    if budget <= 0:
+        text = "\n".join(texts)
+        return _counted(BudgetedContext(text, retrieved_tokens, retrieved_tokens))
+
+    # (chunk index, sentence, terms), repeated sentences only once
+    sentences = []
+    seen = set()
+    for chunk_index, chunk in enumerate(merge_overlapping(texts)):
+        for sentence in split_sentences(chunk):
+            key = _SPACE_RE.sub(" ", sentence).lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            sentences.append((chunk_index, sentence, set(tokenize(sentence))))
+
+    document_frequency = {}
+    for _, _, terms in sentences:
+        for term in terms:
+            document_frequency[term] = document_frequency.get(term, 0) + 1
+    query_terms = set(tokenize(query))
+    n = len(sentences)
+    scores = [
+        sum(math.log(1 + n / document_frequency[term]) for term in terms & query_terms)
+        for _, _, terms in sentences
+    ]
+
+    if any(scores):
+        ranked = sorted(range(n), key=lambda i: (-scores[i], i))
+        ranked = [i for i in ranked if scores[i] > 0]
+    else:
+        ranked = list(range(n))
+    kept, used = set(), 0
+    for i in ranked:
+        cost = estimate_tokens(sentences[i][1])
+        if used + cost > budget and kept:
+            continue
+        kept.add(i)
+        used += cost
+
+    chunks = {}
+    for i in sorted(kept):
+        chunk_index, sentence, _ = sentences[i]
+        chunks.setdefault(chunk_index, []).append(sentence)
+    text = "\n".join(" ".join(chunk) for chunk in chunks.values())
+    return _counted(BudgetedContext(text, retrieved_tokens, used))
+
+
+def _counted(context: BudgetedContext) -> BudgetedContext:
+    CONTEXT_TOKENS_TOTAL.inc(context.retrieved_tokens, kind='retrieved')
+    CONTEXT_TOKENS_TOTAL.inc(context.sent_tokens, kind='sent')
+    return context
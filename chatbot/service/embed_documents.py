@@ -1,57 +1,215 @@
+"""Build or incrementally update the FAQ vectorstore from the PDFs in data/.
+
+Usage (from the chatbot directory):
+    python -m service.embed_documents [--full] [--index-type flat]
+"""
+import argparse
+import hashlib
+import json
+import logging
 import os
 import re
-import sys
+from typing import Dict, List, Optional, Tuple
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
+from langchain_community.document_loaders import PyPDFLoader
 from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
 from langchain_huggingface import HuggingFaceEmbeddings
 from dotenv import load_dotenv
-from langchain_text_splitters import CharacterTextSplitter
 
-pdf_data_path = "../data"
-vector_db_path = "../vectorstores/db_faiss"
-load_dotenv()
+from service.embeddings import EMBEDDING_MODEL, build_embeddings
+from service.faiss_index import DEFAULT_INDEX_OPTIONS, INDEX_NAME, INDEX_TYPES, export_compact_index
+from service.log_config import get_logger, log_event, setup_logging
+from service.mmap_store import export_serving_store
+from service.retrieval import export_lexical_index
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+pdf_data_path = os.path.join(BASE_DIR, "data")
+vector_db_path = os.path.join(BASE_DIR, "vectorstores", "db_faiss")
+MANIFEST_NAME = "manifest.json"
+
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 50
+EMBED_BATCH_SIZE = 64
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+
+logger = get_logger("index")
+
 
 def clean_line_breaks(text: str) -> str:
     """
     Ghép các dòng bị ngắt dòng không cần thiết trong cùng đoạn.
     """
     return re.sub(r'(?<!\n)\n(?!\n)', ' ', text)
-    
-def create_db_from_files():
-    #
-    loader = DirectoryLoader(pdf_data_path, glob="*.pdf", loader_cls = PyPDFLoader)
-    documents = loader.load()
 
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_ids(chunks: List[Document], source: str) -> List[str]:
+    """Content-addressed chunk IDs: identical chunks keep their ID (and vector) across builds"""
+    ids = []
+    seen: Dict[str, int] = {}
+    for chunk in chunks:
+        key = f"{source}\0{chunk.metadata.get('page', '')}\0{chunk.page_content}"
+        chunk_id = hashlib.sha256(key.encode()).hexdigest()
+        # Repeated identical chunks in one file get an occurrence suffix
+        occurrence = seen.get(chunk_id, 0)
+        seen[chunk_id] = occurrence + 1
+        ids.append(chunk_id if occurrence == 0 else f"{chunk_id}-{occurrence}")
+    return ids
+
+
+def build_config() -> Dict:
+    """Settings that invalidate every vector when they change"""
+    return {"embedding_model": EMBEDDING_MODEL, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+
+
+def load_manifest(db_path: str) -> Optional[Dict]:
+    path = os.path.join(db_path, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(db_path: str, manifest: Dict):
+    path = os.path.join(db_path, MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def split_file(path: str, text_splitter) -> List[Document]:
+    documents = PyPDFLoader(path).load()
     for doc in documents:
         doc.page_content = clean_line_breaks(doc.page_content)
+    return text_splitter.split_documents(documents)
+
+
+def build_embedding_model() -> HuggingFaceEmbeddings:
+    # The index is always built with the reference model; the ONNX backends only encode queries
+    return build_embeddings("hf")
+
+
+def embed_in_batches(embedding_model, texts: List[str], batch_size: int) -> List[List[float]]:
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(embedding_model.embed_documents(texts[start:start + batch_size]))
+    return vectors
+
+
+def update_db(data_path: str = pdf_data_path, db_path: str = vector_db_path,
+              batch_size: int = EMBED_BATCH_SIZE, full: bool = False, index_type: str = INDEX_TYPE,
+              index_options: Optional[Dict] = None) -> Tuple[Optional[FAISS], Dict]:
+    """Bring the FAISS store in line with the PDFs, embedding only new or changed chunks
+
+    The flat index is kept as the master copy; ``index_type`` other than
+    flat also builds the compact serving index from it.
+    """
+    config = build_config()
+    manifest = None if full else load_manifest(db_path)
+    if manifest is not None and manifest.get("config") != config:
+        log_event(logger, logging.INFO, "build settings changed, rebuilding from scratch", path=db_path)
+        manifest = None
+    old_files = manifest["files"] if manifest else {}
+
+    embedding_model = build_embedding_model()
+    db = None
+    if manifest is not None and os.path.exists(os.path.join(db_path, INDEX_NAME)):
+        db = FAISS.load_local(db_path, embedding_model, allow_dangerous_deserialization=True)
+    existing_ids = set(db.index_to_docstore_id.values()) if db is not None else set()
 
-    # Split the documents into chunks
     text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,
-        chunk_overlap=50
-    )
-    chunks = text_splitter.split_documents(documents)
-    print(f"🔹 Total chunks created: {len(chunks)}")
-    # Embedding
-    embedding_model = HuggingFaceEmbeddings(
-        model_name="keepitreal/vietnamese-sbert",
-        model_kwargs={"device": "cpu"},  
-        encode_kwargs={"normalize_embeddings": True} 
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP
     )
+    files: Dict[str, Dict] = {}
+    new_chunks: List[Tuple[str, Document]] = []
+    for name in sorted(os.listdir(data_path)):
+        if not name.lower().endswith(".pdf"):
+            continue
+        path = os.path.join(data_path, name)
+        sha256 = file_sha256(path)
+        previous = old_files.get(name)
+        if previous and previous["sha256"] == sha256 and set(previous["chunks"]) <= existing_ids:
+            files[name] = previous
+            continue
+        chunks = split_file(path, text_splitter)
+        ids = chunk_ids(chunks, name)
+        files[name] = {"sha256": sha256, "chunks": ids}
+        new_chunks.extend((chunk_id, chunk) for chunk_id, chunk in zip(ids, chunks) if chunk_id not in existing_ids)
+
+    wanted_ids = {chunk_id for entry in files.values() for chunk_id in entry["chunks"]}
+    stale_ids = sorted(existing_ids - wanted_ids)
+    if db is not None and stale_ids:
+        db.delete(stale_ids)
+
+    if new_chunks:
+        texts = [chunk.page_content for _, chunk in new_chunks]
+        vectors = embed_in_batches(embedding_model, texts, batch_size)
+        text_embeddings = list(zip(texts, vectors))
+        metadatas = [chunk.metadata for _, chunk in new_chunks]
+        ids = [chunk_id for chunk_id, _ in new_chunks]
+        if db is None:
+            db = FAISS.from_embeddings(text_embeddings, embedding_model, metadatas=metadatas, ids=ids)
+        else:
+            db.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+
+    report = {
+        "chunks_total": len(wanted_ids),
+        "chunks_reused": len(wanted_ids) - len(new_chunks),
+        "chunks_embedded": len(new_chunks),
+        "chunks_deleted": len(stale_ids),
+    }
+    if db is not None:
+        os.makedirs(db_path, exist_ok=True)
+        db.save_local(db_path)
+        export_serving_store(db, db_path)
+        export_lexical_index(db, db_path)
+        report["index"] = export_compact_index(db, db_path, index_type, index_options)
+        save_manifest(db_path, {"config": config, "files": files})
+    return db, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or incrementally update the FAQ vectorstore")
+    parser.add_argument("--data-dir", default=pdf_data_path)
+    parser.add_argument("--output", default=vector_db_path)
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and re-embed everything")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=INDEX_TYPE, help="index served at query time")
+    parser.add_argument("--nlist", type=int, default=DEFAULT_INDEX_OPTIONS["nlist"], help="IVF cells (0: about 4*sqrt(n))")
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_INDEX_OPTIONS["nprobe"], help="IVF cells searched per query")
+    parser.add_argument("--pq-m", type=int, default=DEFAULT_INDEX_OPTIONS["pq_m"], help="IVF-PQ sub-quantizers")
+    parser.add_argument("--pq-nbits", type=int, default=DEFAULT_INDEX_OPTIONS["pq_nbits"], help="IVF-PQ bits per code")
+    parser.add_argument("--hnsw-m", type=int, default=DEFAULT_INDEX_OPTIONS["hnsw_m"], help="HNSW neighbours per node")
+    parser.add_argument("--ef-construction", type=int, default=DEFAULT_INDEX_OPTIONS["ef_construction"])
+    parser.add_argument("--ef-search", type=int, default=DEFAULT_INDEX_OPTIONS["ef_search"])
+    parser.add_argument("--test-query", default="Dịch vụ nấu ăn", help="query to sanity-check the result")
+    args = parser.parse_args()
 
-    # Save to Faiss vector DB
-    db = FAISS.from_documents(documents=chunks, embedding=embedding_model)
-    db.save_local(vector_db_path)
-    
+    load_dotenv()
+    setup_logging(log_file="-")
+    index_options = {name: getattr(args, name) for name in DEFAULT_INDEX_OPTIONS}
+    db, report = update_db(args.data_dir, args.output, args.batch_size, args.full, args.index_type, index_options)
+    index = report.pop("index", None)
+    log_event(logger, logging.INFO, "vectorstore updated", path=args.output, **report)
+    if index is not None:
+        log_event(logger, logging.INFO, "serving index", type=index["type"], build=index["build"], search=index["search"])
 
     # Test a query to verify
-    test_query = "Dịch vụ nấu ăn"
-    docs = db.similarity_search(test_query, k=5)
-    for i, doc in enumerate(docs):
-        print(f"\n>> Kết quả {i+1}:")
-        print(doc.page_content[:300])
+    if db is not None and args.test_query:
+        docs = db.similarity_search(args.test_query, k=5)
+        for i, doc in enumerate(docs):
+            log_event(logger, logging.INFO, "test query result", query=args.test_query, rank=i + 1,
+                      content=doc.page_content[:300])
 
-    return db
 
-create_db_from_files()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
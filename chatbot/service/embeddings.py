@@ -0,0 +1,227 @@
+"""Query encoder backends for the SBERT embedding model.
+
+EMBEDDING_BACKEND selects:
+    hf         HuggingFaceEmbeddings (PyTorch), the model the index was built with
+    onnx       ONNX Runtime export of the same model
+    onnx-int8  the ONNX export with dynamically quantized int8 weights
+
+All three mean-pool and L2-normalize like the sentence-transformers model,
+so their vectors can be searched against the existing db_faiss. The ONNX
+files are produced offline and checked before switching:
+
+    python -m service.embeddings export [--output DIR]
+    python -m service.embeddings parity --backend onnx-int8
+
+Thread counts default to the CPUs the container may use (cgroup quota),
+not the host's core count.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+from typing import List, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EMBEDDING_MODEL = "keepitreal/vietnamese-sbert"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "hf")
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", os.path.join(BASE_DIR, "models", "vietnamese-sbert-onnx"))
+EMBEDDING_MAX_LENGTH = int(os.getenv("EMBEDDING_MAX_LENGTH", 256))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+ONNX_MODEL_NAME = "model.onnx"
+ONNX_INT8_MODEL_NAME = "model-int8.onnx"
+BACKENDS = ("hf", "onnx", "onnx-int8")
+
+
+def container_cpus() -> int:
+    """CPUs available to this process, honouring a cgroup CPU quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = None
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()
+            if limit != "max":
+                quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", 0)) or container_cpus()
+
+
+class OnnxEmbeddings:
+    """LangChain-compatible embeddings running the exported model on ONNX Runtime"""
+
+    def __init__(self, model_dir: str = EMBEDDING_ONNX_DIR, quantized: bool = False,
+                 threads: int = EMBEDDING_THREADS, max_length: int = EMBEDDING_MAX_LENGTH,
+                 batch_size: int = EMBEDDING_BATCH_SIZE):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("EMBEDDING_BACKEND=onnx requires the 'onnxruntime' package") from e
+        from transformers import AutoTokenizer
+
+        model_path = os.path.join(model_dir, ONNX_INT8_MODEL_NAME if quantized else ONNX_MODEL_NAME)
+        if not os.path.exists(model_path):
+            raise RuntimeError(f"{model_path} not found, run: python -m service.embeddings export")
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_length = max_length
+        self.batch_size = batch_size
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        import numpy as np
+
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+        inputs = {name: encoded[name].astype(np.int64) for name in ("input_ids", "attention_mask", "token_type_ids")
+                  if name in self.input_names and name in encoded}
+        hidden = self.session.run(None, inputs)[0]
+        # Mean pooling over the real tokens, then L2 normalization (as the sentence-transformers model)
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._encode(texts[start:start + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+
+def build_embeddings(backend: str = EMBEDDING_BACKEND, threads: int = EMBEDDING_THREADS):
+    """The query encoder for ``backend`` (one of BACKENDS)"""
+    if backend == "hf":
+        import torch
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        torch.set_num_threads(threads)
+        return HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL,
+            model_kwargs={"device": "cpu"},
+            encode_kwargs={"normalize_embeddings": True}
+        )
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEmbeddings(quantized=backend == "onnx-int8", threads=threads)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r} (expected one of {', '.join(BACKENDS)})")
+
+
+def export_onnx(output_dir: str = EMBEDDING_ONNX_DIR, opset: int = 17):
+    """Export the transformer to ONNX and write an int8 dynamically quantized copy next to it"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError as e:
+        raise RuntimeError("Exporting requires the 'onnxruntime' and 'onnx' packages") from e
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL)
+    model = AutoModel.from_pretrained(EMBEDDING_MODEL).eval()
+    sample = tokenizer(["Giá dịch vụ dọn dẹp nhà là bao nhiêu?"], return_tensors="pt")
+    model_path = os.path.join(output_dir, ONNX_MODEL_NAME)
+    dynamic = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            model_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={"input_ids": dynamic, "attention_mask": dynamic, "last_hidden_state": dynamic},
+            opset_version=opset,
+        )
+    quantize_dynamic(model_path, os.path.join(output_dir, ONNX_INT8_MODEL_NAME), weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, "export.json"), "w", encoding="utf-8") as f:
+        json.dump({"model": EMBEDDING_MODEL, "opset": opset, "max_length": EMBEDDING_MAX_LENGTH}, f, indent=2)
+
+
+def load_parity_queries(path: str) -> List[str]:
+    """Queries from a JSONL file with a "query" field, or one per line"""
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                queries.append(json.loads(line)["query"] if line.startswith("{") else line)
+    return queries
+
+
+def parity_check(backend: str, queries: List[str], vectorstore_path: str, k: int = 3,
+                 min_cosine: float = 0.98, min_overlap: float = 0.95) -> bool:
+    """Compare ``backend`` with the HF model: query cosine and top-k FAISS rows over the index"""
+    import numpy as np
+    from service.faiss_index import INDEX_NAME, read_index_mmap
+
+    reference = np.asarray(build_embeddings("hf").embed_documents(queries), dtype=np.float32)
+    candidate = np.asarray(build_embeddings(backend).embed_documents(queries), dtype=np.float32)
+    cosines = (reference * candidate).sum(axis=1)
+
+    index = read_index_mmap(os.path.join(vectorstore_path, INDEX_NAME))
+    k = min(k, index.ntotal)
+    _, expected = index.search(reference, k)
+    _, actual = index.search(candidate, k)
+    overlaps = [len(set(a) & set(e)) / k for a, e in zip(actual, expected)]
+    same_order = sum(list(a) == list(e) for a, e in zip(actual, expected))
+
+    print(f"{backend} vs hf on {len(queries)} queries:")
+    print(f"  cosine      min {cosines.min():.4f}  mean {cosines.mean():.4f}  (need >= {min_cosine})")
+    print(f"  top-{k} rows  mean overlap {np.mean(overlaps):.1%}, identical order {same_order}/{len(queries)}"
+          f"  (need >= {min_overlap:.0%})")
+    for query, cosine, overlap in zip(queries, cosines, overlaps):
+        if cosine < min_cosine or overlap < 1:
+            print(f"  {query[:60]!r}: cosine {cosine:.4f}, overlap {overlap:.0%}")
+    return bool(cosines.min() >= min_cosine and np.mean(overlaps) >= min_overlap)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Export and check the ONNX query encoders")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="export model.onnx and model-int8.onnx")
+    export.add_argument("--output", default=EMBEDDING_ONNX_DIR)
+    export.add_argument("--opset", type=int, default=17)
+    parity = commands.add_parser("parity", help="compare a backend with the HF model on db_faiss")
+    parity.add_argument("--backend", choices=BACKENDS[1:], default="onnx-int8")
+    parity.add_argument("--queries", default=os.path.join(BASE_DIR, "benchmarks", "retrieval_queries.jsonl"))
+    parity.add_argument("--vectorstore", default=os.path.join(BASE_DIR, "vectorstores", "db_faiss"))
+    parity.add_argument("--k", type=int, default=3)
+    parity.add_argument("--min-cosine", type=float, default=0.98)
+    parity.add_argument("--min-overlap", type=float, default=0.95)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        export_onnx(args.output, args.opset)
+        print(f"Exported {EMBEDDING_MODEL} to {args.output}")
+        return
+    ok = parity_check(args.backend, load_parity_queries(args.queries), args.vectorstore,
+                      args.k, args.min_cosine, args.min_overlap)
+    print("parity OK" if ok else "parity FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""FAISS index types for serving the FAQ vectorstore.
+
+``index.faiss`` written by LangChain is always a flat (exact) L2 index: it
+is the master copy the incremental builder adds to and deletes from. When
+another type is chosen at build time it is built from the flat vectors
+into ``index.compact.faiss`` with the same row order, and
+``index_meta.json`` records the type, build parameters and search
+parameters. The loader serves the compact index while it matches the flat
+one, and the flat index otherwise.
+
+Types:
+    flat      exact search
+    ivf-flat  inverted lists over k-means cells, exact distances (nlist, nprobe)
+    ivf-pq    inverted lists with product-quantized codes (nlist, pq_m, pq_nbits, nprobe)
+    hnsw      graph search, no training (hnsw_m, ef_construction, ef_search)
+
+FAISS_NPROBE / FAISS_EF_SEARCH override the stored search parameters.
+"""
+import functools
+import hashlib
+import json
+import logging
+import math
+import os
+from typing import Dict, Optional
+
+import faiss
+import numpy as np
+
+from service.log_config import get_logger, log_event
+
+INDEX_NAME = "index.faiss"
+COMPACT_INDEX_NAME = "index.compact.faiss"
+INDEX_META_NAME = "index_meta.json"
+INDEX_TYPES = ("flat", "ivf-flat", "ivf-pq", "hnsw")
+META_VERSION = 2
+
+DEFAULT_INDEX_OPTIONS = {
+    "nlist": 0,           # 0: about 4 * sqrt(n)
+    "pq_m": 48,           # sub-quantizers, must divide the dimension (768)
+    "pq_nbits": 8,
+    "hnsw_m": 32,
+    "ef_construction": 200,
+    "nprobe": 8,
+    "ef_search": 64,
+}
+# k-means wants at least this many training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+SEARCH_NPROBE = int(os.getenv("FAISS_NPROBE", 0)) or None
+SEARCH_EF = int(os.getenv("FAISS_EF_SEARCH", 0)) or None
+
+
+@functools.lru_cache(maxsize=16)
+def _file_digest(path: str, size: int, mtime_ns: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def index_digest(path: str) -> str:
+    """SHA-256 of a vectorstore's ``index.faiss``, recorded by the files exported from it.
+
+    The size alone does not tell a rebuilt flat index from the old one: it
+    only depends on the row count.
+    """
+    index_path = os.path.join(path, INDEX_NAME)
+    stat = os.stat(index_path)
+    return _file_digest(index_path, stat.st_size, stat.st_mtime_ns)
+
+
+def read_index_mmap(index_path: str):
+    """Open a FAISS index memory-mapped when the index type supports it"""
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    try:
+        return faiss.read_index(index_path, flags)
+    except RuntimeError:
+        return faiss.read_index(index_path)
+
+
+def build_index(vectors: np.ndarray, index_type: str, options: Optional[Dict] = None):
+    """Train (if needed) and fill an index of ``index_type``; returns (index, effective parameters)"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r} (expected one of {', '.join(INDEX_TYPES)})")
+    options = {**DEFAULT_INDEX_OPTIONS, **(options or {})}
+    n, d = vectors.shape
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(d)
+        index.add(vectors)
+        return index, {}
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, options["hnsw_m"], faiss.METRIC_L2)
+        index.hnsw.efConstruction = options["ef_construction"]
+        index.add(vectors)
+        return index, {"hnsw_m": options["hnsw_m"], "ef_construction": options["ef_construction"]}
+
+    nlist = options["nlist"] or int(4 * math.sqrt(n))
+    nlist = max(1, min(nlist, n // MIN_POINTS_PER_CENTROID))
+    quantizer = faiss.IndexFlatL2(d)
+    if index_type == "ivf-flat":
+        index = faiss.IndexIVFFlat(quantizer, d, nlist, faiss.METRIC_L2)
+        params = {"nlist": nlist}
+    else:
+        pq_m, pq_nbits = options["pq_m"], options["pq_nbits"]
+        if d % pq_m:
+            raise ValueError(f"pq_m={pq_m} does not divide the dimension {d}")
+        if n < 2 ** pq_nbits:
+            raise ValueError(f"ivf-pq with pq_nbits={pq_nbits} needs at least {2 ** pq_nbits} vectors, got {n}")
+        index = faiss.IndexIVFPQ(quantizer, d, nlist, pq_m, pq_nbits)
+        params = {"nlist": nlist, "pq_m": pq_m, "pq_nbits": pq_nbits}
+    index.train(vectors)
+    index.add(vectors)
+    return index, params
+
+
+def apply_search_params(index, search: Dict):
+    """Set nprobe / efSearch on a loaded index (env overrides win)"""
+    nprobe = SEARCH_NPROBE or search.get("nprobe")
+    ef_search = SEARCH_EF or search.get("ef_search")
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    if ivf is not None and nprobe:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+    if hnsw is not None and ef_search:
+        hnsw.efSearch = ef_search
+    return index
+
+
+def export_compact_index(db, path: str, index_type: str = "flat", options: Optional[Dict] = None) -> Dict:
+    """Build the serving index for a saved LangChain FAISS store and write its metadata"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r} (expected one of {', '.join(INDEX_TYPES)})")
+    options = {**DEFAULT_INDEX_OPTIONS, **(options or {})}
+    compact_path = os.path.join(path, COMPACT_INDEX_NAME)
+    meta = {
+        "version": META_VERSION,
+        "type": index_type,
+        "ntotal": int(db.index.ntotal),
+        "dimension": int(db.index.d),
+        "metric": "l2",
+        "source_index_sha256": index_digest(path),
+        "build": {},
+        "search": {},
+    }
+    if index_type != "flat":
+        try:
+            index, meta["build"] = build_index(db.index.reconstruct_n(0, db.index.ntotal), index_type, options)
+        except ValueError as e:
+            log_event(get_logger("vectorstore"), logging.WARNING, f"cannot build a {index_type} index, serving the flat index",
+                      path=path, error=str(e))
+            meta["type"] = index_type = "flat"
+    if index_type == "flat":
+        if os.path.exists(compact_path):
+            os.remove(compact_path)
+    else:
+        meta["search"] = {"nprobe": options["nprobe"]} if index_type.startswith("ivf") else {"ef_search": options["ef_search"]}
+        faiss.write_index(index, compact_path + ".tmp")
+        os.replace(compact_path + ".tmp", compact_path)
+        meta["index_bytes"] = os.path.getsize(compact_path)
+    with open(os.path.join(path, INDEX_META_NAME + ".tmp"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(os.path.join(path, INDEX_META_NAME + ".tmp"), os.path.join(path, INDEX_META_NAME))
+    return meta
+
+
+def load_index_meta(path: str) -> Optional[Dict]:
+    """index_meta.json when it describes the current index.faiss, else None"""
+    try:
+        with open(os.path.join(path, INDEX_META_NAME), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != META_VERSION:
+            return None
+        if meta["source_index_sha256"] != index_digest(path):
+            return None
+        if meta["type"] != "flat" and not os.path.exists(os.path.join(path, COMPACT_INDEX_NAME)):
+            return None
+        return meta
+    except (FileNotFoundError, KeyError, ValueError):
+        return None
+
+
+def load_index(path: str):
+    """The index to serve from a vectorstore directory: the compact one if current, else the flat one"""
+    meta = load_index_meta(path)
+    if meta is None or meta["type"] == "flat":
+        return read_index_mmap(os.path.join(path, INDEX_NAME))
+    index = read_index_mmap(os.path.join(path, COMPACT_INDEX_NAME))
+    if index.ntotal != meta["ntotal"]:
+        log_event(get_logger("vectorstore"), logging.WARNING, f"{COMPACT_INDEX_NAME} is stale, serving the flat index", path=path)
+        return read_index_mmap(os.path.join(path, INDEX_NAME))
+    return apply_search_params(index, meta["search"])
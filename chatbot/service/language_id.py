@@ -0,0 +1,150 @@
+"""Deterministic, in-process language identification for chat queries.
+
+Only the distinction the chatbot acts on is made: Vietnamese ('vi'),
+English ('en') or anything else ('other'). The checks run cheapest first:
+
+1. letters only Vietnamese uses (ă, ơ, ư, đ, dot below, hook above, ...)
+   -> 'vi' without looking further
+2. a majority of non-Latin letters (CJK, Cyrillic, Thai, ...) -> 'other'
+3. Latin letters that are not in the Vietnamese alphabet (ñ, ç, ü, ß, ...)
+   -> 'other'
+4. otherwise the words are scored against small function-word lists and,
+   for Vietnamese typed without accents, against the syllable structure
+"""
+import functools
+import os
+import re
+import unicodedata
+from typing import Dict, FrozenSet, Iterable
+
+LANGUAGE_CACHE_SIZE = int(os.getenv("LANGUAGE_CACHE_SIZE", 4096))
+
+_BREVE, _CIRCUMFLEX, _HORN = "̆", "̂", "̛"
+_TONES = ["", "̀", "́", "̉", "̃", "̣"]  # huyền, sắc, hỏi, ngã, nặng
+_VOWELS = ["a", "a" + _BREVE, "a" + _CIRCUMFLEX, "e", "e" + _CIRCUMFLEX, "i",
+           "o", "o" + _CIRCUMFLEX, "o" + _HORN, "u", "u" + _HORN, "y"]
+
+
+def _vietnamese_letters():
+    """(every Vietnamese letter, the ones no other common Latin-script language uses)"""
+    alphabet, unique = set("abcdđeghiklmnopqrstuvxy"), {"đ"}
+    for vowel in _VOWELS:
+        for tone in _TONES:
+            letter = unicodedata.normalize("NFC", vowel + tone)
+            alphabet.add(letter)
+            marks = vowel[1:] + tone
+            if (len(marks) >= 2 or marks in (_BREVE, _HORN, "̉", "̣")
+                    or (tone == "̃" and vowel in ("e", "i", "u", "y"))):
+                unique.add(letter)
+    # Not Vietnamese, but common in English text (brand names, "fix", "wifi")
+    alphabet.update("fjwz")
+    return frozenset(alphabet), frozenset(unique)
+
+
+VI_ALPHABET, VI_UNIQUE_LETTERS = _vietnamese_letters()
+
+# Vietnamese syllable typed without accents: onset, vowel nucleus, coda
+VI_SYLLABLE = re.compile(r"^(ngh|ng|nh|ch|gh|gi|kh|ph|qu|th|tr|[bcdghklmnprstvx])?[aeiouy]{1,3}(ch|ng|nh|[cmnpt])?$")
+
+VI_WORDS = frozenset("""
+    toi ban minh em anh chi chu ong ba ho chung ta ai gi nao sao the nay kia do
+    la co khong duoc va hoac nhung neu thi ma vi de cho voi cua tai o trong ngoai
+    mot hai bon nam sau bay tam chin muoi tram nghin trieu
+    gia bao nhieu tien phi chi dich vu don dep nha ve sinh nau an sua dieu hoa
+    may lanh tivi xe dien nuoc dat lich huy hen gio ngay tuan thang cuoi sang chieu toi
+    muon can hoi giup lam nhu cach xin chao cam on vui long roi da se dang chua
+    tai khoan mat khau dang nhap ky ung dung thanh toan hoan chinh sach mien
+    nguoi mon phong dien tich moi rat nhieu it lon nho tot
+""".split())
+
+EN_WORDS = frozenset("""
+    the a an is are was were be been being am to of and in on at for with from by
+    about as it its this that these those i you he she we they my your our their
+    me him her us them what which who where when why how can could would should
+    will may might must do does did have has had not no yes please thanks thank
+    hello hi hey want need get make much many price cost fee service book booking
+    cancel clean cleaning cook cooking repair fix there here if or but so than
+    then any some all more most very just also only account password login app
+""".split())
+
+OTHER_WORDS: Dict[str, Iterable[str]] = {
+    "fr": "le les des est et une un du je vous pour pas que qui dans avec ce sont au combien bonjour merci".split(),
+    "es": "el la los las de es y en una por para con que como cuanto cuesta hola gracias del usted".split(),
+    "de": "der die das und ist ich nicht ein eine mit wie viel was kostet hallo danke bitte".split(),
+    "it": "il gli che di per non sono ciao grazie quanto costa una".split(),
+    "pt": "os um uma voce nao com obrigado quanto custa ola".split(),
+    "id": "saya anda yang dan ini itu tidak apa berapa dengan untuk terima kasih".split(),
+}
+
+GREETINGS = ('hello', 'hi', 'ok', 'thanks', 'sorry')
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def strip_accents(word: str) -> str:
+    decomposed = unicodedata.normalize("NFD", word.replace("đ", "d"))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _is_latin(ch: str) -> bool:
+    return ch < "ɐ" or "Ḁ" <= ch <= "ỿ"
+
+
+class LanguageIdentifier:
+    """Classifies text as 'vi', 'en' or 'other'; results are cached per normalized text"""
+
+    def __init__(self, cache_size: int = LANGUAGE_CACHE_SIZE):
+        self.other_words: Dict[str, FrozenSet[str]] = {lang: frozenset(words) for lang, words in OTHER_WORDS.items()}
+        self._identify_cached = functools.lru_cache(maxsize=cache_size)(self._identify)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return _SPACE_RE.sub(" ", unicodedata.normalize("NFC", text).lower()).strip()
+
+    def detect(self, text: str) -> str:
+        return self._identify_cached(self.normalize(text))
+
+    def cache_info(self):
+        return self._identify_cached.cache_info()
+
+    def _identify(self, text: str) -> str:
+        words = [word for word in _WORD_RE.findall(text) if word.isalpha()]
+        if not words:
+            return 'vi'
+        # Greetings and acknowledgements are answered in Vietnamese
+        if len(words) <= 2 and any(word in GREETINGS for word in words):
+            return 'vi'
+
+        letters = "".join(words)
+        if any(ch in VI_UNIQUE_LETTERS for ch in letters):
+            return 'vi'
+        non_latin = sum(1 for ch in letters if not _is_latin(ch))
+        if non_latin * 2 > len(letters):
+            return 'other'
+        if any(_is_latin(ch) and ch not in VI_ALPHABET for ch in letters):
+            return 'other'
+        return self._score_words(words)
+
+    def _score_words(self, words) -> str:
+        scores = {'vi': 0.0, 'en': 0.0, 'other': 0.0}
+        other_hits = dict.fromkeys(self.other_words, 0)
+        for word in words:
+            plain = strip_accents(word)
+            known = False
+            if plain in VI_WORDS:
+                scores['vi'] += 1
+                known = True
+            if word in EN_WORDS:
+                scores['en'] += 1
+                known = True
+            for lang, vocabulary in self.other_words.items():
+                if plain in vocabulary:
+                    other_hits[lang] += 1
+                    known = True
+            if not known:
+                # Unknown words lean on shape: Vietnamese syllable or not
+                scores['vi' if VI_SYLLABLE.match(plain) else 'en'] += 0.5
+        scores['other'] = max(other_hits.values())
+        # Ties go to the supported languages
+        return max(('vi', 'en', 'other'), key=lambda lang: scores[lang])
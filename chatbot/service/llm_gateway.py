@@ -0,0 +1,348 @@
+"""Resilient access to the chat LLM.
+
+Every LLM call goes through ``LLMGateway``, which wraps a LangChain chat
+model (``invoke``/``ainvoke``/``astream``) with:
+
+- a deadline for the whole call, retries included (CHAT_LLM_TIMEOUT)
+- retries of timeouts, connection errors, 429 and 5xx with full-jitter
+  exponential backoff
+- optional hedging: when an attempt is slower than the LLM_HEDGE_PERCENTILE
+  latency of recent calls a second identical request is sent and the
+  first answer wins
+- a circuit breaker that fails fast with ``LLMUnavailable`` after
+  LLM_BREAKER_FAILURES consecutive failures, letting one trial call
+  through every LLM_BREAKER_RESET seconds
+
+Callers catch ``LLMUnavailable`` and fall back to an answer that does not
+need the LLM. The Groq client itself is built with a pooled httpx client,
+its own retries off and a per-attempt timeout.
+"""
+import asyncio
+import concurrent.futures
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from service.metrics import REGISTRY
+
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama3-8b-8192")
+# e.g. http://127.0.0.1:8900 for benchmarks/fake_groq.py
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+LLM_DEADLINE = float(os.getenv("CHAT_LLM_TIMEOUT", 30))
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", 15))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.25))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 4))
+# 0 disables hedging, 0.95 hedges attempts slower than the recent p95
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", 0))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", 32))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 5))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", 30))
+
+RETRYABLE_STATUS = (408, 409, 425, 429, 500, 502, 503, 504)
+RETRYABLE_ERROR_NAMES = ('APITimeoutError', 'APIConnectionError', 'ConnectError', 'ConnectTimeout',
+                         'ReadTimeout', 'ReadError', 'RemoteProtocolError', 'PoolTimeout')
+
+LLM_CALLS_TOTAL = REGISTRY.counter("chatbot_llm_calls_total", "LLM gateway calls and attempts by outcome")
+
+
+class LLMUnavailable(RuntimeError):
+    """The LLM could not answer: circuit open, deadline passed or retries exhausted"""
+
+
+def build_groq_client(base_url: Optional[str] = GROQ_BASE_URL, timeout: float = LLM_ATTEMPT_TIMEOUT,
+                      pool_size: int = LLM_POOL_SIZE):
+    """ChatGroq on pooled keep-alive connections, retries left to the gateway"""
+    import httpx
+    from langchain_groq import ChatGroq
+
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    return ChatGroq(
+        api_key=os.getenv("GROQ_API_KEY"),
+        model_name=GROQ_MODEL,
+        base_url=base_url,
+        timeout=timeout,
+        max_retries=0,
+        http_client=httpx.Client(limits=limits, timeout=timeout),
+        http_async_client=httpx.AsyncClient(limits=limits, timeout=timeout),
+    )
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, ConnectionError, concurrent.futures.TimeoutError, asyncio.TimeoutError)):
+        return True
+    status = getattr(exc, 'status_code', None) or getattr(getattr(exc, 'response', None), 'status_code', None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS
+    return type(exc).__name__ in RETRYABLE_ERROR_NAMES
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures -> half-open trial after ``reset_timeout``
+
+    A trial that neither succeeds nor fails (cancelled) is released with
+    ``abandon_trial``; one still running after ``trial_timeout`` no longer
+    blocks the next.
+    """
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_timeout: float = LLM_BREAKER_RESET,
+                 trial_timeout: float = LLM_DEADLINE):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.trial_timeout = trial_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self._trial_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and (not self._trial_running
+                                         or time.monotonic() - self._trial_started >= self.trial_timeout):
+                self._trial_running = True
+                self._trial_started = time.monotonic()
+                return True
+            return False
+
+    def abandon_trial(self):
+        """Let the next call be the trial, without counting this one either way"""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class LatencyWindow:
+    """Latencies of the last ``size`` successful attempts"""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LLMGateway:
+    """Deadline, retries, hedging and circuit breaking around a LangChain chat model"""
+
+    def __init__(self, client, deadline: float = LLM_DEADLINE, max_retries: int = LLM_MAX_RETRIES,
+                 backoff_base: float = LLM_BACKOFF_BASE, backoff_max: float = LLM_BACKOFF_MAX,
+                 hedge_percentile: float = LLM_HEDGE_PERCENTILE, breaker: Optional[CircuitBreaker] = None,
+                 pool_size: int = LLM_POOL_SIZE):
+        self.client = client
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = LatencyWindow()
+        self.pool_size = pool_size
+        # Created on first sync call (never before a fork)
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.pool_size, thread_name_prefix="llm")
+        return self._executor
+
+    def hedge_delay(self) -> Optional[float]:
+        if self.hedge_percentile <= 0 or len(self.latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return self.latencies.percentile(self.hedge_percentile)
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _admit(self):
+        if not self.breaker.allow():
+            LLM_CALLS_TOTAL.inc(outcome='short_circuit')
+            raise LLMUnavailable("LLM circuit breaker is open")
+
+    def _failed(self, exc: BaseException, attempt: int, deadline: float) -> float:
+        """Record a failed attempt; the backoff before the next one, or raise LLMUnavailable"""
+        retryable = is_retryable(exc)
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            # Not an outage (bad request, ...), but this call is over
+            self.breaker.record_success()
+        delay = self.backoff(attempt)
+        if not retryable or attempt >= self.max_retries or self.breaker.state != 'closed':
+            LLM_CALLS_TOTAL.inc(outcome='error')
+            raise LLMUnavailable(f"LLM call failed: {exc!r}") from exc
+        if time.monotonic() + delay >= deadline:
+            LLM_CALLS_TOTAL.inc(outcome='deadline')
+            raise LLMUnavailable(f"LLM deadline exceeded after {exc!r}") from exc
+        LLM_CALLS_TOTAL.inc(outcome='retry')
+        return delay
+
+    def _succeeded(self, started: float):
+        self.latencies.add(time.monotonic() - started)
+        self.breaker.record_success()
+        LLM_CALLS_TOTAL.inc(outcome='ok')
+
+    def invoke(self, prompt, **kwargs):
+        self._admit()
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                response = self._attempt(prompt, deadline, kwargs)
+            except Exception as e:
+                time.sleep(self._failed(e, attempt, deadline))
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.abandon_trial()
+                raise
+            self._succeeded(started)
+            return response
+
+    def _attempt(self, prompt, deadline: float, kwargs):
+        futures = [self.executor.submit(self.client.invoke, prompt, **kwargs)]
+        hedge_after = self.hedge_delay()
+        if hedge_after is not None and time.monotonic() + hedge_after < deadline:
+            done, _ = concurrent.futures.wait(futures, timeout=hedge_after)
+            if not done:
+                LLM_CALLS_TOTAL.inc(outcome='hedge')
+                futures.append(self.executor.submit(self.client.invoke, prompt, **kwargs))
+        pending, error = set(futures), None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, timeout=max(deadline - time.monotonic(), 0),
+                                                    return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                # The losing requests finish in the background, bounded by the client timeout
+                raise concurrent.futures.TimeoutError("LLM attempt exceeded the deadline")
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def ainvoke(self, prompt, **kwargs):
+        self._admit()
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                response = await self._aattempt(prompt, deadline, kwargs)
+            except Exception as e:
+                await asyncio.sleep(self._failed(e, attempt, deadline))
+                attempt += 1
+                continue
+            except BaseException:
+                # Cancelled (client gone, outer timeout): no verdict on the LLM
+                self.breaker.abandon_trial()
+                raise
+            self._succeeded(started)
+            return response
+
+    async def _aattempt(self, prompt, deadline: float, kwargs):
+        tasks = [asyncio.ensure_future(self.client.ainvoke(prompt, **kwargs))]
+        try:
+            hedge_after = self.hedge_delay()
+            if hedge_after is not None and time.monotonic() + hedge_after < deadline:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done:
+                    LLM_CALLS_TOTAL.inc(outcome='hedge')
+                    tasks.append(asyncio.ensure_future(self.client.ainvoke(prompt, **kwargs)))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=max(deadline - time.monotonic(), 0),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError("LLM attempt exceeded the deadline")
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def astream(self, prompt, **kwargs):
+        """Stream chunks; attempts are retried only until the first chunk has been yielded"""
+        self._admit()
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            started, streamed = time.monotonic(), False
+            try:
+                async for chunk in self.client.astream(prompt, **kwargs):
+                    if not streamed:
+                        streamed = True
+                        self._succeeded(started)
+                    yield chunk
+                if not streamed:
+                    self._succeeded(started)
+                return
+            except Exception as e:
+                if streamed:
+                    LLM_CALLS_TOTAL.inc(outcome='error')
+                    raise LLMUnavailable(f"LLM stream broke off: {e!r}") from e
+                await asyncio.sleep(self._failed(e, attempt, deadline))
+                attempt += 1
+            except BaseException:
+                # Cancelled or closed (GeneratorExit) before the first chunk settled the trial
+                if not streamed:
+                    self.breaker.abandon_trial()
+                raise
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            'breaker': {
+                'open': int(self.breaker.state != 'closed'),
+                'consecutive_failures': self.breaker.failures,
+            },
+            'latency': {
+                'samples': len(self.latencies),
+                'p50': self.latencies.percentile(0.5) or 0.0,
+                'p95': self.latencies.percentile(0.95) or 0.0,
+            },
+        }
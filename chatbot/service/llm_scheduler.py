@@ -0,0 +1,248 @@
+"""Admission control in front of the LLM call sites.
+
+Every LLM call takes a slot from ``LLMScheduler`` first. A slot needs a
+free concurrency slot (LLM_SCHEDULER_CONCURRENCY) and a token from a
+requests-per-minute bucket matching the Groq quota (LLM_REQUESTS_PER_MINUTE,
+bursts of LLM_RATE_BURST; 0 disables it). Callers that cannot get one
+wait in a bounded queue per priority class:
+
+- ``rag``: FAQ answers (app_related, policy, account and the service
+  intents) and LLM classification, always served first
+- ``general``: small talk, served only when no ``rag`` call is waiting
+
+Under overload ``general`` calls are shed instead of queued: when their
+queue is full (LLM_QUEUE_GENERAL) or LLM_SHED_DEPTH calls of any class are
+already waiting. A full ``rag`` queue (LLM_QUEUE_RAG) sheds ``rag`` calls
+too. A call that waits longer than its class's limit
+(LLM_QUEUE_WAIT_RAG / LLM_QUEUE_WAIT_GENERAL) gives up. Both raise
+``LLMOverloaded``, an ``LLMUnavailable``, so the handlers answer with their
+usual fallback straight away instead of adding to the backlog.
+
+``slot`` serves threads, ``aslot`` coroutines; both share the queues.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Deque, Dict, Optional
+
+from service.llm_gateway import LLM_POOL_SIZE, LLMUnavailable
+from service.metrics import REGISTRY, stage
+
+PRIORITIES = ('rag', 'general')
+
+LLM_SCHEDULER_CONCURRENCY = int(os.getenv("LLM_SCHEDULER_CONCURRENCY", LLM_POOL_SIZE))
+# Groq free tier for llama3-8b-8192: 30 requests per minute
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", 30))
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", 5))
+LLM_QUEUE_LIMITS = {
+    'rag': int(os.getenv("LLM_QUEUE_RAG", 64)),
+    'general': int(os.getenv("LLM_QUEUE_GENERAL", 16)),
+}
+LLM_SHED_DEPTH = int(os.getenv("LLM_SHED_DEPTH", 8))
+LLM_QUEUE_WAITS = {
+    'rag': float(os.getenv("LLM_QUEUE_WAIT_RAG", 10)),
+    'general': float(os.getenv("LLM_QUEUE_WAIT_GENERAL", 2)),
+}
+
+LLM_QUEUE_WAIT_SECONDS = REGISTRY.histogram("chatbot_llm_queue_wait_seconds", "Time LLM calls waited for a scheduler slot")
+LLM_ADMISSIONS_TOTAL = REGISTRY.counter("chatbot_llm_admissions_total", "LLM calls admitted, shed or timed out in the scheduler queue")
+
+
+class LLMOverloaded(LLMUnavailable):
+    """The LLM call was not admitted: its queue is too deep or the wait too long"""
+
+
+class TokenBucket:
+    """``per_minute`` tokens a minute, at most ``capacity`` saved up"""
+
+    def __init__(self, per_minute: float, capacity: int):
+        self.rate = per_minute / 60
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """Take a token and return 0, or return the seconds until one is available"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        """Give back a token that was taken but not used"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _Waiter:
+    __slots__ = ('priority', 'enqueued_at', 'granted', 'event', 'loop', 'future')
+
+    def __init__(self, priority: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.loop = loop
+        self.event = None if loop is not None else threading.Event()
+        self.future = loop.create_future() if loop is not None else None
+
+    def grant(self) -> bool:
+        """Wake the waiter; False if its event loop is already closed"""
+        if self.future is not None:
+            try:
+                self.loop.call_soon_threadsafe(_resolve, self.future)
+            except RuntimeError:
+                return False
+        else:
+            self.event.set()
+        self.granted = True
+        return True
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency: int = LLM_SCHEDULER_CONCURRENCY,
+                 requests_per_minute: float = LLM_REQUESTS_PER_MINUTE, burst: int = LLM_RATE_BURST,
+                 queue_limits: Optional[Dict[str, int]] = None, shed_depth: int = LLM_SHED_DEPTH,
+                 max_waits: Optional[Dict[str, float]] = None):
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(requests_per_minute, burst) if requests_per_minute > 0 else None
+        self.queue_limits = {**LLM_QUEUE_LIMITS, **(queue_limits or {})}
+        self.shed_depth = shed_depth
+        self.max_waits = {**LLM_QUEUE_WAITS, **(max_waits or {})}
+        self._queues: Dict[str, Deque[_Waiter]] = {priority: deque() for priority in PRIORITIES}
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self.in_flight = 0
+        self.counts = {priority: {'admitted': 0, 'shed': 0, 'timed_out': 0} for priority in PRIORITIES}
+
+    def _enqueue(self, priority: str, loop: Optional[asyncio.AbstractEventLoop] = None) -> _Waiter:
+        if priority not in self._queues:
+            raise ValueError(f"Unknown LLM priority {priority!r}, expected one of {PRIORITIES}")
+        with self._lock:
+            depth = sum(len(queue) for queue in self._queues.values())
+            queue = self._queues[priority]
+            if len(queue) >= self.queue_limits[priority] or (priority == 'general' and depth >= self.shed_depth):
+                self.counts[priority]['shed'] += 1
+                shed = True
+            else:
+                shed = False
+                waiter = _Waiter(priority, loop)
+                queue.append(waiter)
+                self._dispatch()
+        if shed:
+            LLM_ADMISSIONS_TOTAL.inc(priority=priority, result='shed')
+            raise LLMOverloaded(f"LLM queue too deep ({depth} waiting), {priority} call shed")
+        return waiter
+
+    def _dispatch(self):
+        """Grant slots to the waiters in priority order (lock held)"""
+        while self.in_flight < self.max_concurrency:
+            queue = next((queue for queue in self._queues.values() if queue), None)
+            if queue is None:
+                return
+            if self.bucket is not None:
+                delay = self.bucket.take()
+                if delay:
+                    self._wake_in(delay)
+                    return
+            waiter = queue.popleft()
+            if waiter.grant():
+                self.in_flight += 1
+            elif self.bucket is not None:
+                # The waiter's event loop is gone, its token goes to the next one
+                self.bucket.refund()
+
+    def _wake_in(self, delay: float):
+        if self._timer is None:
+            self._timer = threading.Timer(delay, self._wake)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _wake(self):
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def _settle(self, waiter: _Waiter):
+        """After waiting: keep the slot if it was granted, else leave the queue and raise"""
+        with self._lock:
+            granted = waiter.granted
+            if not granted:
+                self._queues[waiter.priority].remove(waiter)
+            self.counts[waiter.priority]['admitted' if granted else 'timed_out'] += 1
+        if not granted:
+            LLM_ADMISSIONS_TOTAL.inc(priority=waiter.priority, result='timed_out')
+            raise LLMOverloaded(f"No LLM slot within {self.max_waits[waiter.priority]:.1f}s, {waiter.priority} call dropped")
+        LLM_QUEUE_WAIT_SECONDS.observe(time.monotonic() - waiter.enqueued_at, priority=waiter.priority)
+        LLM_ADMISSIONS_TOTAL.inc(priority=waiter.priority, result='admitted')
+
+    def _abandon(self, waiter: _Waiter):
+        """A cancelled waiter: give back its slot, or leave the queue"""
+        with self._lock:
+            if waiter.granted:
+                self.in_flight -= 1
+                self._dispatch()
+            else:
+                self._queues[waiter.priority].remove(waiter)
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority: str):
+        """Hold an LLM slot for the block; raises LLMOverloaded when shed"""
+        with stage("llm_queue"):
+            waiter = self._enqueue(priority)
+            if not waiter.granted:
+                waiter.event.wait(self.max_waits[priority])
+            self._settle(waiter)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self, priority: str):
+        """Async variant of slot"""
+        with stage("llm_queue"):
+            waiter = self._enqueue(priority, asyncio.get_running_loop())
+            if not waiter.granted:
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter.future), self.max_waits[priority])
+                except asyncio.TimeoutError:
+                    pass
+                except asyncio.CancelledError:
+                    self._abandon(waiter)
+                    raise
+            self._settle(waiter)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            stats = {priority: {'queued': len(self._queues[priority]), **self.counts[priority]}
+                     for priority in PRIORITIES}
+            if self.bucket is not None:
+                self.bucket._refill()
+            stats['slots'] = {
+                'in_flight': self.in_flight,
+                'max': self.max_concurrency,
+                'tokens': round(self.bucket.tokens, 2) if self.bucket is not None else -1,
+            }
+        return stats
@@ -0,0 +1,156 @@
+"""Background JSON logging for the chatbot.
+
+Request threads only put the LogRecord on a bounded queue; a QueueListener
+thread formats each record as one JSON object per line and writes it to a
+size-rotated file. When the queue is full records are dropped (and
+counted) rather than blocking a request.
+
+Every stage logs to its own ``chatbot.<stage>`` logger (see ``get_logger``)
+so levels can be set per stage, e.g. LOG_LEVELS="rag=WARNING,classify=DEBUG".
+Structured fields are passed with ``log_event``; ``log_payload`` adds
+verbose fields (the RAG answer's raw LLM response and retrieved context)
+only for a sample of requests (LOG_PAYLOAD_SAMPLE_RATE), the others log
+just their sizes.
+
+LOG_FILE="-" writes the JSON lines to stdout instead of a file.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+from service.metrics import REGISTRY
+
+LOG_FILE = os.getenv("LOG_FILE", "chatbot.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 20 * 2 ** 20))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", 0.05))
+
+LOG_RECORDS_DROPPED_TOTAL = REGISTRY.counter("chatbot_log_records_dropped_total", "Log records dropped because the log queue was full")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+def get_logger(stage: str) -> logging.Logger:
+    return logging.getLogger(f"chatbot.{stage}")
+
+
+def log_event(logger: logging.Logger, level: int, message: str, **fields):
+    """Log ``message`` with structured ``fields`` (skipped cheaply when the level is disabled)"""
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra={"fields": fields})
+
+
+def log_payload(logger: logging.Logger, level: int, message: str, fields: Dict,
+                payload: Callable[[], Dict], sample_rate: float = LOG_PAYLOAD_SAMPLE_RATE):
+    """log_event plus the verbose ``payload()`` fields for a ``sample_rate`` share of the calls"""
+    if logger.isEnabledFor(level):
+        if sample_rate >= 1 or random.random() < sample_rate:
+            fields = {**fields, **payload()}
+        logger.log(level, message, extra={"fields": fields})
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """"rag=WARNING,classify=DEBUG" -> {"rag": "WARNING", "classify": "DEBUG"}"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        stage, _, level = item.partition("=")
+        levels[stage.strip()] = level.strip().upper()
+    return levels
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and the record's fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records as they are; formatting happens on the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED_TOTAL.inc()
+
+
+def background_handler(target: logging.Handler, queue_size: int = LOG_QUEUE_SIZE):
+    """A queue handler feeding ``target`` from a listener thread; returns (handler, started listener)"""
+    records = queue.Queue(queue_size)
+    listener = logging.handlers.QueueListener(records, target, respect_handler_level=True)
+    listener.start()
+    return _DroppingQueueHandler(records), listener
+
+
+def setup_logging(log_file: str = LOG_FILE, level: str = LOG_LEVEL, stage_levels: str = LOG_LEVELS,
+                  rotate: bool = True):
+    """Route the root logger through the background queue (no-op if logging is already configured)
+
+    With several processes on one file only one of them may rotate it; the
+    others (``rotate=False``) reopen the file when it has been rotated.
+    """
+    global _listener
+    with _setup_lock:
+        root = logging.getLogger()
+        if _listener is not None or root.handlers:
+            return
+        if log_file == "-":
+            target = logging.StreamHandler(sys.stdout)
+        elif rotate:
+            target = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+        else:
+            target = logging.handlers.WatchedFileHandler(log_file, encoding="utf-8")
+        target.setFormatter(JsonFormatter())
+        handler, _listener = background_handler(target)
+        root.addHandler(handler)
+        root.setLevel(level)
+        for stage, stage_level in parse_levels(stage_levels).items():
+            get_logger(stage).setLevel(stage_level)
+        atexit.register(stop_logging)
+
+
+def reset_after_fork():
+    """In a forked child: drop the parent's queue handler (its listener thread did not survive the fork)"""
+    global _listener, _setup_lock
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    _listener = None
+    _setup_lock = threading.Lock()
+
+
+def stop_logging():
+    """Flush the queued records and stop the listener thread"""
+    global _listener
+    with _setup_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
@@ -0,0 +1,270 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Seconds; covers cache hits (sub-ms) up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds the metrics and renders them in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        metric = Counter(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], List[str]]):
+        """Register a callable returning extra exposition lines at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+REQUEST_SECONDS = REGISTRY.histogram("chatbot_request_seconds", "End-to-end query latency by intent")
+STAGE_SECONDS = REGISTRY.histogram("chatbot_stage_seconds", "Latency of each query processing stage")
+REQUESTS_TOTAL = REGISTRY.counter("chatbot_requests_total", "Processed queries by intent")
+CACHE_LOOKUPS_TOTAL = REGISTRY.counter("chatbot_cache_lookups_total", "Cache lookups by cache and result")
+LLM_TOKENS_TOTAL = REGISTRY.counter("chatbot_llm_tokens_total", "LLM tokens by kind")
+DEGRADED_RESPONSES_TOTAL = REGISTRY.counter("chatbot_degraded_responses_total", "Queries answered without the unavailable LLM")
+
+
+class RequestTrace:
+    """Per-request record of stage latencies, cache hits, intent and tokens"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.cache_hits: Dict[str, bool] = {}
+        self.intent: Optional[str] = None
+        self.tokens: Dict[str, int] = {'prompt': 0, 'completion': 0}
+        # Answered without the LLM because it was unavailable; such answers are not cached
+        self.degraded = False
+        self.total: Optional[float] = None
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def record_cache(self, cache: str, hit: bool):
+        self.cache_hits[cache] = hit
+
+    def record_llm_usage(self, response):
+        """Add token counts from a LangChain AIMessage, when the provider reports them"""
+        usage = getattr(response, 'usage_metadata', None) or {}
+        self.tokens['prompt'] += usage.get('input_tokens', 0)
+        self.tokens['completion'] += usage.get('output_tokens', 0)
+
+    def record_degraded(self):
+        self.degraded = True
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started_at
+        intent = self.intent or 'unknown'
+        REQUEST_SECONDS.observe(self.total, intent=intent)
+        REQUESTS_TOTAL.inc(intent=intent)
+        for name, seconds in self.stages.items():
+            STAGE_SECONDS.observe(seconds, stage=name)
+        for cache, hit in self.cache_hits.items():
+            CACHE_LOOKUPS_TOTAL.inc(cache=cache, result='hit' if hit else 'miss')
+        for kind, count in self.tokens.items():
+            if count:
+                LLM_TOKENS_TOTAL.inc(count, kind=kind)
+        if self.degraded:
+            DEGRADED_RESPONSES_TOTAL.inc(intent=intent)
+
+    def timing_header(self) -> str:
+        """Server-Timing style summary, durations in milliseconds"""
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        if self.total is not None:
+            parts.append(f"total;dur={self.total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+class _NullTrace(RequestTrace):
+    """Used when no request is being traced, records nothing"""
+
+    @contextmanager
+    def stage(self, name: str):
+        yield
+
+    def record_cache(self, cache: str, hit: bool):
+        pass
+
+    def record_llm_usage(self, response):
+        pass
+
+    def record_degraded(self):
+        pass
+
+    def finish(self):
+        pass
+
+
+class _JobTrace(RequestTrace):
+    """One of several jobs of a request: records into the request's trace, with its own degraded flag"""
+
+    def __init__(self, parent: RequestTrace):
+        super().__init__()
+        self.parent = parent
+
+    def stage(self, name: str):
+        return self.parent.stage(name)
+
+    def record_cache(self, cache: str, hit: bool):
+        self.parent.record_cache(cache, hit)
+
+    def record_llm_usage(self, response):
+        self.parent.record_llm_usage(response)
+
+    def record_degraded(self):
+        self.degraded = True
+        self.parent.record_degraded()
+
+    def finish(self):
+        pass
+
+
+_NULL_TRACE = _NullTrace()
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("chatbot_trace", default=None)
+
+
+def current_trace() -> RequestTrace:
+    return _current_trace.get() or _NULL_TRACE
+
+
+@contextmanager
+def request_trace():
+    """Trace a request; nested calls reuse the outermost trace"""
+    trace = _current_trace.get()
+    if trace is not None:
+        yield trace
+        return
+    trace = RequestTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # A streaming generator closed from another context (client disconnect)
+            pass
+        trace.finish()
+
+
+@contextmanager
+def job_trace():
+    """Trace one job of the current request, e.g. one query of a batch"""
+    trace = _JobTrace(current_trace())
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def stage(name: str):
+    """Time a stage of the current request"""
+    return current_trace().stage(name)
+
+
+def stats_collector(metric_name: str, help_text: str, get_stats: Callable[[], Dict[str, Dict]]):
+    """Expose nested ``{group: {field: number}}`` stats as a labelled gauge"""
+
+    def collect() -> List[str]:
+        lines = [f"# HELP {metric_name} {help_text}", f"# TYPE {metric_name} gauge"]
+        for group, stats in get_stats().items():
+            for field, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f'{metric_name}{{name="{group}",field="{field}"}} {value}')
+        return lines
+
+    return collect
@@ -0,0 +1,136 @@
+"""Memory-mapped serving format for the FAQ vectorstore.
+
+Next to ``index.faiss`` the builder writes:
+    docs.bin      UTF-8 JSON records (id, page_content, metadata), concatenated
+    docs.idx      uint64 offsets into docs.bin, one per FAISS row plus the end
+    serving.json  row count and index.faiss digest, to detect a stale export
+
+The FAISS index (the compact one from service.faiss_index when built) is
+opened with mmap flags and both doc files are mapped read-only, so uvicorn
+workers share the page cache instead of each unpickling its own docstore.
+"""
+import argparse
+import json
+import logging
+import mmap
+import os
+from typing import List, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from service.faiss_index import index_digest, load_index, load_index_meta
+from service.log_config import get_logger, log_event
+
+DOCS_NAME = "docs.bin"
+OFFSETS_NAME = "docs.idx"
+SERVING_META_NAME = "serving.json"
+FORMAT_VERSION = 2
+
+
+def export_serving_store(db, path: str):
+    """Write the offset-indexed doc files for a LangChain FAISS store saved in ``path``"""
+    offsets = [0]
+    with open(os.path.join(path, DOCS_NAME + ".tmp"), "wb") as f:
+        for row in range(db.index.ntotal):
+            doc_id = db.index_to_docstore_id[row]
+            doc = db.docstore.search(doc_id)
+            record = json.dumps(
+                {"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata},
+                ensure_ascii=False,
+            ).encode("utf-8")
+            f.write(record)
+            offsets.append(offsets[-1] + len(record))
+    np.asarray(offsets, dtype=np.uint64).tofile(os.path.join(path, OFFSETS_NAME + ".tmp"))
+    os.replace(os.path.join(path, DOCS_NAME + ".tmp"), os.path.join(path, DOCS_NAME))
+    os.replace(os.path.join(path, OFFSETS_NAME + ".tmp"), os.path.join(path, OFFSETS_NAME))
+    meta = {
+        "version": FORMAT_VERSION,
+        "ntotal": int(db.index.ntotal),
+        "index_sha256": index_digest(path),
+    }
+    with open(os.path.join(path, SERVING_META_NAME), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def has_serving_store(path: str) -> bool:
+    """True when the serving files exist and match the current index.faiss"""
+    try:
+        with open(os.path.join(path, SERVING_META_NAME), encoding="utf-8") as f:
+            meta = json.load(f)
+        return (
+            meta.get("version") == FORMAT_VERSION
+            and meta["index_sha256"] == index_digest(path)
+            and os.path.exists(os.path.join(path, DOCS_NAME))
+            and os.path.exists(os.path.join(path, OFFSETS_NAME))
+        )
+    except (FileNotFoundError, KeyError, ValueError):
+        return False
+
+
+class MmapVectorStore:
+    """Read-only vectorstore over the serving format (subset of the LangChain FAISS API)"""
+
+    _normalize_L2 = False
+
+    def __init__(self, path: str, embeddings):
+        self.path = path
+        self.embeddings = embeddings
+        self.index = load_index(path)
+        self.offsets = np.memmap(os.path.join(path, OFFSETS_NAME), dtype=np.uint64, mode="r")
+        with open(os.path.join(path, DOCS_NAME), "rb") as f:
+            self._docs = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(f.name) else b""
+        if len(self.offsets) != self.index.ntotal + 1:
+            raise ValueError(f"Serving store in {path} does not match its index")
+
+    def document(self, row: int) -> Document:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        record = json.loads(self._docs[start:end].decode("utf-8"))
+        return Document(page_content=record["page_content"], metadata=record["metadata"], id=record["id"])
+
+    def search_many(self, embeddings: List[List[float]], k: int = 4) -> List[List[Document]]:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        _, indices = self.index.search(vectors, k)
+        return [[self.document(int(row)) for row in rows if row != -1] for rows in indices]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        scores, indices = self.index.search(np.asarray([embedding], dtype=np.float32), k)
+        return [(self.document(int(row)), float(score)) for score, row in zip(scores[0], indices[0]) if row != -1]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k)
+
+
+def load_vectorstore(path: str, embeddings):
+    """Prefer the mmap serving format, fall back to the pickled LangChain store"""
+    if has_serving_store(path):
+        return MmapVectorStore(path, embeddings)
+    from langchain_community.vectorstores import FAISS
+
+    log_event(get_logger("vectorstore"), logging.WARNING, "no serving export, loading the pickled docstore", path=path)
+    db = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+    meta = load_index_meta(path)
+    if meta is not None and meta["type"] != "flat":
+        db.index = load_index(path)
+    return db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export an existing LangChain FAISS store to the serving format")
+    parser.add_argument("path", nargs="?", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "vectorstores", "db_faiss"))
+    args = parser.parse_args()
+
+    from langchain_community.vectorstores import FAISS
+    from service.retrieval import export_lexical_index
+
+    db = FAISS.load_local(args.path, None, allow_dangerous_deserialization=True)
+    export_serving_store(db, args.path)
+    export_lexical_index(db, args.path)
+    print(f"Exported {db.index.ntotal} documents to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
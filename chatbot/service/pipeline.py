@@ -0,0 +1,103 @@
+"""Staged pre-answer checks with early exits.
+
+Each stage declares its expected cost; by default stages run cheapest first
+so a query that will be rejected anyway does not pay for the expensive
+checks. A stage that reads what another one found (``after``) runs after
+it whatever the costs. CHAT_PIPELINE_ORDER overrides the order (and can
+leave stages out).
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from chat_response import ChatResponse
+from service.metrics import REGISTRY, stage
+
+# Comma-separated stage names, e.g. "length,content_filter,language,classify"
+PIPELINE_ORDER = [name.strip() for name in os.getenv("CHAT_PIPELINE_ORDER", "").split(",") if name.strip()]
+
+PIPELINE_STAGES_TOTAL = REGISTRY.counter("chatbot_pipeline_stage_total", "Pipeline stage outcomes: passed, rejected or skipped")
+
+
+@dataclass
+class QueryContext:
+    """What the stages learned about a query so far"""
+    query: str
+    intent: Optional[str] = None
+    lang: Optional[str] = None
+    detected_words: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Stage:
+    name: str
+    # Expected microseconds per query, used for the default order
+    cost: float
+    # Returns a rejection to stop the pipeline, None to continue
+    run: Callable[[QueryContext], Optional[ChatResponse]]
+    # Optional predicate, the stage is skipped when it returns True
+    skip: Optional[Callable[[QueryContext], bool]] = None
+    # Stages whose results this one reads, run before it in the default order
+    after: Tuple[str, ...] = ()
+
+
+class Pipeline:
+    """Runs stages in order until one returns a response"""
+
+    def __init__(self, stages: List[Stage], order: Optional[List[str]] = None):
+        by_name = {s.name: s for s in stages}
+        if order:
+            unknown = [name for name in order if name not in by_name]
+            if unknown:
+                raise ValueError(f"Unknown pipeline stages: {', '.join(unknown)} (known: {', '.join(by_name)})")
+            self.stages = [by_name[name] for name in order]
+        else:
+            self.stages = self._default_order(stages)
+
+    @staticmethod
+    def _default_order(stages: List[Stage]) -> List[Stage]:
+        """Cheapest first, each stage after the ones it depends on"""
+        names = {s.name for s in stages}
+        pending = sorted(stages, key=lambda s: s.cost)
+        ordered: List[Stage] = []
+        placed = set()
+        while pending:
+            ready = next((s for s in pending if names.intersection(s.after) <= placed), None)
+            if ready is None:
+                raise ValueError(f"Pipeline stage dependencies form a cycle: {', '.join(s.name for s in pending)}")
+            pending.remove(ready)
+            ordered.append(ready)
+            placed.add(ready.name)
+        return ordered
+
+    def describe(self) -> str:
+        return " → ".join(f"{s.name}({s.cost:g}us)" for s in self.stages)
+
+    def run(self, context: QueryContext) -> Optional[ChatResponse]:
+        for index, pipeline_stage in enumerate(self.stages):
+            if pipeline_stage.skip is not None and pipeline_stage.skip(context):
+                PIPELINE_STAGES_TOTAL.inc(stage=pipeline_stage.name, outcome='skipped')
+                continue
+            with stage(pipeline_stage.name):
+                response = pipeline_stage.run(context)
+            if response is not None:
+                PIPELINE_STAGES_TOTAL.inc(stage=pipeline_stage.name, outcome='rejected')
+                response.rejected_by = pipeline_stage.name
+                # The remaining stages never ran
+                for later in self.stages[index + 1:]:
+                    PIPELINE_STAGES_TOTAL.inc(stage=later.name, outcome='skipped')
+                return response
+            PIPELINE_STAGES_TOTAL.inc(stage=pipeline_stage.name, outcome='passed')
+        return None
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Outcome counts per stage, in pipeline order"""
+        return {
+            s.name: {
+                'order': i,
+                'cost_us': s.cost,
+                **{outcome: PIPELINE_STAGES_TOTAL.value(stage=s.name, outcome=outcome)
+                   for outcome in ('passed', 'rejected', 'skipped')},
+            }
+            for i, s in enumerate(self.stages)
+        }
@@ -0,0 +1,146 @@
+import re
+
+HERE_IS_PREFIX = re.compile(r'^Here is .*?:\s*', re.IGNORECASE)
+QUESTION_LINE = re.compile(r'(Câu hỏi|Question).*?\n', re.IGNORECASE)
+ANSWER_PREFIX = re.compile(r'^(Trả lời|Answer):\s*', re.IGNORECASE)
+
+
+def clean_answer(content: str) -> str:
+    """Strip introductory phrases the LLM adds despite the instructions"""
+    content = HERE_IS_PREFIX.sub('', content)
+    content = QUESTION_LINE.sub('', content)
+    content = ANSWER_PREFIX.sub('', content)
+    return content.strip()
+
+
+class _HereIsFilter:
+    """Incremental ``^Here is .*?:\\s*`` removal"""
+
+    def __init__(self):
+        self.buffer = ""
+        self.decided = False
+        self.skip_space = False
+
+    def feed(self, text: str, final: bool = False) -> str:
+        if self.skip_space:
+            text = text.lstrip()
+            self.skip_space = not text
+            return text
+        if self.decided:
+            return text
+        self.buffer += text
+        head = self.buffer.lower()
+        if len(head) < len("here is ") and "here is ".startswith(head) and not final:
+            return ""
+        if head.startswith("here is "):
+            colon = head.find(":")
+            newline = head.find("\n")
+            if colon != -1 and (newline == -1 or colon < newline):
+                self.decided = True
+                self.skip_space = True
+                rest, self.buffer = self.buffer[colon + 1:], ""
+                return self.feed(rest, final)
+            if newline == -1 and not final:
+                return ""
+        self.decided = True
+        rest, self.buffer = self.buffer, ""
+        return rest
+
+class _QuestionLineFilter:
+    """Incremental ``(Câu hỏi|Question).*?\\n`` removal, anywhere in the text"""
+
+    KEYWORD = re.compile(r'câu hỏi|question', re.IGNORECASE)
+    HOLD_BACK = len("question") - 1
+
+    def __init__(self):
+        self.buffer = ""
+        self.suppressing = False
+
+    def feed(self, text: str, final: bool = False) -> str:
+        self.buffer += text
+        output = []
+        while True:
+            if self.suppressing:
+                newline = self.buffer.find("\n")
+                if newline == -1:
+                    if final:
+                        # No line end: the regex would not have matched, keep the text
+                        output.append(self.buffer)
+                        self.buffer = ""
+                    break
+                self.buffer = self.buffer[newline + 1:]
+                self.suppressing = False
+                continue
+            match = self.KEYWORD.search(self.buffer)
+            if match:
+                output.append(self.buffer[:match.start()])
+                self.buffer = self.buffer[match.start():]
+                self.suppressing = True
+                continue
+            keep = 0 if final else min(self.HOLD_BACK, len(self.buffer))
+            output.append(self.buffer[:len(self.buffer) - keep])
+            self.buffer = self.buffer[len(self.buffer) - keep:]
+            break
+        return "".join(output)
+
+
+class _AnswerPrefixFilter:
+    """Incremental ``^(Trả lời|Answer):\\s*`` removal"""
+
+    PREFIXES = ("trả lời:", "answer:")
+
+    def __init__(self):
+        self.buffer = ""
+        self.decided = False
+
+    def feed(self, text: str, final: bool = False) -> str:
+        if self.decided:
+            return text
+        self.buffer += text
+        head = self.buffer.lower()
+        for prefix in self.PREFIXES:
+            if head.startswith(prefix):
+                self.decided = True
+                return self.buffer[len(prefix):]
+        if not final and any(prefix.startswith(head) for prefix in self.PREFIXES):
+            return ""
+        self.decided = True
+        rest, self.buffer = self.buffer, ""
+        return rest
+
+
+class _StripFilter:
+    """Incremental ``str.strip``: leading whitespace is dropped, trailing held back"""
+
+    def __init__(self):
+        self.started = False
+        self.pending_space = ""
+
+    def feed(self, text: str, final: bool = False) -> str:
+        if not self.started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self.started = True
+        text = self.pending_space + text
+        stripped = text.rstrip()
+        self.pending_space = "" if final else text[len(stripped):]
+        return stripped
+
+
+class StreamingAnswerCleaner:
+    """Applies clean_answer to a token stream, emitting text as soon as it is safe"""
+
+    def __init__(self):
+        self.filters = [_HereIsFilter(), _QuestionLineFilter(), _AnswerPrefixFilter(), _StripFilter()]
+
+    def _run(self, text: str, final: bool) -> str:
+        for text_filter in self.filters:
+            text = text_filter.feed(text, final)
+        return text
+
+    def feed(self, chunk: str) -> str:
+        return self._run(chunk, final=False)
+
+    def flush(self) -> str:
+        return self._run("", final=True)
@@ -0,0 +1,285 @@
+"""Local price quotes for the cleaning, cooking and AC repair services.
+
+Prices come from a JSON table (data/price_table.json, or PRICE_TABLE_PATH)
+instead of code branches. Quantities are read from free Vietnamese or
+English text: "50m2", "năm mươi mét vuông", "2 ngựa", "hai tiếng rưỡi",
+"two and a half hours". A quote is only returned when the query is about
+price; mixed questions (price and cancellation, payment, price changes, ...)
+and quantities of zero return nothing and go to RAG as before.
+"""
+import json
+import os
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRICE_TABLE_PATH = os.getenv("PRICE_TABLE_PATH", os.path.join(BASE_DIR, "data", "price_table.json"))
+
+# Number words. The ones only valid after "mươi"/"mười" ("hai mươi lăm",
+# "ba mươi mốt") are kept apart so "tư vấn" is not read as "4 vấn".
+VI_UNITS = {"một": 1, "hai": 2, "ba": 3, "bốn": 4, "năm": 5, "sáu": 6, "bảy": 7, "bẩy": 7, "tám": 8, "chín": 9}
+VI_TRAILING_UNITS = {"mốt": 1, "tư": 4, "lăm": 5, "nhăm": 5}
+EN_UNITS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+    "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15,
+    "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+EN_TENS = {"twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90}
+NUMBER_WORDS = (list(VI_UNITS) + list(VI_TRAILING_UNITS) + list(EN_UNITS) + list(EN_TENS)
+                + ["mười", "mươi", "trăm", "linh", "lẻ", "hundred", "half", "nửa"])
+_NUMBER_WORD = "|".join(sorted(map(re.escape, NUMBER_WORDS), key=len, reverse=True))
+_NUMBER_RUN_RE = re.compile(rf"\b(?:{_NUMBER_WORD})\b(?:[\s-]+(?:(?:{_NUMBER_WORD}|and|a)\b))*")
+# "năm" is also "year": alone it is only a number when a unit follows ("năm người", not "năm nay")
+_UNIT_AFTER_RE = re.compile(
+    r"\s*(?:m²|m2|m\^2|mét|met|m vuông|người|nguoi|khách|suất|món|mon|giờ|tiếng|gio|tieng|h|hp|ngựa|ngua|mã lực|ma luc)(?!\w)"
+)
+_DECIMAL_RE = re.compile(r"(\d+)[.,](\d{1,2})(?!\d)")
+_THOUSANDS_RE = re.compile(r"(\d+)[.,](\d{3})(?!\d)")
+
+_NUM = r"(\d+(?:\.\d+)?)"
+AREA_RE = re.compile(_NUM + r"\s*(?:m²|m2|m\^2|mét vuông|met vuong|m vuông|sqm|square met(?:er|re)s?)(?!\w)")
+PEOPLE_RE = re.compile(_NUM + r"\s*(?:người|nguoi|khách|suất|people|persons?|guests?)(?!\w)")
+DISHES_RE = re.compile(_NUM + r"\s*(?:món|mon|dishes|dish|courses?)(?!\w)")
+HOURS_RE = re.compile(r"(?:\b(lúc|vào|at|từ|đến)\s+)?" + _NUM + r"\s*(?:giờ|tiếng|gio|tieng|hours?|hrs?|h)(?!\w)(\s*rưỡi)?")
+HP_RE = re.compile(_NUM + r"\s*(?:hp|ngựa|ngua|mã lực|ma luc|horsepower|horse power)(?!\w)")
+CAPACITY_RE = re.compile(r"(?:công suất|capacity)\s*" + _NUM)
+AC_TYPES = [
+    ("ceiling-mounted", re.compile(r"\b(ceiling-mounted|ceiling mounted|ceiling|âm trần|áp trần)\b")),
+    ("portable", re.compile(r"\b(portable|di động)\b")),
+    ("split", re.compile(r"\b(split|treo tường|wall-mounted|wall mounted)\b")),
+]
+
+CLEANING_RE = re.compile(r"\b(clean|cleaning|dọn dẹp|dọn nhà|vệ sinh|don dep|don nha)\b")
+COOKING_RE = re.compile(r"\b(cook|cooking|chef|nấu ăn|nấu|đầu bếp|nau an)\b")
+AC_RE = re.compile(r"\b(ac|air conditioner|điều hòa|điều hoà|máy lạnh|dieu hoa|may lanh)\b")
+PRICE_RE = re.compile(r"\b(giá|bao nhiêu|bao nhieu|chi phí|báo giá|tính tiền|hết bao|tốn|price|prices|cost|costs|how much|fee|fees)\b")
+# Questions about something besides the price are left to RAG
+OTHER_TOPIC_RE = re.compile(
+    r"\b(hủy|huỷ|hoàn tiền|hoàn|cancel|refund|chính sách|policy|thanh toán|payment|vnpay|momo|"
+    r"bảo hành|warranty|khiếu nại|complain|tài khoản|account|mật khẩu|password|đánh giá|review|"
+    r"tăng|giảm|increase|decrease|discount|năm (?:nay|ngoái|trước|sau|tới|\d{4})|(?:this|last|next) year)\b"
+)
+
+
+def _parse_number_run(words: List[str]) -> Optional[float]:
+    """Value of a run of Vietnamese or English number words"""
+    total, current, tens = 0.0, 0.0, False
+    for word in words:
+        if word in VI_UNITS or word in EN_UNITS:
+            current += VI_UNITS.get(word) or EN_UNITS[word]
+        elif word in VI_TRAILING_UNITS:
+            if not tens:
+                return None
+            current += VI_TRAILING_UNITS[word]
+        elif word in EN_TENS:
+            current += EN_TENS[word]
+        elif word == "mười":
+            current += 10
+            tens = True
+            continue
+        elif word == "mươi":
+            current = (current or 1) * 10
+            tens = True
+            continue
+        elif word in ("trăm", "hundred"):
+            total += (current or 1) * 100
+            current = 0
+        elif word in ("half", "nửa"):
+            current += 0.5
+        elif word not in ("linh", "lẻ", "and", "a"):
+            return None
+        tens = False
+    value = total + current
+    return value or None
+
+
+def _replace_number_words(text: str) -> str:
+    def replace(match):
+        words = re.split(r"[\s-]+", match.group(0).strip())
+        if words == ["năm"] and not _UNIT_AFTER_RE.match(text, match.end()):
+            return match.group(0)
+        value = _parse_number_run(words)
+        if value is None:
+            return match.group(0)
+        return f"{value:g}"
+
+    return _NUMBER_RUN_RE.sub(replace, text)
+
+
+def prepare_text(query: str) -> str:
+    """Lowercase NFC text with number words and decimal commas turned into plain numbers"""
+    text = unicodedata.normalize("NFC", query).lower()
+    text = _replace_number_words(text)
+    text = _THOUSANDS_RE.sub(r"\1\2", text)
+    return _DECIMAL_RE.sub(r"\1.\2", text)
+
+
+@dataclass
+class PriceSlots:
+    area: Optional[float] = None
+    people: Optional[int] = None
+    dishes: Optional[int] = None
+    hours: Optional[float] = None
+    ac_type: Optional[str] = None
+    hp: Optional[float] = None
+
+
+def extract_slots(text: str) -> PriceSlots:
+    """Read the pricing quantities from text prepared by prepare_text"""
+    slots = PriceSlots()
+    match = AREA_RE.search(text)
+    if match:
+        slots.area = float(match.group(1))
+    match = PEOPLE_RE.search(text)
+    if match:
+        slots.people = int(float(match.group(1)))
+    match = DISHES_RE.search(text)
+    if match:
+        slots.dishes = int(float(match.group(1)))
+    for match in HOURS_RE.finditer(text):
+        # "lúc 9 giờ" is a time of day, not a duration
+        if match.group(1):
+            continue
+        slots.hours = float(match.group(2)) + (0.5 if match.group(3) else 0)
+        break
+    match = HP_RE.search(text) or CAPACITY_RE.search(text)
+    if match:
+        slots.hp = float(match.group(1))
+    for ac_type, pattern in AC_TYPES:
+        if pattern.search(text):
+            slots.ac_type = ac_type
+            break
+    return slots
+
+
+def load_price_table(path: str = PRICE_TABLE_PATH) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _pick(tiers: List[Dict], key: str, value: float) -> Dict:
+    """First tier whose upper bound ``key`` covers value (null = no bound)"""
+    for tier in tiers:
+        if tier[key] is None or value <= tier[key]:
+            return tier
+    return tiers[-1]
+
+
+class PricingEngine:
+    """Quotes prices from the price table for the services a query asks about"""
+
+    def __init__(self, table: Dict):
+        self.table = table
+        self.currency = table.get("currency", "VNĐ")
+        self.hotline = table.get("hotline", "0347596789")
+
+    @classmethod
+    def from_file(cls, path: str = PRICE_TABLE_PATH) -> "PricingEngine":
+        return cls(load_price_table(path))
+
+    def money(self, amount: float) -> str:
+        return f"{int(round(amount)):,} {self.currency}"
+
+    # Exact quotes
+    def cleaning_cost(self, area: float) -> str:
+        tiers = self.table["cleaning"]["tiers"]
+        tier = _pick(tiers, "max_area", area)
+        if "flat" in tier:
+            note = f"{tier['note']} " if tier.get("note") else ""
+            return f"Dọn dẹp nhà {area:g} m²: {self.money(tier['flat'])} ({note}cho ≤ {tier['max_area']} m²)"
+        return (f"Dọn dẹp nhà {area:g} m²: {area:g} m² × {self.money(tier['per_m2'])} = "
+                f"{self.money(area * tier['per_m2'])} ({self._area_range(tiers, tier)})")
+
+    def cooking_cost(self, people: int, dishes: int, hours: float) -> str:
+        cooking = self.table["cooking"]
+        if people > cooking["max_people"]:
+            return (f"Dịch vụ nấu ăn chỉ hỗ trợ tối đa {cooking['max_people']} người. "
+                    f"Vui lòng liên hệ hotline {self.hotline} để được tư vấn.")
+        group = _pick(cooking["groups"], "max_people", people)
+        base = _pick(group["base"], "max_hours", hours)["price"]
+        additional = _pick(group["dishes"], "max_dishes", dishes)["price"]
+        return (f"Nấu ăn: {self.money(base)} (gói {hours:g} giờ cho {people} người) + "
+                f"{self.money(additional)} phụ thu ({dishes} món) = {self.money(base + additional)}")
+
+    def ac_repair_cost(self, ac_type: str, hp: Optional[float]) -> str:
+        ac = self.table["ac_repair"]
+        base = ac["types"][ac_type]
+        if hp is None:
+            return (f"Sửa điều hòa {ac_type}: {self.money(base)} "
+                    f"(phụ thu {self.money(ac['surcharge'])} nếu công suất > {ac['surcharge_above_hp']:g} HP)")
+        additional = ac["surcharge"] if hp > ac["surcharge_above_hp"] else 0
+        return (f"Sửa điều hòa {ac_type} {hp:g} HP: {self.money(base)} + {self.money(additional)} phụ thu "
+                f"(> {ac['surcharge_above_hp']:g} HP) = {self.money(base + additional)}")
+
+    # Price lists, when the service is asked about without quantities
+    def _area_range(self, tiers: List[Dict], tier: Dict) -> str:
+        index = tiers.index(tier)
+        lower = tiers[index - 1]["max_area"] if index else None
+        if tier["max_area"] is None:
+            return f"trên {lower} m²"
+        if lower is None:
+            return f"≤ {tier['max_area']} m²"
+        return f"trên {lower} m² đến {tier['max_area']} m²"
+
+    def cleaning_prices(self) -> str:
+        tiers = self.table["cleaning"]["tiers"]
+        lines = [f"- {self._area_range(tiers, tier)}: " + (
+            f"{self.money(tier['flat'])}" + (f" ({tier['note']})" if tier.get("note") else "")
+            if "flat" in tier else f"{self.money(tier['per_m2'])}/m²") for tier in tiers]
+        return "Giá dọn dẹp nhà theo diện tích:\n" + "\n".join(lines)
+
+    def cooking_prices(self) -> str:
+        cooking = self.table["cooking"]
+        lines, lower = [], 1
+        for group in cooking["groups"]:
+            base = ", ".join(
+                f"{self.money(b['price'])} ({'≤ ' + format(b['max_hours'], 'g') + ' giờ' if b['max_hours'] is not None else 'dài hơn'})"
+                for b in group["base"])
+            dishes = ", ".join(
+                f"{self.money(d['price'])} ({'≤ ' + str(d['max_dishes']) + ' món' if d['max_dishes'] is not None else 'nhiều hơn'})"
+                for d in group["dishes"])
+            lines.append(f"- {lower}–{group['max_people']} người: {base}; phụ thu món: {dishes}")
+            lower = group["max_people"] + 1
+        return f"Giá nấu ăn (tối đa {cooking['max_people']} người):\n" + "\n".join(lines)
+
+    def ac_repair_prices(self, hp: Optional[float] = None) -> str:
+        if hp is not None:
+            return "\n".join(self.ac_repair_cost(ac_type, hp) for ac_type in self.table["ac_repair"]["types"])
+        ac = self.table["ac_repair"]
+        lines = [f"- {ac_type}: {self.money(price)}" for ac_type, price in ac["types"].items()]
+        return ("Giá sửa điều hòa theo loại máy:\n" + "\n".join(lines)
+                + f"\nPhụ thu {self.money(ac['surcharge'])} cho máy trên {ac['surcharge_above_hp']:g} HP.")
+
+    def quote(self, query: str) -> List[str]:
+        """Answer lines for every service the query asks a price for, [] to fall back to RAG"""
+        text = prepare_text(query)
+        if OTHER_TOPIC_RE.search(text):
+            return []
+        slots = extract_slots(text)
+        if any(value is not None and value <= 0
+               for value in (slots.area, slots.people, slots.dishes, slots.hours, slots.hp)):
+            # "0 m²", "0 người": nothing to quote
+            return []
+        asks_price = PRICE_RE.search(text) is not None
+        parts = []
+
+        if CLEANING_RE.search(text):
+            if slots.area is not None:
+                parts.append(self.cleaning_cost(slots.area))
+            elif asks_price:
+                parts.append(self.cleaning_prices())
+
+        if COOKING_RE.search(text) or slots.dishes is not None:
+            if None not in (slots.people, slots.dishes, slots.hours):
+                parts.append(self.cooking_cost(slots.people, slots.dishes, slots.hours))
+            elif asks_price:
+                parts.append(self.cooking_prices())
+
+        if AC_RE.search(text) or slots.ac_type is not None or (slots.hp is not None and not parts):
+            if slots.ac_type is not None:
+                parts.append(self.ac_repair_cost(slots.ac_type, slots.hp))
+            elif slots.hp is not None or asks_price:
+                parts.append(self.ac_repair_prices(slots.hp))
+        return parts
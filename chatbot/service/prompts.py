@@ -0,0 +1,62 @@
+"""Prompt templates, compiled once on first use.
+
+The texts are kept exactly as before; only the ChatPromptTemplate parsing
+moved out of the per-request path.
+"""
+import functools
+
+INTENT_PROMPT = """You are a STRICT intent classifier for a house cleaning service app.
+
+        CLASSIFICATION RULES:
+        1. If query mentions: price, cost, fee, charge, rate + cleaning/house/service → ALWAYS "app_related"
+        2. If query mentions: booking, schedule, appointment + cleaning/house/service → ALWAYS "app_related"  
+        3. If query mentions: cancel, policy, refund + cleaning/house/service → ALWAYS "app_related"
+        4. If query mentions: app, login, account, weekend service → ALWAYS "app_related"
+        5. If query about: cooking, recipes, weather, news, travel → ALWAYS "general"
+
+        EXAMPLES:
+        - "How much does clean house service cost?" → app_related
+        - "What's the price of cleaning service?" → app_related
+        - "How to cook pho?" → general
+        - "Weather today?" → general
+
+        Query: {query}
+
+        RESPOND WITH ONLY: {{"intent": "app_related"}} OR {{"intent": "general"}} OR {{"intent": "inappropriate_content"}} NO OTHER TEXT."""
+
+RAG_PROMPT = """
+            SUPPORTING DATA:
+            {context}
+
+            USER QUESTION: {query}
+
+            STRICT INSTRUCTIONS:
+            - Answer directly to the content, NEVER start with "Here's the answer" or "Answer:" or any introductory phrase.
+            - DO NOT repeat the question in the answer.
+            - DO NOT include any formatting like "Question:" or "Answer:" in the response.
+            - Rely ONLY on the data in the "SUPPORTING DATA" section above.
+            - Answer accurately, CONCISELY, and CLEARLY.
+            - If pricing calculations are needed, perform the calculations clearly.
+            - If no relevant information is found in the data, answer: "Please contact hotline 0347596789 for support."
+            - If the question is in Vietnamese → answer in Vietnamese. If in English → answer in English.
+            
+            REPLY FORMAT: Just provide the direct answer without any preamble or question repetition.
+            """
+
+GENERAL_PROMPT = """Answer the following question helpfully: {query}
+        STRICT INSTRUCTIONS:
+        1. Answer directly to the content, briefly and clearly.
+        2. If the question is in Vietnamese → answer in Vietnamese. If in English → answer in English."""
+
+TEMPLATES = {
+    "intent": INTENT_PROMPT,
+    "rag": RAG_PROMPT,
+    "general": GENERAL_PROMPT,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def prompt_template(name: str):
+    """The compiled ChatPromptTemplate for one of TEMPLATES"""
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_template(TEMPLATES[name])
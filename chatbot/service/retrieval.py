@@ -0,0 +1,235 @@
+"""Hybrid retrieval over the FAQ chunks: FAISS similarity fused with BM25.
+
+Short keyword queries ("vnpay", "hủy lịch") embed poorly, while BM25 finds
+them by their rare terms. The BM25 index covers the same chunks as FAISS,
+keyed by FAISS row, and is written next to ``index.faiss`` at index time
+(``bm25.json``). A missing or stale file is rebuilt from the docstore when
+the store is loaded.
+
+Both score lists are normalized to [0, 1] over the candidates and combined
+as ``alpha * dense + (1 - alpha) * bm25``; ``HYBRID_ALPHA=1`` is dense only.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from service.language_id import strip_accents
+from service.log_config import get_logger, log_event
+
+LEXICAL_INDEX_NAME = "bm25.json"
+LEXICAL_FORMAT_VERSION = 2
+
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", 3))
+HYBRID_ALPHA = float(os.getenv("HYBRID_ALPHA", 0.5))
+# Rows taken from each of FAISS and BM25 before fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 20))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", 6 * 3600))
+
+logger = get_logger("retrieval")
+
+_TERM_RE = re.compile(r"[a-z0-9]+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Accent-folded syllables plus adjacent pairs ("huy", "lich", "huy_lich").
+
+    Folding lets unaccented queries match, the pairs keep two-syllable words
+    like "hủy lịch" apart from their parts.
+    """
+    syllables = _TERM_RE.findall(strip_accents(unicodedata.normalize("NFC", text).lower()))
+    return syllables + [f"{a}_{b}" for a, b in zip(syllables, syllables[1:])]
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of documents (rows)"""
+
+    def __init__(self, postings: Dict[str, Dict[int, int]], doc_lengths: List[int], k1: float = 1.5, b: float = 0.75):
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+        n = len(doc_lengths)
+        self.idf = {term: math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5)) for term, rows in postings.items()}
+
+    @classmethod
+    def build(cls, texts: Sequence[str], **kwargs) -> "BM25Index":
+        postings: Dict[str, Dict[int, int]] = {}
+        doc_lengths = []
+        for row, text in enumerate(texts):
+            terms = tokenize(text)
+            doc_lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                postings.setdefault(term, {})[row] = tf
+        return cls(postings, doc_lengths, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def scores(self, query: str) -> Dict[int, float]:
+        """BM25 score of every row sharing a term with the query"""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            rows = self.postings.get(term)
+            if not rows:
+                continue
+            idf = self.idf[term]
+            for row, tf in rows.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[row] / self.avg_length)
+                scores[row] = scores.get(row, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        return sorted(self.scores(query).items(), key=lambda item: -item[1])[:k]
+
+    def to_dict(self) -> Dict:
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "doc_lengths": self.doc_lengths,
+            "postings": {term: [[row, tf] for row, tf in rows.items()] for term, rows in self.postings.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BM25Index":
+        postings = {term: {row: tf for row, tf in rows} for term, rows in data["postings"].items()}
+        return cls(postings, data["doc_lengths"], k1=data["k1"], b=data["b"])
+
+
+def document_at(vector_store, row: int):
+    """Document stored at a FAISS row, for the mmap store and the LangChain FAISS store"""
+    if hasattr(vector_store, 'document'):
+        return vector_store.document(row)
+    doc = vector_store.docstore.search(vector_store.index_to_docstore_id[row])
+    return None if isinstance(doc, str) else doc
+
+
+def _index_digest(path: str) -> str:
+    from service.faiss_index import index_digest
+    return index_digest(path)
+
+
+def export_lexical_index(vector_store, path: str) -> BM25Index:
+    """Build the BM25 index for the rows of a saved store and write it next to index.faiss"""
+    texts = []
+    for row in range(vector_store.index.ntotal):
+        doc = document_at(vector_store, row)
+        texts.append(doc.page_content if doc is not None else "")
+    index = BM25Index.build(texts)
+    data = {
+        "version": LEXICAL_FORMAT_VERSION,
+        "ntotal": len(texts),
+        "index_sha256": _index_digest(path),
+        **index.to_dict(),
+    }
+    target = os.path.join(path, LEXICAL_INDEX_NAME)
+    with open(target + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(target + ".tmp", target)
+    return index
+
+
+def load_lexical_index(vector_store, path: str) -> BM25Index:
+    """bm25.json when it matches the current index.faiss, otherwise rebuilt from the docstore"""
+    try:
+        with open(os.path.join(path, LEXICAL_INDEX_NAME), encoding="utf-8") as f:
+            data = json.load(f)
+        if (data.get("version") == LEXICAL_FORMAT_VERSION
+                and data["ntotal"] == vector_store.index.ntotal
+                and data["index_sha256"] == _index_digest(path)):
+            return BM25Index.from_dict(data)
+    except (FileNotFoundError, KeyError, ValueError):
+        pass
+    log_event(logger, logging.WARNING, f"no current {LEXICAL_INDEX_NAME}, building the BM25 index", path=path)
+    try:
+        return export_lexical_index(vector_store, path)
+    except OSError:
+        # Read-only deployments still get an in-memory index
+        texts = [getattr(document_at(vector_store, row), 'page_content', "") for row in range(vector_store.index.ntotal)]
+        return BM25Index.build(texts)
+
+
+def _normalized(scores: Dict[int, float]) -> Dict[int, float]:
+    if not scores:
+        return {}
+    low, high = min(scores.values()), max(scores.values())
+    if high <= low:
+        return {row: 1.0 for row in scores}
+    return {row: (score - low) / (high - low) for row, score in scores.items()}
+
+
+class HybridRetriever:
+    """Top-k chunks by fused dense and BM25 scores, with a per-query cache of the result rows"""
+
+    def __init__(self, vector_store, lexical_index: BM25Index, alpha: float = HYBRID_ALPHA,
+                 candidates: int = HYBRID_CANDIDATES, cache=None):
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.alpha = alpha
+        self.candidates = candidates
+        # Any CacheBackend; values are JSON lists of rows, so keep it local to the loaded index
+        self.cache = cache
+
+    @classmethod
+    def load(cls, vector_store, path: str, cache=None) -> "HybridRetriever":
+        return cls(vector_store, load_lexical_index(vector_store, path), cache=cache)
+
+    @staticmethod
+    def cache_key(query: str, k: int) -> str:
+        normalized = _SPACE_RE.sub(" ", unicodedata.normalize("NFC", query).lower()).strip()
+        return hashlib.md5(f"{k}\0{normalized}".encode()).hexdigest()
+
+    def dense_scores(self, embeddings: List[List[float]]) -> List[Dict[int, float]]:
+        """Cosine similarity of the FAISS candidates for each embedding (one search call)"""
+        import faiss
+        import numpy as np
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if getattr(self.vector_store, '_normalize_L2', False):
+            faiss.normalize_L2(vectors)
+        index = self.vector_store.index
+        distances, indices = index.search(vectors, min(self.candidates, index.ntotal))
+        # Embeddings are normalized: squared L2 distance d is 2 - 2 * cosine
+        to_similarity = (lambda d: float(d)) if index.metric_type == faiss.METRIC_INNER_PRODUCT else (lambda d: 1 - float(d) / 2)
+        return [
+            {int(row): to_similarity(d) for d, row in zip(row_distances, row_indices) if row != -1}
+            for row_distances, row_indices in zip(distances, indices)
+        ]
+
+    def fuse(self, dense: Dict[int, float], lexical: Dict[int, float], k: int) -> List[int]:
+        dense, lexical = _normalized(dense), _normalized(lexical)
+        fused = {
+            row: self.alpha * dense.get(row, 0.0) + (1 - self.alpha) * lexical.get(row, 0.0)
+            for row in set(dense) | set(lexical)
+        }
+        return sorted(fused, key=lambda row: -fused[row])[:k]
+
+    def search_many(self, queries: List[str], embeddings: List[List[float]], k: int = RETRIEVAL_K) -> List[List]:
+        """Documents for each (query, embedding), cached rows reused, misses searched together"""
+        results: List[Optional[List[int]]] = [None] * len(queries)
+        keys = [self.cache_key(query, k) for query in queries]
+        if self.cache is not None:
+            for i, key in enumerate(keys):
+                cached = self.cache.get(key)
+                if cached is not None:
+                    results[i] = json.loads(cached)
+        misses = [i for i, rows in enumerate(results) if rows is None]
+        if misses:
+            dense = self.dense_scores([embeddings[i] for i in misses])
+            for i, dense_scores in zip(misses, dense):
+                lexical = dict(self.lexical_index.search(queries[i], self.candidates)) if self.alpha < 1 else {}
+                results[i] = self.fuse(dense_scores, lexical, k)
+                if self.cache is not None:
+                    self.cache.set(keys[i], json.dumps(results[i]))
+        return [[doc for doc in (document_at(self.vector_store, row) for row in rows) if doc is not None]
+                for rows in results]
+
+    def search(self, query: str, embedding: List[float], k: int = RETRIEVAL_K) -> List:
+        return self.search_many([query], [embedding], k)[0]
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.92))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 2000))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", 6 * 3600))
+# How often (seconds) to check whether the FAQ vectorstore was rebuilt
+SOURCE_CHECK_INTERVAL = float(os.getenv("SEMANTIC_CACHE_SOURCE_CHECK_INTERVAL", 30))
+
+
+@dataclass
+class SemanticCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+
+def vectorstore_fingerprint(path: str) -> Optional[Tuple]:
+    """Identify a vectorstore build by the size and mtime of its files"""
+    try:
+        return tuple(
+            (name, stat.st_size, stat.st_mtime_ns)
+            for name in sorted(os.listdir(path))
+            for stat in [os.stat(os.path.join(path, name))]
+        )
+    except FileNotFoundError:
+        return None
+
+
+class SemanticCache:
+    """Answer cache keyed by query embedding similarity.
+
+    Previously answered queries are kept in a small inner-product FAISS index
+    (embeddings are normalized, so scores are cosine similarities). A lookup
+    hits when the nearest stored query with the same intent is above the
+    threshold. Entries are evicted least-recently-used beyond ``max_entries``
+    and the whole cache is dropped when the source vectorstore changes.
+    """
+
+    def __init__(self, source_path: Optional[str] = None, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES, ttl: Optional[float] = SEMANTIC_CACHE_TTL):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.source_path = source_path
+        self.stats = SemanticCacheStats()
+        self._lock = threading.Lock()
+        self._index = None
+        # id -> (intent, answer, expires_at), in LRU order
+        self._entries: "OrderedDict[int, Tuple[str, str, Optional[float]]]" = OrderedDict()
+        self._next_id = 0
+        self._source_fingerprint = vectorstore_fingerprint(source_path) if source_path else None
+        self._source_checked_at = time.monotonic()
+
+    def _ensure_index(self, dimension: int):
+        if self._index is None:
+            import faiss
+            self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+
+    def _check_source(self):
+        """Invalidate when the vectorstore on disk was rebuilt since the last check"""
+        if not self.source_path or time.monotonic() - self._source_checked_at < SOURCE_CHECK_INTERVAL:
+            return
+        self._source_checked_at = time.monotonic()
+        fingerprint = vectorstore_fingerprint(self.source_path)
+        if fingerprint != self._source_fingerprint:
+            self._source_fingerprint = fingerprint
+            self._clear()
+            self.stats.invalidations += 1
+
+    def _remove(self, ids: List[int]):
+        for entry_id in ids:
+            self._entries.pop(entry_id, None)
+        self._index.remove_ids(np.array(ids, dtype=np.int64))
+
+    def lookup(self, embedding: List[float], intent: str, k: int = 4) -> Optional[str]:
+        """Return the cached answer of the closest similar query, if any"""
+        with self._lock:
+            self._check_source()
+            if self._index is None or not self._entries:
+                self.stats.misses += 1
+                return None
+            vector = np.asarray([embedding], dtype=np.float32)
+            scores, ids = self._index.search(vector, min(k, len(self._entries)))
+            now = time.monotonic()
+            expired = []
+            for score, entry_id in zip(scores[0], ids[0]):
+                if entry_id < 0 or score < self.threshold:
+                    break
+                cached_intent, answer, expires_at = self._entries[entry_id]
+                if expires_at is not None and expires_at <= now:
+                    expired.append(int(entry_id))
+                    continue
+                if cached_intent == intent:
+                    self._entries.move_to_end(int(entry_id))
+                    self.stats.hits += 1
+                    if expired:
+                        self._remove(expired)
+                    return answer
+            if expired:
+                self._remove(expired)
+            self.stats.misses += 1
+            return None
+
+    def add(self, embedding: List[float], intent: str, answer: str):
+        """Store the answer for a query embedding"""
+        with self._lock:
+            vector = np.asarray([embedding], dtype=np.float32)
+            self._ensure_index(vector.shape[1])
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(vector, np.array([entry_id], dtype=np.int64))
+            expires_at = time.monotonic() + self.ttl if self.ttl else None
+            self._entries[entry_id] = (intent, answer, expires_at)
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                self._remove(list(self._entries)[:overflow])
+                self.stats.evictions += overflow
+
+    def _clear(self):
+        self._entries.clear()
+        if self._index is not None:
+            self._index.reset()
+
+    def invalidate(self):
+        """Drop every entry, e.g. after the FAQ vectorstore was rebuilt"""
+        with self._lock:
+            self._clear()
+            if self.source_path:
+                self._source_fingerprint = vectorstore_fingerprint(self.source_path)
+            self.stats.invalidations += 1
+
+    def get_stats(self) -> Dict:
+        lookups = self.stats.hits + self.stats.misses
+        return {
+            'name': 'semantic',
+            'size': len(self._entries),
+            **asdict(self.stats),
+            'hit_rate': self.stats.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,88 @@
+"""Single-flight execution: concurrent calls with the same key share one run.
+
+The first caller for a key (the leader) runs the function; callers that
+arrive while it is running wait for its result, or its exception, instead
+of starting their own. Nothing is kept once the run finishes, so results
+are only ever shared between calls that overlapped.
+
+``do`` serves threads, ``ado`` coroutines on one event loop. The two do
+not coalesce with each other.
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from service.metrics import REGISTRY
+
+SINGLE_FLIGHT_TOTAL = REGISTRY.counter("chatbot_single_flight_total", "Calls that ran (leader) or waited for an identical in-flight call (coalesced)")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[..., Any], *args) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        SINGLE_FLIGHT_TOTAL.inc(name=self.name, role='leader' if leader else 'coalesced')
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key: str, fn: Callable[..., Awaitable[Any]], *args) -> Any:
+        task = self._tasks.get(key)
+        leader = task is None
+        if leader:
+            # A task of its own, so a disconnecting leader does not cancel it for the others
+            task = self._tasks[key] = asyncio.ensure_future(fn(*args))
+            task.add_done_callback(lambda finished: self._finished(key, finished))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        SINGLE_FLIGHT_TOTAL.inc(name=self.name, role='leader' if leader else 'coalesced')
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task: asyncio.Future):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Mark the exception as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls) + len(self._tasks)
+
+    def get_stats(self) -> Dict:
+        return {'name': self.name, 'leaders': self.leaders, 'coalesced': self.coalesced, 'in_flight': self.in_flight()}
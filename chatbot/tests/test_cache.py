@@ -0,0 +1,143 @@
+import fnmatch
+import time
+
+import pytest
+
+from service.cache import CacheBackend, InMemoryCache, RedisCache
+
+
+class StubRedis:
+    """The part of the redis-py API RedisCache uses, with millisecond expiry"""
+
+    def __init__(self):
+        self.data = {}
+        self.scans = 0
+
+    def _live(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def get(self, key):
+        value = self._live(key)
+        return value.encode() if value is not None else None
+
+    def set(self, key, value, ex=None, px=None):
+        if ex is not None and ex <= 0 or px is not None and px <= 0:
+            raise ValueError("invalid expire time in 'set' command")
+        ttl = ex if ex is not None else px / 1000 if px is not None else None
+        self.data[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def exists(self, key):
+        return int(self._live(key) is not None)
+
+    def scan_iter(self, match="*"):
+        self.scans += 1
+        return [key for key in list(self.data) if fnmatch.fnmatchcase(key, match)]
+
+
+@pytest.fixture(params=["memory", "redis"])
+def cache(request) -> CacheBackend:
+    if request.param == "memory":
+        return InMemoryCache("test", ttl=60)
+    return RedisCache("test", ttl=60, client=StubRedis())
+
+
+def test_get_set_delete(cache):
+    assert cache.get("a") is None
+    cache.set("a", "1")
+    assert cache.get("a") == "1"
+    assert "a" in cache
+    cache.delete("a")
+    assert "a" not in cache
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+
+def test_sub_second_ttl_expires(cache):
+    cache.set("a", "1", ttl=0.05)
+    assert cache.get("a") == "1"
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+
+def test_clear_only_touches_own_keys():
+    client = StubRedis()
+    ours, theirs = RedisCache("ours", 60, client=client), RedisCache("theirs", 60, client=client)
+    ours.set("a", "1")
+    theirs.set("a", "2")
+    ours.clear()
+    assert ours.get("a") is None
+    assert theirs.get("a") == "2"
+
+
+def test_redis_stats_do_not_scan():
+    client = StubRedis()
+    cache = RedisCache("test", 60, client=client)
+    cache.set("a", "1")
+    stats = cache.get_stats()
+    assert client.scans == 0
+    assert 'size' not in stats and stats['name'] == "test"
+
+
+def test_memory_lru_eviction():
+    cache = InMemoryCache("test", max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert "b" not in cache and "a" in cache
+    assert cache.get_stats()['size'] == 2
+    assert cache.stats.evictions == 1
+
+
+class FailingRedis(StubRedis):
+    """A client whose server went away"""
+
+    def __init__(self, error):
+        super().__init__()
+        self.error = error
+
+    def _live(self, key):
+        raise self.error
+
+    def set(self, key, value, ex=None, px=None):
+        raise self.error
+
+    def delete(self, *keys):
+        raise self.error
+
+    def scan_iter(self, match="*"):
+        raise self.error
+
+
+def test_redis_errors_are_a_miss():
+    redis = pytest.importorskip("redis")
+    cache = RedisCache("test", 60, client=FailingRedis(redis.ConnectionError("Connection refused")))
+    cache.set("a", "1")
+    assert cache.get("a") is None
+    assert cache.peek("a") is None
+    assert "a" not in cache
+    cache.delete("a")
+    cache.clear()
+    assert cache.stats.misses == 1
+    assert cache.stats.errors == 6
+
+
+def test_socket_errors_are_a_miss():
+    cache = RedisCache("test", 60, client=FailingRedis(TimeoutError("timed out")))
+    assert cache.get("a") is None
+    cache.set("a", "1")
+    assert cache.stats.errors == 2
+
+
+def test_peek_does_not_count(cache):
+    cache.set("a", "1")
+    assert cache.peek("a") == "1"
+    assert cache.peek("b") is None
+    assert (cache.stats.hits, cache.stats.misses) == (0, 0)
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from service.chat_service import FAQ_ONLY_PREFIX, ChatService
+from service.classifications_rule import get_query_hash
+from service.llm_gateway import LLM_BREAKER_FAILURES, CircuitBreaker, LLMGateway, LLMUnavailable
+from service.llm_scheduler import LLMScheduler
+from service.metrics import request_trace
+from service.postprocess import clean_answer
+
+FAQ = "Khách hàng có thể hủy đơn miễn phí trước 24 giờ. Phí hủy sau thời hạn này là 20.000 VNĐ."
+POLICY_QUERY = "Chính sách hủy đơn như thế nào?"
+ACCOUNT_QUERY = "Làm sao để đổi mật khẩu tài khoản?"
+APP_QUERY = "Làm thế nào để đặt lịch trên ứng dụng?"
+PRICE_QUERY = "Giá dọn nhà 50m2 bao nhiêu?"
+# Token stream with the prefixes the cleaner strips split across chunks
+STREAMED = ["Here is", " the answer:\n", "Câu hỏi: hủy", " đơn?\nTrả", " lời: Bạn có thể", " hủy đơn miễn phí", " trước 24 giờ."]
+
+
+class StubEmbeddings:
+    """One orthogonal unit vector per distinct text, so the semantic cache never confuses two queries"""
+
+    def __init__(self, dimension: int = 64):
+        self.dimension = dimension
+        self.rows = {}
+
+    def embed_query(self, text):
+        row = self.rows.setdefault(text, len(self.rows) % self.dimension)
+        return [1.0 if i == row else 0.0 for i in range(self.dimension)]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+class StubRetriever:
+    def search(self, query, embedding, k):
+        return [Document(page_content=FAQ)]
+
+    def search_many(self, queries, embeddings, k):
+        return [self.search(query, embedding, k) for query, embedding in zip(queries, embeddings)]
+
+
+class StubLLM:
+    """Answers after ``latency``; prompts containing a ``failing`` marker fail at once"""
+
+    def __init__(self, latency: float = 0.0, failing=()):
+        self.latency = latency
+        self.failing = failing
+
+    def invoke(self, prompt, **kwargs):
+        if any(marker in prompt for marker in self.failing):
+            raise LLMUnavailable("circuit open")
+        time.sleep(self.latency)
+        return AIMessage(content="Bạn có thể hủy đơn miễn phí trước 24 giờ.")
+
+
+class DownClient:
+    """A chat model whose API refuses every connection"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, prompt, **kwargs):
+        self.calls += 1
+        raise ConnectionError("Connection refused")
+
+
+class StreamingLLM:
+    """Streams STREAMED chunk by chunk"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def astream(self, prompt, **kwargs):
+        self.calls += 1
+        for text in STREAMED:
+            await asyncio.sleep(0)
+            yield AIMessageChunk(content=text)
+
+
+def make_service(llm) -> ChatService:
+    """A ChatService on stubs, with nothing left to load"""
+    service = ChatService()
+    service.llm = llm
+    service.embeddings = StubEmbeddings()
+    service.retriever = StubRetriever()
+    service.llm_scheduler = LLMScheduler(requests_per_minute=0)
+    service.loaded = True
+    return service
+
+
+def test_batch_caches_every_answer_but_the_degraded_one():
+    # The failing job finishes first, before the others are collected
+    service = make_service(StubLLM(latency=0.05, failing=("mật khẩu",)))
+    answers = service.process_batch([POLICY_QUERY, ACCOUNT_QUERY, APP_QUERY])
+
+    assert answers[1].startswith(FAQ_ONLY_PREFIX)
+    assert service.response_cache.peek(get_query_hash(service, ACCOUNT_QUERY)) is None
+    for query, answer in ((POLICY_QUERY, answers[0]), (APP_QUERY, answers[2])):
+        assert not answer.startswith(FAQ_ONLY_PREFIX)
+        assert service.response_cache.peek(get_query_hash(service, query)) == answer
+
+
+def test_open_breaker_gives_the_faq_only_answer():
+    client = DownClient()
+    llm = LLMGateway(client, max_retries=0, hedge_percentile=0, breaker=CircuitBreaker(reset_timeout=60))
+    service = make_service(llm)
+    for _ in range(LLM_BREAKER_FAILURES):
+        assert service.handle_app_related_query(POLICY_QUERY, 'policy').startswith(FAQ_ONLY_PREFIX)
+    assert llm.breaker.state == 'open'
+
+    with request_trace() as trace:
+        answer = service.handle_app_related_query(APP_QUERY)
+    assert answer.startswith(FAQ_ONLY_PREFIX)
+    assert "hủy đơn miễn phí" in answer
+    assert trace.degraded
+    # Answered without trying the LLM again
+    assert client.calls == LLM_BREAKER_FAILURES
+
+
+def collect(service, query):
+    async def run():
+        return [chunk async for chunk in service.astream_query(query)]
+
+    return asyncio.run(run())
+
+
+def test_stream_is_cleaned_then_replayed_from_the_cache():
+    llm = StreamingLLM()
+    service = make_service(llm)
+    chunks = collect(service, POLICY_QUERY)
+    assert len(chunks) > 1
+    assert "".join(chunks) == clean_answer("".join(STREAMED))
+
+    # The cached answer comes back whole, without calling the LLM
+    assert collect(service, POLICY_QUERY) == ["".join(chunks)]
+    assert llm.calls == 1
+
+
+def test_price_answer_is_one_chunk():
+    llm = StreamingLLM()
+    chunks = collect(make_service(llm), PRICE_QUERY)
+    assert len(chunks) == 1 and "50 m²" in chunks[0]
+    assert llm.calls == 0
+
+
+@pytest.fixture
+def client(monkeypatch):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+    import main
+
+    llm = StreamingLLM()
+    monkeypatch.setattr(main, "chat_service", make_service(llm))
+    # No lifespan: the warm-up would load the real models
+    return TestClient(main.app), llm
+
+
+def sse_events(body: str):
+    """(event name, data) of each Server-Sent Event"""
+    events = []
+    for block in body.split("\n\n"):
+        if not block:
+            continue
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return events
+
+
+def test_chat_stream_sse_framing(client):
+    http, llm = client
+    response = http.post("/chat/stream", json={"query": POLICY_QUERY})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = sse_events(response.text)
+    assert events[-1] == ("done", {})
+    deltas = events[:-1]
+    assert len(deltas) > 1 and all(name == "message" for name, _ in deltas)
+    answer = "".join(data["delta"] for _, data in deltas)
+    assert answer == clean_answer("".join(STREAMED))
+
+    # Replayed from the response cache as a single event
+    events = sse_events(http.post("/chat/stream", json={"query": POLICY_QUERY}).text)
+    assert events == [("message", {"delta": answer}), ("done", {})]
+    assert llm.calls == 1
+
+
+def test_chat_stream_price_answer_is_one_event(client):
+    http, llm = client
+    events = sse_events(http.post("/chat/stream", json={"query": PRICE_QUERY}).text)
+    assert len(events) == 2 and events[-1] == ("done", {})
+    assert "50 m²" in events[0][1]["delta"]
+    assert llm.calls == 0
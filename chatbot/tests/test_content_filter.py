@@ -0,0 +1,21 @@
+from benchmarks.bench_content_filter import masked_mismatches
+from service.content_filter import ContentFilter
+
+
+def test_masked_spellings_match_the_original_patterns():
+    content_filter = ContentFilter(words_path=None)
+    assert masked_mismatches(content_filter) == []
+    assert content_filter.is_inappropriate("f**k")[0]
+
+
+def test_email_addresses_are_not_masked_words():
+    content_filter = ContentFilter(words_path=None)
+    for query in ("email của tôi là dung@yahoo.com", "hung@yahoo.com", "chi@yahoo.com"):
+        assert content_filter.is_inappropriate(query) == (False, [])
+    assert content_filter.is_inappropriate("liên hệ huy@gmail.com đồ ngu") == (True, ['ngu'])
+
+
+def test_word_boundaries():
+    content_filter = ContentFilter(words_path=None)
+    assert content_filter.is_inappropriate("Làm sao để theo dõi đơn hàng?") == (False, [])
+    assert content_filter.is_inappropriate("nguuuu") == (True, ['ngu'])
@@ -0,0 +1,228 @@
+import asyncio
+import time
+
+import pytest
+
+from service.llm_gateway import LLM_BREAKER_FAILURES, CircuitBreaker, LLMGateway, LLMUnavailable
+
+
+class StubClient:
+    """Chat model stand-in: fails while ``fail`` is set, otherwise answers after ``latency``"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.fail = False
+        self.calls = 0
+
+    async def ainvoke(self, prompt, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            raise ConnectionError("refused")
+        return "ok"
+
+    async def astream(self, prompt, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        yield "o"
+        yield "k"
+
+
+class StatusError(Exception):
+    """An API error carrying an HTTP status, like groq.APIStatusError"""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class ScriptedClient:
+    """Plays ``script`` one step per call: an exception to raise, or seconds to wait before answering"""
+
+    def __init__(self, *script, then: float = 0.0):
+        self.script = list(script)
+        self.then = then
+        self.calls = 0
+
+    def _next(self):
+        self.calls += 1
+        step = self.script.pop(0) if self.script else self.then
+        if isinstance(step, BaseException):
+            raise step
+        return step
+
+    def invoke(self, prompt, **kwargs):
+        time.sleep(self._next())
+        return "ok"
+
+    async def ainvoke(self, prompt, **kwargs):
+        await asyncio.sleep(self._next())
+        return "ok"
+
+
+def gateway(client, **kwargs) -> LLMGateway:
+    options = dict(deadline=5, max_retries=2, backoff_base=0.01, backoff_max=0.02, hedge_percentile=0)
+    options.update(kwargs)
+    return LLMGateway(client, **options)
+
+
+def open_gateway(client, reset_timeout=0.05, trial_timeout=30.0):
+    """A gateway whose breaker has just opened and is half-open after ``reset_timeout``"""
+    gateway = LLMGateway(client, deadline=5, max_retries=0, hedge_percentile=0,
+                         breaker=CircuitBreaker(1, reset_timeout, trial_timeout))
+    client.fail = True
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(gateway.ainvoke("q"))
+    client.fail = False
+    assert gateway.breaker.state == 'open'
+    time.sleep(reset_timeout * 1.5)
+    assert gateway.breaker.state == 'half_open'
+    return gateway
+
+
+def test_cancelled_trial_releases_the_breaker():
+    client = StubClient(latency=0.2)
+    gateway = open_gateway(client)
+
+    async def cancelled_trial():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(gateway.ainvoke("q"), 0.01)
+
+    asyncio.run(cancelled_trial())
+    client.latency = 0.0
+    assert asyncio.run(gateway.ainvoke("q")) == "ok"
+    assert gateway.breaker.state == 'closed'
+
+
+def test_closed_stream_releases_the_breaker():
+    client = StubClient(latency=0.2)
+    gateway = open_gateway(client)
+
+    async def abandoned_stream():
+        stream = gateway.astream("q")
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(stream.__anext__(), 0.01)
+        await stream.aclose()
+
+    asyncio.run(abandoned_stream())
+    client.latency = 0.0
+
+    async def consume():
+        return [chunk async for chunk in gateway.astream("q")]
+
+    assert asyncio.run(consume()) == ["o", "k"]
+    assert gateway.breaker.state == 'closed'
+
+
+def test_stuck_trial_times_out():
+    breaker = CircuitBreaker(1, reset_timeout=0.01, trial_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+@pytest.mark.parametrize("error", [StatusError(429), StatusError(503), TimeoutError("read timed out"),
+                                   ConnectionError("reset")])
+def test_retryable_errors_are_retried(error):
+    client = ScriptedClient(error, error)
+    llm = gateway(client)
+    assert llm.invoke("q") == "ok"
+    assert client.calls == 3
+    assert llm.breaker.state == 'closed' and llm.breaker.failures == 0
+
+
+def test_async_retry():
+    client = ScriptedClient(StatusError(429))
+    assert asyncio.run(gateway(client).ainvoke("q")) == "ok"
+    assert client.calls == 2
+
+
+def test_client_errors_are_not_retried():
+    client = ScriptedClient(StatusError(400))
+    llm = gateway(client)
+    with pytest.raises(LLMUnavailable):
+        llm.invoke("q")
+    assert client.calls == 1
+    assert llm.breaker.failures == 0
+
+
+def test_retries_give_up():
+    client = ScriptedClient(*[StatusError(503)] * 10)
+    with pytest.raises(LLMUnavailable):
+        gateway(client, max_retries=2).invoke("q")
+    assert client.calls == 3
+
+
+def test_backoff_is_jittered_and_capped():
+    llm = gateway(ScriptedClient(), backoff_base=0.1, backoff_max=0.3)
+    for attempt in range(5):
+        delays = {llm.backoff(attempt) for _ in range(50)}
+        assert len(delays) > 1
+        assert all(0 <= delay <= min(0.3, 0.1 * 2 ** attempt) for delay in delays)
+
+
+def test_deadline_covers_a_slow_attempt():
+    llm = gateway(ScriptedClient(then=1.0), deadline=0.2)
+    started = time.monotonic()
+    with pytest.raises(LLMUnavailable):
+        llm.invoke("q")
+    assert time.monotonic() - started < 0.5
+
+
+def test_deadline_covers_the_retries():
+    client = ScriptedClient(*[StatusError(503)] * 100)
+    llm = gateway(client, deadline=0.3, max_retries=100, backoff_base=0.1, backoff_max=0.1)
+    started = time.monotonic()
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(llm.ainvoke("q"))
+    assert time.monotonic() - started < 0.4
+    assert 1 < client.calls < 100
+
+
+def hedged_gateway(client) -> LLMGateway:
+    """Hedges attempts slower than the p50 of 20 recent 20 ms calls"""
+    llm = gateway(client, hedge_percentile=0.5)
+    for _ in range(20):
+        llm.latencies.add(0.02)
+    return llm
+
+
+def test_slow_attempt_is_hedged():
+    client = ScriptedClient(1.0, 0.0)
+    started = time.monotonic()
+    assert hedged_gateway(client).invoke("q") == "ok"
+    assert time.monotonic() - started < 0.5
+    assert client.calls == 2
+
+
+def test_async_slow_attempt_is_hedged():
+    client = ScriptedClient(1.0, 0.0)
+    started = time.monotonic()
+    assert asyncio.run(hedged_gateway(client).ainvoke("q")) == "ok"
+    assert time.monotonic() - started < 0.5
+    assert client.calls == 2
+
+
+def test_no_hedge_without_enough_samples():
+    client = ScriptedClient(0.05)
+    llm = gateway(client, hedge_percentile=0.5)
+    llm.latencies.add(0.001)
+    assert llm.invoke("q") == "ok"
+    assert client.calls == 1
+
+
+def test_breaker_opens_after_consecutive_failures():
+    client = ScriptedClient(*[ConnectionError("refused")] * LLM_BREAKER_FAILURES)
+    llm = gateway(client, max_retries=0, breaker=CircuitBreaker(reset_timeout=60))
+    for _ in range(LLM_BREAKER_FAILURES):
+        with pytest.raises(LLMUnavailable):
+            llm.invoke("q")
+    assert llm.breaker.state == 'open'
+    # Fails fast, the client is not called
+    with pytest.raises(LLMUnavailable):
+        llm.invoke("q")
+    assert client.calls == LLM_BREAKER_FAILURES
+    assert llm.stats()['breaker']['open'] == 1
@@ -0,0 +1,192 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from service.llm_scheduler import LLMOverloaded, LLMScheduler, TokenBucket
+
+
+def scheduler(**kwargs) -> LLMScheduler:
+    options = dict(max_concurrency=1, requests_per_minute=0, queue_limits={'rag': 64, 'general': 16},
+                   shed_depth=8, max_waits={'rag': 5, 'general': 5})
+    options.update(kwargs)
+    return LLMScheduler(**options)
+
+
+def test_rag_is_served_before_general():
+    llm = scheduler()
+    order = []
+
+    async def call(priority, name):
+        async with llm.aslot(priority):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        # The first call holds the only slot while the others queue
+        first = asyncio.ensure_future(call('general', 'first'))
+        await asyncio.sleep(0)
+        queued = [asyncio.ensure_future(call(priority, f"{priority}-{i}"))
+                  for i, priority in enumerate(['general', 'general', 'rag', 'rag'])]
+        await asyncio.gather(first, *queued)
+
+    asyncio.run(main())
+    assert order == ['first', 'rag-2', 'rag-3', 'general-0', 'general-1']
+
+
+def test_general_is_shed_when_the_queue_is_deep():
+    llm = scheduler(shed_depth=2)
+
+    async def main():
+        async def hold(priority):
+            async with llm.aslot(priority):
+                await asyncio.sleep(0.05)
+
+        tasks = [asyncio.ensure_future(hold('rag')) for _ in range(3)]
+        await asyncio.sleep(0)
+        # One call holds the slot, two rag calls wait: general is shed at once
+        start = time.monotonic()
+        with pytest.raises(LLMOverloaded):
+            async with llm.aslot('general'):
+                pass
+        assert time.monotonic() - start < 0.01
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    stats = llm.stats()
+    assert stats['general']['shed'] == 1
+    assert stats['rag'] == {'queued': 0, 'admitted': 3, 'shed': 0, 'timed_out': 0}
+
+
+def test_full_general_queue_sheds():
+    llm = scheduler(queue_limits={'general': 1})
+    release = threading.Event()
+
+    def hold():
+        with llm.slot('general'):
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    time.sleep(0.02)
+    waiter = threading.Thread(target=hold)
+    waiter.start()
+    time.sleep(0.02)
+    with pytest.raises(LLMOverloaded):
+        with llm.slot('general'):
+            pass
+    release.set()
+    holder.join()
+    waiter.join()
+    assert llm.stats()['general']['admitted'] == 2
+
+
+def test_wait_timeout():
+    llm = scheduler(max_waits={'rag': 0.05})
+
+    async def main():
+        async def hold():
+            async with llm.aslot('rag'):
+                await asyncio.sleep(0.2)
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        start = time.monotonic()
+        with pytest.raises(LLMOverloaded):
+            async with llm.aslot('rag'):
+                pass
+        assert 0.04 < time.monotonic() - start < 0.15
+        await holder
+
+    asyncio.run(main())
+    stats = llm.stats()
+    assert stats['rag']['timed_out'] == 1
+    assert stats['rag']['queued'] == 0
+
+
+def test_sync_wait_timeout():
+    llm = scheduler(max_waits={'general': 0.05})
+    with llm.slot('general'):
+        thread_error = []
+
+        def wait():
+            try:
+                with llm.slot('general'):
+                    pass
+            except LLMOverloaded as e:
+                thread_error.append(e)
+
+        thread = threading.Thread(target=wait)
+        thread.start()
+        thread.join()
+    assert thread_error and llm.stats()['slots']['in_flight'] == 0
+
+
+def test_cancelled_aslot_releases_its_place():
+    llm = scheduler()
+
+    async def main():
+        async def hold(seconds):
+            async with llm.aslot('rag'):
+                await asyncio.sleep(seconds)
+
+        holder = asyncio.ensure_future(hold(0.05))
+        await asyncio.sleep(0)
+        waiting = asyncio.ensure_future(hold(0.05))
+        await asyncio.sleep(0)
+        assert llm.stats()['rag']['queued'] == 1
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert llm.stats()['rag']['queued'] == 0
+
+        # Cancelled while holding the slot
+        running = asyncio.ensure_future(hold(1))
+        await holder
+        await asyncio.sleep(0.01)
+        assert llm.stats()['slots']['in_flight'] == 1
+        running.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await running
+        assert llm.stats()['slots']['in_flight'] == 0
+        await asyncio.wait_for(hold(0), 0.1)
+
+    asyncio.run(main())
+
+
+def test_token_bucket_refills():
+    bucket = TokenBucket(per_minute=600, capacity=2)
+    assert bucket.take() == 0 and bucket.take() == 0
+    delay = bucket.take()
+    assert 0 < delay <= 0.1
+    time.sleep(delay + 0.01)
+    assert bucket.take() == 0
+
+
+def test_rate_limit_delays_admission():
+    llm = scheduler(max_concurrency=4, requests_per_minute=1200, burst=1)
+
+    async def main():
+        async def call():
+            async with llm.aslot('rag'):
+                return time.monotonic()
+
+        start = time.monotonic()
+        admitted = await asyncio.gather(*(call() for _ in range(3)))
+        # One token every 50 ms after the burst of one
+        assert max(admitted) - start >= 0.09
+
+    asyncio.run(main())
+
+
+def test_waiter_of_a_closed_loop_does_not_use_a_token():
+    # One token a minute: a token burnt on the dead waiter would leave none for the next call
+    llm = scheduler(requests_per_minute=1, burst=1, max_waits={'rag': 0.2, 'general': 0.2})
+    loop = asyncio.new_event_loop()
+    loop.close()
+    llm._enqueue('rag', loop)
+    assert llm.stats()['slots']['in_flight'] == 0
+    assert llm.stats()['rag']['queued'] == 0
+    with llm.slot('rag'):
+        pass
@@ -0,0 +1,75 @@
+import pytest
+
+from chat_response import ChatResponse
+from intent_type import IntentType
+from service.pipeline import Pipeline, QueryContext, Stage
+
+
+def passing(context):
+    return None
+
+
+def stage_names(pipeline):
+    return [s.name for s in pipeline.stages]
+
+
+def test_default_order_is_by_cost():
+    pipeline = Pipeline([Stage("b", 20, passing), Stage("a", 10, passing), Stage("c", 30, passing)])
+    assert stage_names(pipeline) == ["a", "b", "c"]
+
+
+def test_dependency_runs_first_whatever_its_cost():
+    pipeline = Pipeline([
+        Stage("length", 1, passing),
+        Stage("language", 30, passing, after=("classify",)),
+        Stage("classify", 60, passing),
+    ])
+    assert stage_names(pipeline) == ["length", "classify", "language"]
+
+
+def test_dependency_on_a_missing_stage_is_ignored():
+    pipeline = Pipeline([Stage("language", 30, passing, after=("classify",)), Stage("length", 1, passing)])
+    assert stage_names(pipeline) == ["length", "language"]
+
+
+def test_dependency_cycle_is_rejected():
+    with pytest.raises(ValueError):
+        Pipeline([Stage("a", 1, passing, after=("b",)), Stage("b", 2, passing, after=("a",))])
+
+
+def test_explicit_order_wins():
+    pipeline = Pipeline([Stage("a", 1, passing), Stage("b", 2, passing, after=("a",))], ["b", "a"])
+    assert stage_names(pipeline) == ["b", "a"]
+
+
+def test_skip_reads_an_earlier_stage_result():
+    seen = []
+
+    def classify(context):
+        context.intent = "service_pricing"
+
+    def language(context):
+        seen.append(context.query)
+
+    pipeline = Pipeline([
+        Stage("language", 30, language, skip=lambda context: context.intent == "service_pricing", after=("classify",)),
+        Stage("classify", 60, classify),
+    ])
+    assert pipeline.run(QueryContext("giá dọn nhà")) is None
+    assert seen == []
+
+
+def test_rejection_stops_the_pipeline_and_is_counted():
+    def reject(context):
+        return ChatResponse(message="no", intent=IntentType.INVALID_QUERY)
+
+    ran = []
+    pipeline = Pipeline([Stage("reject_first", 1, reject), Stage("never_runs", 2, lambda context: ran.append(1))])
+    before = pipeline.stats()
+    response = pipeline.run(QueryContext("x"))
+    after = pipeline.stats()
+    assert response.rejected_by == "reject_first"
+    assert ran == []
+    assert after["reject_first"]["rejected"] == before["reject_first"]["rejected"] + 1
+    assert after["never_runs"]["skipped"] == before["never_runs"]["skipped"] + 1
+    assert after["never_runs"]["order"] == 1
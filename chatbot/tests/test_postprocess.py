@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+from service.postprocess import StreamingAnswerCleaner, clean_answer
+
+ANSWERS = [
+    "Here is the answer to your question:\n  Giá dịch vụ dọn dẹp là 200.000đ/giờ.",
+    "Câu hỏi: giá dọn nhà?\nTrả lời: Giá dịch vụ dọn dẹp là 200.000đ/giờ.  ",
+    "Question: how do I cancel?\nAnswer: Bạn có thể hủy đơn trước 2 giờ.\n",
+    "  Answer:   Vui lòng liên hệ hotline 0347596789.",
+    "Here is what I found\nBạn có thể thanh toán qua VNPay.",
+    "Trả lời: Có.\nQuestion khác? Câu hỏi cuối\nHết.",
+    "Here is: ",
+    "Bạn có thể hủy đơn. Question\n",
+    "",
+    "   \n  ",
+    "Heretic: không phải tiền tố",
+]
+PIECES = ["Here is ", "here is", ":", " ", "\n", "Câu hỏi", "Question", "Trả lời:", "Answer:", "Giá", " 200.000đ",
+          "x", "?", "  ", "câu", " hỏi", "quest", "ion"]
+
+
+def stream(text: str, cuts) -> str:
+    cleaner = StreamingAnswerCleaner()
+    bounds = [0, *sorted(cuts), len(text)]
+    out = [cleaner.feed(text[start:end]) for start, end in zip(bounds, bounds[1:])]
+    out.append(cleaner.flush())
+    return "".join(out)
+
+
+@pytest.mark.parametrize("text", ANSWERS)
+def test_every_two_way_split_matches_clean_answer(text):
+    for cut in range(len(text) + 1):
+        assert stream(text, [cut]) == clean_answer(text), cut
+
+
+def test_random_chunkings_match_clean_answer():
+    rng = random.Random(0)
+    texts = ANSWERS + ["".join(rng.choices(PIECES, k=rng.randint(1, 12))) for _ in range(300)]
+    for text in texts:
+        for _ in range(20):
+            cuts = rng.sample(range(len(text) + 1), rng.randint(0, min(len(text), 8)))
+            assert stream(text, cuts) == clean_answer(text), (text, cuts)
+
+
+def test_single_character_tokens():
+    for text in ANSWERS:
+        assert stream(text, range(len(text))) == clean_answer(text)
@@ -0,0 +1,48 @@
+import json
+import os
+
+import pytest
+
+from service.pricing import PricingEngine, extract_slots, prepare_text
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "pricing_queries.jsonl")
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return PricingEngine.from_file()
+
+
+def load_corpus():
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+@pytest.mark.parametrize("item", load_corpus(), ids=lambda item: item["query"][:40])
+def test_corpus(engine, item):
+    assert bool(engine.quote(item["query"])) == item["priced"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("năm nay giá dọn nhà có tăng không", "năm nay giá dọn nhà có tăng không"),
+    ("giá sửa máy lạnh năm 2024", "giá sửa máy lạnh năm 2024"),
+    ("năm người ăn", "5 người ăn"),
+    ("điều hòa năm ngựa", "điều hòa 5 ngựa"),
+    ("dọn nhà năm mươi lăm mét vuông", "dọn nhà 55 mét vuông"),
+])
+def test_nam_is_a_number_only_before_a_unit(query, expected):
+    assert prepare_text(query) == expected
+
+
+def test_slots():
+    slots = extract_slots(prepare_text("Nấu ăn cho năm người, ba món, hai tiếng rưỡi"))
+    assert (slots.people, slots.dishes, slots.hours) == (5, 3, 2.5)
+
+
+@pytest.mark.parametrize("query", [
+    "Giá dọn nhà 0 m2",
+    "Nấu ăn cho 0 người, 2 món, 2 giờ giá bao nhiêu?",
+    "Sửa điều hòa split 0 HP giá bao nhiêu?",
+])
+def test_zero_quantities_fall_through(engine, query):
+    assert engine.quote(query) == []
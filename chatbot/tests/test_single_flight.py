@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from service.single_flight import SingleFlight
+
+
+class CountingStub:
+    """Counts calls; each call takes ``latency`` and returns, or raises ``error``"""
+
+    def __init__(self, latency: float = 0.05, error: Exception = None):
+        self.latency = latency
+        self.error = error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _count(self) -> int:
+        with self._lock:
+            self.calls += 1
+            return self.calls
+
+    def __call__(self, query):
+        call = self._count()
+        time.sleep(self.latency)
+        if self.error is not None:
+            raise self.error
+        return f"{query}-{call}"
+
+    async def acall(self, query):
+        call = self._count()
+        await asyncio.sleep(self.latency)
+        if self.error is not None:
+            raise self.error
+        return f"{query}-{call}"
+
+
+def test_do_coalesces_concurrent_calls():
+    flight, stub = SingleFlight("test"), CountingStub()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: flight.do("q", stub, "q"), range(8)))
+    assert stub.calls == 1
+    assert results == ["q-1"] * 8
+    assert flight.get_stats()['coalesced'] == 7
+    assert flight.in_flight() == 0
+    # Nothing is kept once the run has finished
+    assert flight.do("q", stub, "q") == "q-2"
+
+
+def test_do_raises_the_error_in_every_caller():
+    flight, stub = SingleFlight("test"), CountingStub(error=ValueError("boom"))
+
+    def call(_):
+        with pytest.raises(ValueError, match="boom"):
+            flight.do("q", stub, "q")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(call, range(8)))
+    assert stub.calls == 1
+    assert flight.in_flight() == 0
+
+
+def test_ado_coalesces_concurrent_calls():
+    flight, stub = SingleFlight("test"), CountingStub()
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("q", stub.acall, "q") for _ in range(8)),
+                                    flight.ado("other", stub.acall, "other"))
+
+    results = asyncio.run(main())
+    assert stub.calls == 2
+    assert results[:8] == [results[0]] * 8
+    assert flight.in_flight() == 0
+
+
+def test_ado_raises_the_error_in_every_caller():
+    flight, stub = SingleFlight("test"), CountingStub(error=ValueError("boom"))
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("q", stub.acall, "q") for _ in range(8)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert stub.calls == 1
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    flight, stub = SingleFlight("test"), CountingStub()
+
+    async def main():
+        leader = asyncio.ensure_future(flight.ado("q", stub.acall, "q"))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(flight.ado("q", stub.acall, "q")) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+
+    assert asyncio.run(main()) == ["q-1"] * 3
+    assert stub.calls == 1